@@ -0,0 +1,204 @@
+"""
+Throughput benchmark of the check-in bots against the local mock sites.
+
+    python -m benchmarks.throughput --reservations 24 --concurrency 1 2 4
+    python -m benchmarks.throughput --engine inprocess contexts --concurrency 4 8
+
+Starts the mock server in-process, runs each engine at each concurrency level and
+reports reservations per minute, p50/p95 latency per step and peak memory of this
+process plus its browsers. Comparing "inprocess" (one Chrome per concurrent
+check-in) with "contexts" (browser contexts in one Chromium per airline) shows the
+memory cost of each model. Results are also written to reports/.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from datetime import datetime
+
+from mocks.server import MockConfig, start_in_thread
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+AIRLINE_NAMES = {
+    "aeromexico": "AEROMEXICO",
+    "volaris": "VOLARIS",
+    "vivaaerobus": "VIVA AEROBUS",
+}
+
+
+def synthetic_reservations(count, airlines):
+    for i in range(count):
+        yield {
+            "airline": airlines[i % len(airlines)],
+            "reservation_code": f"BM{i:04d}",
+            "last_name": "PRUEBA",
+            "email": f"pasajero{i}@example.com",
+            "date_of_birth": "14-02-1976",
+        }
+
+
+class MemorySampler:
+    """Peak RSS of this process and every browser it started, sampled in the background."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _sample(self):
+        if psutil is None:
+            # ru_maxrss is in KiB on Linux; children only count once they have exited
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            return usage * 1024
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._sample())
+
+
+def run_level(engine, concurrency, args, profile, profiles=None):
+    # Imported late so the *_BASE_URL variables are set before the bots load
+    from main import context_runner, in_process_runner
+    from common.browser import ProfileReport
+    from common.browser_pool import BrowserPools
+    from common.contexts import ContextEngine
+    from common.orchestrator import Orchestrator
+    from common.registry import load_airlines
+    from common.tracing import SpanCollector
+
+    load_airlines()
+    airlines = [AIRLINE_NAMES[name] for name in args.airlines]
+    collector = SpanCollector()
+    orchestrator = Orchestrator(None, max_workers=concurrency, airline_limits={a: concurrency for a in airlines})
+
+    with MemorySampler() as memory:
+        if engine == "contexts":
+            browsers = ContextEngine(profile, collector)
+            orchestrator.runner = context_runner(browsers)
+        else:
+            browsers = BrowserPools(orchestrator.limit_for, max_uses=args.recycle_after, profile=profile,
+                                    profiles=profiles)
+            orchestrator.runner = in_process_runner(browsers, ProfileReport(), collector)
+        try:
+            for _ in orchestrator.run(synthetic_reservations(args.reservations, airlines)):
+                pass
+        finally:
+            browsers.close()
+
+    stats = orchestrator.stats
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "reservations": stats.total,
+        "succeeded": stats.succeeded,
+        "failed": stats.failed,
+        "elapsed_s": round(stats.elapsed, 2),
+        "reservations_per_min": round(stats.throughput, 2),
+        "peak_memory_mb": round(memory.peak_bytes / 1024 / 1024, 1),
+        "peak_memory_per_slot_mb": round(memory.peak_bytes / 1024 / 1024 / concurrency, 1),
+        "steps": {
+            f"{airline} {step}": {"count": s["count"], "p50_ms": round(s["p50"] * 1000, 1), "p95_ms": round(s["p95"] * 1000, 1)}
+            for (airline, step), s in sorted(collector.summary().items())
+        },
+    }
+
+
+def log_level(result):
+    logging.info(
+        f"{result['engine']} concurrency={result['concurrency']}: {result['reservations_per_min']} reservations/min, "
+        f"{result['succeeded']}/{result['reservations']} succeeded in {result['elapsed_s']}s, "
+        f"peak memory {result['peak_memory_mb']} MB ({result['peak_memory_per_slot_mb']} MB per concurrent check-in)"
+    )
+    for step, s in result["steps"].items():
+        logging.info(f"  {step}: p50 {s['p50_ms']}ms, p95 {s['p95_ms']}ms ({s['count']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark check-in throughput against the mock airline sites")
+    parser.add_argument("--reservations", type=int, default=12, help="Reservations per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="Concurrency levels to run")
+    parser.add_argument("--engine", nargs="+", choices=["inprocess", "contexts"], default=["inprocess"],
+                        help="Engines to compare; 'contexts' needs Playwright")
+    parser.add_argument("--airlines", type=lambda v: v.split(","), default=list(AIRLINE_NAMES),
+                        help="Comma-separated airlines to include (aeromexico,volaris,vivaaerobus)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock site delay per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- variation of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock API calls that fail")
+    parser.add_argument("--browser-profile", choices=["full", "lean"], default="full")
+    parser.add_argument("--recycle-after", type=int, default=20)
+    parser.add_argument("--prepare-drivers", action=argparse.BooleanOptionalAction, default=True,
+                        help="Prepare the shared chromedriver cache first; compare launch times with --no-prepare-drivers")
+    parser.add_argument("--warm-profiles", action="store_true",
+                        help="Run in persistent warm profiles; the report compares first page loads warm and cold")
+    parser.add_argument("--profiles-dir", default=os.path.join("reports", "benchmark-profiles"))
+    parser.add_argument("--output", default=None, help="JSON report path (default: reports/benchmark-<time>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server, urls = start_in_thread(MockConfig(args.latency, args.jitter, args.error_rate))
+    os.environ.update(urls)
+
+    from common.browser import get_profile
+    from common.drivers import LAUNCH_STATS, prepare_drivers
+    from common.profiles import PAGE_LOADS, configure_profiles
+    profile = get_profile(args.browser_profile)
+    profiles = configure_profiles(args.profiles_dir, max(args.concurrency)) if args.warm_profiles else None
+    if args.prepare_drivers and args.engine != ["contexts"]:
+        prepare_drivers()
+
+    results = []
+    try:
+        for engine in args.engine:
+            for concurrency in args.concurrency:
+                result = run_level(engine, concurrency, args, profile, profiles)
+                log_level(result)
+                results.append(result)
+    finally:
+        server.shutdown()
+    LAUNCH_STATS.log_summary()
+    PAGE_LOADS.log_summary()
+
+    output = args.output or os.path.join("reports", f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "mock": {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate},
+            "browser_profile": args.browser_profile,
+            "prepared_drivers": args.prepare_drivers,
+            "driver_launch": LAUNCH_STATS.summary(),
+            "warm_profiles": args.warm_profiles,
+            "first_page_load": PAGE_LOADS.summary(),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, file, indent=2)
+    logging.info(f"Wrote benchmark report to {output}")
+
+
+if __name__ == "__main__":
+    main()
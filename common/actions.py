@@ -0,0 +1,191 @@
+import logging
+
+from selenium.common.exceptions import TimeoutException
+
+from common.waits import wait_until
+
+# Resolves a list of candidates ([kind, value, tag]) in the page and returns the
+# index of the first candidate with a usable match and that element, or null.
+LOCATE_SCRIPT = """
+function isVisible(e) {
+    return !!(e.offsetWidth || e.offsetHeight || e.getClientRects().length);
+}
+function resolve(candidate) {
+    const [kind, value, tag] = candidate;
+    if (kind === 'css') {
+        return Array.from(document.querySelectorAll(value));
+    }
+    if (kind === 'xpath') {
+        const snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const found = [];
+        for (let i = 0; i < snapshot.snapshotLength; i++) {
+            found.push(snapshot.snapshotItem(i));
+        }
+        return found;
+    }
+    if (kind === 'text') {
+        const needle = value.trim().toLowerCase();
+        const hits = Array.from(document.querySelectorAll(tag || '*'))
+            .filter(e => e.textContent.trim().toLowerCase().includes(needle));
+        // Keep the innermost elements so a text match is the control, not its container
+        return hits.filter(e => !hits.some(other => other !== e && e.contains(other)));
+    }
+    return [];
+}
+function locate(candidates, enabled) {
+    for (let i = 0; i < candidates.length; i++) {
+        let found;
+        try {
+            found = resolve(candidates[i]);
+        } catch (error) {
+            continue;
+        }
+        found = found.filter(e => e.nodeType === 1 && (isVisible(e) || e.type === 'checkbox' || e.type === 'radio')
+                                  && !(enabled && e.disabled));
+        if (found.length) {
+            return [i, found[0]];
+        }
+    }
+    return null;
+}
+"""
+
+FIND_FIRST_SCRIPT = LOCATE_SCRIPT + """
+const match = locate(arguments[0], arguments[1]);
+if (match && arguments[2]) {
+    match[1].click();
+}
+return match;
+"""
+
+FILL_FORM_SCRIPT = LOCATE_SCRIPT + """
+const matches = [];
+const missing = [];
+for (const [name, candidates, value] of arguments[0]) {
+    const match = locate(candidates, true);
+    if (match) {
+        matches.push([name, match, value]);
+    } else {
+        missing.push(name);
+    }
+}
+if (missing.length) {
+    return {missing: missing};
+}
+const fallbacks = {};
+for (const [name, [index, element], value] of matches) {
+    if (index > 0) {
+        fallbacks[name] = index;
+    }
+    if (element.type === 'checkbox' || element.type === 'radio') {
+        if (element.checked !== Boolean(value)) {
+            element.click();
+        }
+        continue;
+    }
+    // Use the native setter so framework-bound inputs see the change
+    const prototype = element instanceof HTMLSelectElement ? HTMLSelectElement.prototype
+        : element instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(prototype, 'value').set.call(element, String(value));
+    if (element instanceof HTMLSelectElement && element.value !== String(value)) {
+        // The options are not loaded yet
+        return {missing: [name]};
+    }
+    element.dispatchEvent(new Event('input', {bubbles: true}));
+    element.dispatchEvent(new Event('change', {bubbles: true}));
+    element.dispatchEvent(new Event('blur'));
+}
+return {filled: matches.length, fallbacks: fallbacks};
+"""
+
+
+def css(selector):
+    return ["css", selector]
+
+
+def xpath(expression):
+    return ["xpath", expression]
+
+
+def text(value, tag="*"):
+    """Elements of `tag` whose text contains `value` (case-insensitive)."""
+    return ["text", value, tag]
+
+
+def _candidates(locator):
+    # A single candidate is a list starting with its kind
+    if locator and isinstance(locator[0], str):
+        return [list(locator)]
+    return [list(candidate) for candidate in locator]
+
+
+def _log_fallback(description, candidates, index):
+    logging.warning(f"{description}: first {index} locator(s) did not match, used {candidates[index]}")
+
+
+def first_match(locator, enabled=False, click=False):
+    """
+    Condition resolving every candidate in one script and returning the first
+    visible match (enabled too when `enabled`), clicking it when `click` is set.
+    """
+    candidates = _candidates(locator)
+
+    def condition(driver):
+        match = driver.execute_script(FIND_FIRST_SCRIPT, candidates, enabled or click, click)
+        return match or False
+    return condition
+
+
+def find_first(driver, locator, timeout, description, enabled=False, replaces=0, required=True):
+    """
+    Wait for the first of several candidate locators to match and return the element.
+
+    All candidates are tried in the page on every poll, so a stale primary selector
+    costs nothing when a fallback matches instead of a full timeout of its own.
+    """
+    candidates = _candidates(locator)
+    match = wait_until(driver, first_match(candidates, enabled), timeout, description, replaces, required)
+    if not match:
+        return None
+    index, element = match
+    if index:
+        _log_fallback(description, candidates, index)
+    return element
+
+
+def click_first(driver, locator, timeout, description, replaces=0, required=True):
+    """Find the first enabled match of the candidates and click it in the same round-trip."""
+    candidates = _candidates(locator)
+    match = wait_until(driver, first_match(candidates, click=True), timeout, description, replaces, required)
+    if not match:
+        return False
+    if match[0]:
+        _log_fallback(description, candidates, match[0])
+    return True
+
+
+def fill_form(driver, fields, timeout, description, replaces=0):
+    """
+    Fill a whole form step in one script once every field is present.
+
+    `fields` is a list of (name, locator, value); inputs and selects get the value
+    with input/change events, checkboxes are set to bool(value). A select only
+    counts as present once it has the requested option.
+    """
+    fields = [[name, _candidates(locator), value] for name, locator, value in fields]
+    missing = []
+
+    def condition(driver):
+        result = driver.execute_script(FILL_FORM_SCRIPT, fields)
+        missing[:] = result.get("missing", [])
+        return False if missing else result
+
+    try:
+        result = wait_until(driver, condition, timeout, description, replaces)
+    except TimeoutException:
+        raise TimeoutException(f"{description}: fields not found: {', '.join(missing)}") from None
+
+    candidates = {name: locators for name, locators, _ in fields}
+    for name, index in result.get("fallbacks", {}).items():
+        _log_fallback(f"{description} ({name})", candidates[name], index)
+    return True
@@ -0,0 +1,204 @@
+import atexit
+import base64
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from common.tracing import current_trace
+
+# Shared with bot subprocesses so their artifacts land in the same run directory
+ARTIFACTS_DIR_ENV = "AIRLINE_BOTS_ARTIFACTS_DIR"
+RUN_ID_ENV = "AIRLINE_BOTS_RUN_ID"
+
+SCREENSHOT_QUALITY = 50
+RETENTION_CHECK_INTERVAL = 60
+
+
+@dataclass
+class FailureArtifact:
+    airline: str
+    reservation_code: str
+    error: str
+    screenshot: bytes = b""
+    screenshot_format: str = "png"
+    dom: str = ""
+    spans: list = field(default_factory=list)
+    captured_at: float = field(default_factory=time.time)
+
+
+def capture_screenshot(driver):
+    """A JPEG straight from the browser when CDP is available, else the PNG screenshot."""
+    try:
+        result = driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "jpeg", "quality": SCREENSHOT_QUALITY})
+        return base64.b64decode(result["data"]), "jpg"
+    except Exception:
+        return driver.get_screenshot_as_png(), "png"
+
+
+def slug(value):
+    return re.sub(r"[^A-Za-z0-9]+", "-", value).strip("-").lower()
+
+
+class ArtifactWriter:
+    """
+    Writes failure artifacts on a background thread.
+
+    Workers only grab the screenshot and DOM from the browser and hand them off;
+    compression and disk I/O happen here. The queue is bounded and submissions never
+    block: when it is full the artifact is dropped with a warning. Old artifacts are
+    pruned by age and total size.
+    """
+
+    def __init__(self, root="artifacts", run_id=None, max_queue=32, max_bytes=500 * 1024 * 1024, max_age_days=7):
+        self.root = root
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.dropped = 0
+        self.written = 0
+        self._closed = False
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_retention = 0.0
+        self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, artifact):
+        try:
+            self._queue.put_nowait(artifact)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"Artifact queue full, dropping failure artifact for {artifact.reservation_code}")
+            return False
+
+    def _run(self):
+        while True:
+            artifact = self._queue.get()
+            if artifact is None:
+                break
+            try:
+                self._write(artifact)
+                self.written += 1
+            except Exception as e:
+                logging.error(f"Failed to write artifact for {artifact.reservation_code}: {str(e)}")
+            if time.monotonic() - self._last_retention > RETENTION_CHECK_INTERVAL:
+                self.enforce_retention()
+
+    def _write(self, artifact):
+        stamp = datetime.fromtimestamp(artifact.captured_at).strftime("%H%M%S-%f")
+        directory = os.path.join(self.root, self.run_id, slug(artifact.airline), f"{artifact.reservation_code}-{stamp}")
+        os.makedirs(directory, exist_ok=True)
+
+        if artifact.screenshot:
+            with open(os.path.join(directory, f"screenshot.{artifact.screenshot_format}"), "wb") as file:
+                file.write(artifact.screenshot)
+        if artifact.dom:
+            with gzip.open(os.path.join(directory, "dom.html.gz"), "wt", encoding="utf-8") as file:
+                file.write(artifact.dom)
+        with open(os.path.join(directory, "trace.json"), "w") as file:
+            json.dump({
+                "airline": artifact.airline,
+                "reservation_code": artifact.reservation_code,
+                "error": artifact.error,
+                "captured_at": datetime.fromtimestamp(artifact.captured_at).isoformat(),
+                "spans": artifact.spans,
+            }, file, indent=2)
+        logging.info(f"Saved failure artifact to {directory}")
+
+    def _artifact_dirs(self):
+        """Every artifact directory as (mtime, size, path), oldest first."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if filenames and not dirnames:
+                size = sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+                entries.append((os.path.getmtime(dirpath), size, dirpath))
+        return sorted(entries)
+
+    def enforce_retention(self):
+        self._last_retention = time.monotonic()
+        if not os.path.isdir(self.root):
+            return
+        entries = self._artifact_dirs()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logging.info(f"Removed {removed} old failure artifacts, {total / 1024 / 1024:.1f} MB kept")
+
+    def close(self, timeout=30):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.enforce_retention()
+        if self.dropped:
+            logging.warning(f"Dropped {self.dropped} failure artifacts because the writer fell behind")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure_artifacts(root, run_id=None, **options):
+    """Create the process-wide writer and share its location with bot subprocesses."""
+    global _writer
+    root = os.path.abspath(root)
+    with _writer_lock:
+        _writer = ArtifactWriter(root, run_id, **options)
+        atexit.register(_writer.close)
+    os.environ[ARTIFACTS_DIR_ENV] = root
+    os.environ[RUN_ID_ENV] = _writer.run_id
+    return _writer
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter(os.environ.get(ARTIFACTS_DIR_ENV, "artifacts"), os.environ.get(RUN_ID_ENV))
+            atexit.register(_writer.close)
+        return _writer
+
+
+def capture_failure(driver, airline, reservation_code, error):
+    """Grab the screenshot, DOM and step trace of a failed check-in and queue them for writing."""
+    artifact = FailureArtifact(airline, reservation_code, str(error))
+    try:
+        artifact.screenshot, artifact.screenshot_format = capture_screenshot(driver)
+        artifact.dom = driver.page_source
+    except Exception as e:
+        logging.warning(f"Could not capture browser state for {reservation_code}: {str(e)}")
+    trace = current_trace()
+    if trace is not None:
+        artifact.spans = list(trace.spans)
+    return get_writer().submit(artifact)
+
+
+async def capture_page_failure(page, airline, reservation_code, error):
+    """capture_failure for a Playwright page of the contexts engine."""
+    artifact = FailureArtifact(airline, reservation_code, str(error))
+    try:
+        artifact.screenshot = await page.screenshot(type="jpeg", quality=SCREENSHOT_QUALITY)
+        artifact.screenshot_format = "jpg"
+        artifact.dom = await page.content()
+    except Exception as e:
+        logging.warning(f"Could not capture browser state for {reservation_code}: {str(e)}")
+    trace = current_trace()
+    if trace is not None:
+        artifact.spans = list(trace.spans)
+    return get_writer().submit(artifact)
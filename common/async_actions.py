@@ -0,0 +1,252 @@
+"""
+Asyncio counterparts of common.actions, common.waits, common.network and
+common.boarding_passes for Playwright pages, used by the bots'
+perform_checkin_async flows (see common.contexts). The in-page scripts are
+shared with the Selenium versions, so both engines locate and fill elements the
+same way.
+"""
+import asyncio
+import logging
+import time
+
+from common.actions import FILL_FORM_SCRIPT, FIND_FIRST_SCRIPT, _candidates, _log_fallback
+from common.boarding_passes import PDF_MIME_TYPES, get_store, is_pdf
+from common.network import ConfirmationFailed, record_confirmation
+from common.rate_limit import CHALLENGE_SCRIPT, report_throttle
+from common.tracing import span
+from common.waits import ANIMATIONS_FINISHED_SCRIPT, NETWORK_IDLE_SCRIPT, SPINNER_SELECTORS, WAIT_STATS
+
+POLL_INTERVAL = 0.1
+
+# Runs a Selenium-style script body (arguments[i], return) in the page. DOM nodes
+# cannot leave the page, so they come back as true.
+EVALUATE_WRAPPER = """
+args => {
+    const result = (function() { %s }).apply(null, args);
+    const plain = value => value instanceof Node ? true : value;
+    return Array.isArray(result) ? result.map(plain) : plain(result);
+}
+"""
+
+
+async def execute_script(page, script, *args):
+    return await page.evaluate(EVALUATE_WRAPPER % script, list(args))
+
+
+async def check_challenge(page):
+    """See common.rate_limit.check_challenge."""
+    try:
+        challenged = await execute_script(page, CHALLENGE_SCRIPT)
+    except Exception:
+        return False
+    if challenged:
+        report_throttle("bot challenge")
+    return bool(challenged)
+
+
+async def wait_for(page, condition, timeout, description, replaces=0, required=True):
+    """
+    Await `condition(page)` every POLL_INTERVAL seconds until it returns something
+    truthy, recording the wait like common.waits.wait_until. Raises TimeoutError, or
+    returns None when `required` is False.
+    """
+    started = time.monotonic()
+    timed_out = False
+    try:
+        with span(f"wait: {description}"):
+            deadline = started + timeout
+            while True:
+                result = await condition(page)
+                if result:
+                    return result
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+        timed_out = True
+        if required:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for: {description}")
+        logging.warning(f"Timed out after {timeout}s waiting for: {description}")
+        return None
+    finally:
+        WAIT_STATS.record(description, time.monotonic() - started, timed_out, replaces)
+
+
+def spinner_gone(selectors=SPINNER_SELECTORS):
+    async def condition(page):
+        return await execute_script(
+            page, "return Array.from(document.querySelectorAll(arguments[0])).every(e => !e.offsetParent);", selectors)
+    return condition
+
+
+def network_idle(quiet_ms=500):
+    async def condition(page):
+        return await execute_script(page, NETWORK_IDLE_SCRIPT, quiet_ms)
+    return condition
+
+
+def animations_finished():
+    async def condition(page):
+        return await execute_script(page, ANIMATIONS_FINISHED_SCRIPT)
+    return condition
+
+
+def element_gone(locator):
+    """None of the candidates has a visible match."""
+    visible = first_match(locator)
+
+    async def condition(page):
+        return not await visible(page)
+    return condition
+
+
+def all_of(*conditions):
+    async def condition(page):
+        result = True
+        for check in conditions:
+            result = await check(page)
+            if not result:
+                return False
+        return result
+    return condition
+
+
+def first_match(locator, enabled=False, click=False):
+    candidates = _candidates(locator)
+
+    async def condition(page):
+        return await execute_script(page, FIND_FIRST_SCRIPT, candidates, enabled or click, click)
+    return condition
+
+
+async def find_first(page, locator, timeout, description, enabled=False, replaces=0, required=True):
+    """True once one of the candidates matches; see common.actions.find_first."""
+    candidates = _candidates(locator)
+    match = await wait_for(page, first_match(candidates, enabled), timeout, description, replaces, required)
+    if match and match[0]:
+        _log_fallback(description, candidates, match[0])
+    return bool(match)
+
+
+async def click_first(page, locator, timeout, description, replaces=0, required=True):
+    candidates = _candidates(locator)
+    match = await wait_for(page, first_match(candidates, click=True), timeout, description, replaces, required)
+    if match and match[0]:
+        _log_fallback(description, candidates, match[0])
+    return bool(match)
+
+
+async def fill_form(page, fields, timeout, description, replaces=0):
+    """Fill a whole form step in one script; see common.actions.fill_form."""
+    fields = [[name, _candidates(locator), value] for name, locator, value in fields]
+    missing = []
+
+    async def condition(page):
+        result = await execute_script(page, FILL_FORM_SCRIPT, fields)
+        missing[:] = result.get("missing", [])
+        return False if missing else result
+
+    try:
+        result = await wait_for(page, condition, timeout, description, replaces)
+    except TimeoutError:
+        raise TimeoutError(f"{description}: fields not found: {', '.join(missing)}") from None
+
+    candidates = {name: locators for name, locators, _ in fields}
+    for name, index in result.get("fallbacks", {}).items():
+        _log_fallback(f"{description} ({name})", candidates[name], index)
+    return True
+
+
+class ResponseWatch:
+    """Page event listener for the response to a request matching a ResponseMatcher."""
+
+    def __init__(self, page, matcher):
+        self.page = page
+        self.matcher = matcher
+        self.outcome = None
+        page.on("response", self._on_response)
+        page.on("requestfailed", self._on_failed)
+
+    def _matches(self, request):
+        return self.outcome is None and self.matcher.matches(request.url, request.method)
+
+    def _on_response(self, response):
+        if self._matches(response.request):
+            self.outcome = (response.status, response.url)
+
+    def _on_failed(self, request):
+        if self._matches(request):
+            self.outcome = (0, request.url)
+
+    def close(self):
+        self.page.remove_listener("response", self._on_response)
+        self.page.remove_listener("requestfailed", self._on_failed)
+
+
+async def confirm_response(page, watch, timeout, description, fallback=None, replaces=0):
+    """Same contract as common.network.confirm_response; `fallback` is an async condition."""
+    async def condition(page):
+        if watch.outcome:
+            status, url = watch.outcome
+            if watch.matcher.is_success(status):
+                return "network"
+            record_confirmation(description, "failed")
+            raise ConfirmationFailed(f"{description}: {url} answered with status {status or 'network error'}")
+        if fallback and await fallback(page):
+            return "dom"
+        return False
+
+    try:
+        signal = await wait_for(page, condition, timeout, description, replaces)
+    except TimeoutError:
+        record_confirmation(description, "timeout")
+        raise
+    finally:
+        watch.close()
+    record_confirmation(description, signal)
+    return signal
+
+
+class PdfCapture:
+    """Reads the body of every PDF response on the page; see common.boarding_passes.PdfCapture."""
+
+    def __init__(self, page, matcher=None):
+        self.page = page
+        self.matcher = matcher
+        self.pdfs = []
+        self._reads = []
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if content_type in PDF_MIME_TYPES or (self.matcher and self.matcher.matches(response.url, response.request.method)):
+            self._reads.append(asyncio.ensure_future(self._read(response)))
+
+    async def _read(self, response):
+        try:
+            content = await response.body()
+        except Exception:
+            # Downloads have no body left in the page, so fetch it again with the context's cookies
+            try:
+                content = await (await self.page.context.request.get(response.url)).body()
+            except Exception as e:
+                logging.warning(f"Failed to read PDF from {response.url}: {str(e)}")
+                return
+        if is_pdf(content):
+            self.pdfs.append(content)
+
+    def close(self):
+        self.page.remove_listener("response", self._on_response)
+
+
+async def capture_boarding_passes(page, capture, airline, reservation_code, timeout, description, expected=1, replaces=0):
+    """Same contract as common.boarding_passes.capture_boarding_passes."""
+    async def condition(page):
+        return len(capture.pdfs) >= expected
+
+    try:
+        await wait_for(page, condition, timeout, description, replaces, required=False)
+    finally:
+        capture.close()
+    store = get_store()
+    # The same PDF often shows up twice, e.g. as the API response and as the blob it is saved from
+    return [store.save(airline, reservation_code, content) for content in dict.fromkeys(capture.pdfs)]
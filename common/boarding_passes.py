@@ -0,0 +1,185 @@
+"""
+Boarding-pass PDFs captured from the browser's network traffic into memory and
+kept in a store organized by reservation:
+
+    boarding_passes/<airline>/<RESERVATION>/<sha256>.pdf
+
+Files are named by their hash, so the same PDF captured twice (a retry, or every
+passenger of a group) is stored once.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+
+from common.artifacts import slug
+from common.network import read_network_events
+from common.waits import wait_until
+
+# Shared with bot subprocesses so their boarding passes land in the same store
+BOARDING_PASSES_DIR_ENV = "AIRLINE_BOTS_BOARDING_PASSES_DIR"
+# Prefix of the lines a bot subprocess prints to hand its boarding passes back
+BOARDING_PASS_PREFIX = "BOARDING_PASS "
+PDF_MAGIC = b"%PDF-"
+PDF_MIME_TYPES = ("application/pdf", "application/x-pdf")
+
+# Re-downloads a PDF with the page's cookies when Chrome did not keep the response body
+FETCH_PDF_SCRIPT = """
+const [url, done] = [arguments[0], arguments[arguments.length - 1]];
+fetch(url, {credentials: 'include'})
+    .then(response => response.arrayBuffer())
+    .then(buffer => {
+        const bytes = new Uint8Array(buffer);
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+        }
+        done(btoa(binary));
+    })
+    .catch(() => done(null));
+"""
+
+
+def is_pdf(content):
+    return content[:len(PDF_MAGIC)] == PDF_MAGIC
+
+
+@dataclass(frozen=True)
+class BoardingPass:
+    airline: str
+    reservation_code: str
+    sha256: str
+    path: str
+    size: int
+    duplicate: bool = False
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class BoardingPassStore:
+    def __init__(self, root="boarding_passes"):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def save(self, airline, reservation_code, content):
+        """Store one PDF and return its BoardingPass; raises ValueError when the content is not a PDF."""
+        if not is_pdf(content):
+            raise ValueError(f"Boarding pass for {reservation_code} is not a PDF ({len(content)} bytes)")
+        sha256 = hashlib.sha256(content).hexdigest()
+        directory = os.path.join(self.root, slug(airline), reservation_code.strip().upper())
+        path = os.path.join(directory, f"{sha256}.pdf")
+        with self._lock:
+            if os.path.exists(path):
+                return BoardingPass(airline, reservation_code, sha256, path, len(content), duplicate=True)
+            os.makedirs(directory, exist_ok=True)
+            # Written under a temporary name first so a concurrent reader never sees half a file
+            partial = f"{path}.{os.getpid()}.part"
+            with open(partial, "wb") as file:
+                file.write(content)
+            os.replace(partial, path)
+        return BoardingPass(airline, reservation_code, sha256, path, len(content))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def configure_boarding_passes(root):
+    global _store
+    # Bot subprocesses may run from another working directory
+    root = os.path.abspath(root)
+    with _store_lock:
+        _store = BoardingPassStore(root)
+    os.environ[BOARDING_PASSES_DIR_ENV] = root
+    return _store
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BoardingPassStore(os.environ.get(BOARDING_PASSES_DIR_ENV, "boarding_passes"))
+        return _store
+
+
+def emit_boarding_passes(boarding_passes):
+    for boarding_pass in boarding_passes:
+        print(BOARDING_PASS_PREFIX + json.dumps(boarding_pass.to_dict()), flush=True)
+
+
+def parse_emitted_boarding_passes(output):
+    """BoardingPasses printed by a bot subprocess with emit_boarding_passes."""
+    boarding_passes = []
+    for line in (output or "").splitlines():
+        if line.startswith(BOARDING_PASS_PREFIX):
+            boarding_passes.append(BoardingPass(**json.loads(line[len(BOARDING_PASS_PREFIX):])))
+    return boarding_passes
+
+
+class PdfCapture:
+    """
+    Catches PDF responses in the performance log (see common.network) and reads
+    their bodies through CDP, so nothing is downloaded to disk.
+
+    Like ResponseWatch it drains the log when created: create it right before the
+    click that requests the PDF, and not while a ResponseWatch is active.
+    """
+
+    def __init__(self, driver, matcher=None):
+        self.driver = driver
+        self.matcher = matcher
+        self.pdfs = []
+        self._requests = {}
+        self._pdf_requests = set()
+        self.available = read_network_events(driver) is not None
+
+    def _is_pdf_response(self, request_id, response):
+        return request_id in self._requests or response.get("mimeType") in PDF_MIME_TYPES
+
+    def poll(self):
+        """Read every PDF whose response completed since the last poll; returns how many were captured so far."""
+        for event in read_network_events(self.driver) or []:
+            params = event["params"]
+            request_id = params.get("requestId")
+            if event["method"] == "Network.requestWillBeSent":
+                request = params["request"]
+                if self.matcher and self.matcher.matches(request["url"], request["method"]):
+                    self._requests[request_id] = request["url"]
+            elif event["method"] == "Network.responseReceived":
+                response = params["response"]
+                if self._is_pdf_response(request_id, response):
+                    self._requests[request_id] = response["url"]
+                    self._pdf_requests.add(request_id)
+            elif event["method"] in ("Network.loadingFinished", "Network.loadingFailed") and request_id in self._pdf_requests:
+                self._pdf_requests.discard(request_id)
+                content = self._read_body(request_id, self._requests[request_id])
+                if content and is_pdf(content):
+                    self.pdfs.append(content)
+        return len(self.pdfs)
+
+    def _read_body(self, request_id, url):
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            if body.get("base64Encoded"):
+                return base64.b64decode(body["body"])
+            return body["body"].encode("latin-1")
+        except Exception:
+            # Downloads and evicted responses have no body left in the browser
+            encoded = self.driver.execute_async_script(FETCH_PDF_SCRIPT, url)
+            return base64.b64decode(encoded) if encoded else None
+
+
+def capture_boarding_passes(driver, capture, airline, reservation_code, timeout, description, expected=1, replaces=0):
+    """
+    Wait until `expected` PDFs were captured and save them to the store. Returns
+    the BoardingPasses, or an empty list when none arrived in time.
+    """
+    if not capture.available:
+        return []
+    wait_until(driver, lambda driver: capture.poll() >= expected, timeout, description, replaces, required=False)
+    store = get_store()
+    # The same PDF often shows up twice, e.g. as the API response and as the blob it is saved from
+    return [store.save(airline, reservation_code, content) for content in dict.fromkeys(capture.pdfs)]
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from common.tracing import current_trace
+
+# Shared with bot subprocesses so they block the same resources as the parent's profile
+BROWSER_PROFILE_ENV = "AIRLINE_BOTS_BROWSER_PROFILE"
+# Span a bot records with the page metrics of its check-in, read back by ProfileReport.record_spans
+PAGE_METRICS_STEP = "page_metrics"
+
+# URL patterns (Network.setBlockedURLs wildcard syntax) for each blockable resource type
+RESOURCE_TYPE_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg", "*.mov"],
+}
+
+# Third-party analytics, ads and session-replay hosts seen on the airline sites
+TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googleadservices.com*",
+    "*googlesyndication.com*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*bat.bing.com*",
+    "*tiktok.com*",
+    "*criteo.com*",
+    "*taboola.com*",
+    "*analytics.twitter.com*",
+    "*quantummetric.com*",
+]
+
+PAGE_METRICS_SCRIPT = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+const navigation = performance.getEntriesByType('navigation')[0];
+return {
+    transfer_bytes: entries.reduce((total, e) => total + (e.transferSize || 0), 0),
+    requests: entries.length,
+    load_ms: navigation ? Math.max(navigation.loadEventEnd, navigation.domContentLoadedEventEnd) : null,
+};
+"""
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    name: str = "full"
+    headless: bool = False
+    block_resource_types: tuple = ()
+    block_url_patterns: tuple = ()
+
+    @property
+    def blocked_urls(self):
+        patterns = []
+        for resource_type in self.block_resource_types:
+            patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+        patterns.extend(self.block_url_patterns)
+        return patterns
+
+    @property
+    def blocks_images(self):
+        return "image" in self.block_resource_types
+
+
+FULL_PROFILE = BrowserProfile()
+
+
+def lean_profile(block_resource_types=("image", "font", "media"), block_url_patterns=()):
+    unknown = set(block_resource_types) - set(RESOURCE_TYPE_PATTERNS)
+    if unknown:
+        raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+    return BrowserProfile(
+        name="lean",
+        headless=True,
+        block_resource_types=tuple(block_resource_types),
+        block_url_patterns=tuple(TRACKER_PATTERNS) + tuple(block_url_patterns),
+    )
+
+
+def configure_browser_profile(profile):
+    os.environ[BROWSER_PROFILE_ENV] = json.dumps(asdict(profile))
+    return profile
+
+
+def get_profile(name):
+    """The profile configured with configure_browser_profile when it is `name`, else the default one."""
+    configured = os.environ.get(BROWSER_PROFILE_ENV)
+    if configured:
+        settings = json.loads(configured)
+        if settings["name"] == name:
+            return BrowserProfile(**{key: tuple(value) if isinstance(value, list) else value
+                                     for key, value in settings.items()})
+    return lean_profile() if name == "lean" else FULL_PROFILE
+
+
+def apply_profile(driver, profile):
+    """Block the profile's URL patterns through CDP request interception."""
+    if not profile.blocked_urls:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.blocked_urls})
+    except Exception as e:
+        logging.warning(f"Could not enable request blocking: {str(e)}")
+
+
+def collect_page_metrics(driver):
+    try:
+        return driver.execute_script(PAGE_METRICS_SCRIPT)
+    except Exception as e:
+        logging.debug(f"Could not collect page metrics: {str(e)}")
+        return None
+
+
+def record_page_metrics(driver, profile):
+    """Called by a bot subprocess after its check-in, so the metrics reach the orchestrator's ProfileReport."""
+    current = current_trace()
+    metrics = collect_page_metrics(driver)
+    if current is not None and metrics:
+        current.mark(PAGE_METRICS_STEP, time.time(), 0, True, profile=profile.name, **metrics)
+
+
+class ProfileReport:
+    """
+    Bytes transferred and page-load time per airline flow and browser profile.
+
+    Totals are merged into a JSON file across runs so a lean run can be compared
+    with an earlier full run of the same flows.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._totals = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self._totals = json.load(file)
+
+    def record(self, airline, profile, metrics):
+        self._add(airline, profile.name, metrics)
+
+    def record_spans(self, spans):
+        """Record the page metrics bots recorded as spans, e.g. the spans read back from a subprocess."""
+        for record in spans:
+            if record["step"] == PAGE_METRICS_STEP:
+                self._add(record["airline"], record["profile"], record)
+
+    def _add(self, airline, profile_name, metrics):
+        if not metrics:
+            return
+        with self._lock:
+            totals = self._totals.setdefault(airline, {}).setdefault(profile_name, {
+                "flows": 0, "transfer_bytes": 0, "requests": 0, "load_ms": 0.0,
+            })
+            totals["flows"] += 1
+            totals["transfer_bytes"] += metrics["transfer_bytes"]
+            totals["requests"] += metrics["requests"]
+            totals["load_ms"] += metrics["load_ms"] or 0
+
+    def averages(self, airline, profile_name):
+        totals = self._totals.get(airline, {}).get(profile_name)
+        if not totals or not totals["flows"]:
+            return None
+        return {key: totals[key] / totals["flows"] for key in ("transfer_bytes", "requests", "load_ms")}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            with open(self.path, "w") as file:
+                json.dump(self._totals, file, indent=2)
+
+    def log_summary(self):
+        if not self._totals:
+            return
+        logging.info("Browser profile report (average per airline flow):")
+        for airline in sorted(self._totals):
+            for profile_name in sorted(self._totals[airline]):
+                avg = self.averages(airline, profile_name)
+                logging.info(
+                    f"  {airline} [{profile_name}]: {avg['transfer_bytes'] / 1024:.0f} KiB in "
+                    f"{avg['requests']:.0f} requests, page load {avg['load_ms']:.0f}ms"
+                )
+            full, lean = self.averages(airline, "full"), self.averages(airline, "lean")
+            if full and lean:
+                logging.info(
+                    f"  {airline} lean saves {(full['transfer_bytes'] - lean['transfer_bytes']) / 1024:.0f} KiB "
+                    f"and {full['load_ms'] - lean['load_ms']:.0f}ms per flow"
+                )
@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlsplit
+
+from common.browser import FULL_PROFILE
+from common.governor import driver_pids
+from common.profiles import clear_reservation_cookies, release_profile
+
+# Everything except the HTTP cache, which is safe to share between reservations
+CLEARED_STORAGE_TYPES = "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+# Warm profiles also keep their consent and bot-challenge cookies, see common.profiles
+WARM_CLEARED_STORAGE_TYPES = CLEARED_STORAGE_TYPES.replace("cookies,", "")
+
+
+def reset_session(driver):
+    """
+    Clear cookies and storage left behind by the previous reservation. A browser
+    on a warm profile keeps the cookies listed in common.profiles.RETAINED_COOKIES.
+    """
+    warm = getattr(driver, "profile_lease", None) is not None
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    parts = urlsplit(driver.current_url)
+    if parts.scheme in ("http", "https"):
+        origin = f"{parts.scheme}://{parts.netloc}"
+        try:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                "origin": origin, "storageTypes": WARM_CLEARED_STORAGE_TYPES if warm else CLEARED_STORAGE_TYPES,
+            })
+        except Exception:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+
+    try:
+        if warm:
+            clear_reservation_cookies(driver)
+        else:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except Exception:
+        driver.delete_all_cookies()
+    driver.get("about:blank")
+
+
+class BrowserSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created = time.monotonic()
+
+    @property
+    def pids(self):
+        # Looked up each time: the uc reconnect of an Open step restarts chromedriver
+        return driver_pids(self.driver)
+
+
+class BrowserPool:
+    """
+    A fixed-size pool of warm browser sessions for one airline.
+
+    Sessions are reset between leases and quit after `max_uses` reservations
+    (0 keeps them forever) so long batches do not accumulate browser state. With a
+    ResourceGovernor they are also quit once their processes use too much memory.
+    """
+
+    def __init__(self, name, factory, max_size, max_uses=0, governor=None):
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.governor = governor
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.popleft()
+            self._size += 1
+
+        try:
+            logging.info(f"Starting browser for {self.name} pool")
+            return BrowserSession(self.factory())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _discard(self, session):
+        # Taken before quit, after which the session's PIDs may be reused
+        processes = self.governor.snapshot(session.pids) if self.governor else []
+        try:
+            session.driver.quit()
+        except Exception as e:
+            logging.warning(f"Failed to quit {self.name} browser: {str(e)}")
+        release_profile(session.driver)
+        if self.governor:
+            self.governor.reap(processes)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _release(self, session):
+        session.uses += 1
+        if self._closed or (self.max_uses and session.uses >= self.max_uses):
+            logging.info(f"Recycling {self.name} browser after {session.uses} uses")
+            self._discard(session)
+            return
+
+        reason = self.governor.recycle_reason(session.pids) if self.governor else None
+        if reason:
+            logging.info(f"Recycling {self.name} browser after {session.uses} uses, {reason}")
+            self._discard(session)
+            return
+
+        try:
+            reset_session(session.driver)
+        except Exception as e:
+            logging.warning(f"Failed to reset {self.name} browser, discarding it: {str(e)}")
+            self._discard(session)
+            return
+
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    def warm(self, count=1):
+        """Start up to `count` idle sessions ahead of the first lease."""
+        started = 0
+        while started < count:
+            with self._cond:
+                if self._closed or self._size >= self.max_size:
+                    return started
+                self._size += 1
+            try:
+                logging.info(f"Warming up browser for {self.name} pool")
+                session = BrowserSession(self.factory())
+            except Exception as e:
+                logging.warning(f"Failed to warm up {self.name} browser: {str(e)}")
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return started
+            with self._cond:
+                closed = self._closed
+                if not closed:
+                    self._idle.append(session)
+                    self._cond.notify()
+            if closed:
+                self._discard(session)
+                return started
+            started += 1
+        return started
+
+    @contextmanager
+    def lease(self):
+        session = self._acquire()
+        try:
+            yield session.driver
+        finally:
+            self._release(session)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for session in idle:
+            self._discard(session)
+
+
+class BrowserPools:
+    """
+    One BrowserPool per airline, created on first use. With `profiles` (see
+    common.profiles) every browser starts in a persistent warm profile.
+    """
+
+    def __init__(self, max_sizes, max_uses=0, profile=FULL_PROFILE, governor=None, profiles=None):
+        self.max_sizes = max_sizes
+        self.max_uses = max_uses
+        self.profile = profile
+        self.governor = governor
+        self.profiles = profiles
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, airline):
+        with self._lock:
+            pool = self._pools.get(airline.name)
+            if pool is None:
+                factory = partial(airline.create_driver, self.profile, self.profiles)
+                pool = BrowserPool(airline.name, factory, self.max_sizes(airline.name), self.max_uses, self.governor)
+                self._pools[airline.name] = pool
+            return pool
+
+    def lease(self, airline):
+        return self.get(airline).lease()
+
+    def warm(self, airlines, count=1):
+        for airline in airlines:
+            self.get(airline).warm(count)
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,107 @@
+"""
+Multi-context engine: every check-in runs in its own isolated browser context
+(separate cookies, storage and cache) inside one shared Chromium per airline,
+driven by Playwright on a single asyncio event loop.
+
+A context costs a few MB instead of the few hundred of a Chrome process per
+reservation, so concurrency is bound by the airline limits rather than memory.
+The orchestrator's worker threads only wait on the coroutines, which keeps
+retries, circuit breakers, scheduling and the daemon working unchanged.
+
+Playwright is optional: pip install playwright && playwright install chromium
+"""
+import asyncio
+import logging
+import re
+import threading
+
+from common.browser import FULL_PROFILE
+from common.tracing import trace
+from common.waits import NETWORK_TRACKER_SCRIPT
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:
+    async_playwright = None
+
+
+def wildcard_regex(pattern):
+    """Network.setBlockedURLs wildcard (e.g. '*.png') as a regex for context.route."""
+    return re.compile("^" + ".*".join(re.escape(part) for part in pattern.split("*")) + "$")
+
+
+class ContextEngine:
+    """
+    Owns the event loop thread and one Chromium per airline. `checkin` is called
+    from the orchestrator's worker threads and blocks until the check-in finishes.
+    """
+
+    def __init__(self, profile=FULL_PROFILE, collector=None):
+        if async_playwright is None:
+            raise RuntimeError("The contexts engine needs Playwright: pip install playwright && playwright install chromium")
+        self.profile = profile
+        self.collector = collector
+        self.contexts_opened = 0
+        self._browsers = {}
+        self._playwright = None
+        self._launch_lock = None
+        self._blocked = [wildcard_regex(pattern) for pattern in profile.blocked_urls]
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="contexts-engine", daemon=True)
+        self._thread.start()
+        self._call(self._start())
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._launch_lock = asyncio.Lock()
+
+    async def _browser(self, airline):
+        async with self._launch_lock:
+            browser = self._browsers.get(airline.name)
+            if browser is None:
+                headless = self.profile.headless and airline.module.HEADLESS_SUPPORTED
+                logging.info(f"Launching shared {'headless ' if headless else ''}browser for {airline.name} contexts")
+                browser = await self._playwright.chromium.launch(headless=headless)
+                self._browsers[airline.name] = browser
+            return browser
+
+    async def _block(self, route):
+        await route.abort()
+
+    async def _checkin(self, airline, reservation):
+        browser = await self._browser(airline)
+        context = await browser.new_context()
+        self.contexts_opened += 1
+        with trace(airline.name, reservation['reservation_code']) as checkin_trace:
+            try:
+                for pattern in self._blocked:
+                    await context.route(pattern, self._block)
+                await context.add_init_script(NETWORK_TRACKER_SCRIPT)
+                page = await context.new_page()
+                return await airline.perform_checkin_async(page, reservation)
+            finally:
+                await context.close()
+                if self.collector:
+                    self.collector.add(checkin_trace.spans)
+
+    def checkin(self, airline, reservation):
+        return self._call(self._checkin(airline, reservation))
+
+    async def _close(self):
+        for browser in self._browsers.values():
+            await browser.close()
+        self._browsers.clear()
+        await self._playwright.stop()
+
+    def close(self):
+        if not self.loop.is_running():
+            return
+        try:
+            self._call(self._close())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(10)
+            logging.info(f"Contexts engine closed after {self.contexts_opened} browser contexts")
@@ -0,0 +1,459 @@
+"""
+Long-running check-in service with a local HTTP API.
+
+Workers and pooled browsers stay resident between reservations, so a submitted
+reservation is dispatched within IDLE_POLL seconds on a warm browser instead of
+waiting for the next batch run.
+
+    POST   /jobs          submit one reservation (JSON object) or a list of them
+    GET    /jobs          list jobs, optionally filtered with ?state=queued
+    GET    /jobs/<id>     status of one job
+    DELETE /jobs/<id>     cancel a job that has not started yet
+    GET    /jobs/stream   newline-delimited JSON of every job as it finishes
+    GET    /stats         queue depth, worker utilization, per-airline state and worker resources
+
+Listens on 127.0.0.1 by default, or on a Unix socket with --socket.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import signal
+import socketserver
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from common.journal import FAILED, SUCCEEDED, journal_key
+from common.orchestrator import airline_key
+from common.preflight import check_reservation
+from common.resilience import CheckinCancelled
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+# A blank line is written to idle result streams this often to detect closed clients
+STREAM_HEARTBEAT = 15
+# Finished jobs kept for the API; older ones are forgotten first
+KEEP_FINISHED_JOBS = 10000
+
+
+class JobCancelled(CheckinCancelled):
+    """The job was cancelled before it started; never retried."""
+
+
+@dataclass
+class Job:
+    id: str
+    reservation: dict
+    state: str = QUEUED
+    attempts: int = 0
+    error: str = ""
+    submitted: float = field(default_factory=time.time)
+    started: float = 0.0
+    finished: float = 0.0
+    boarding_passes: list = field(default_factory=list)
+
+    @property
+    def airline(self):
+        return airline_key(self.reservation['airline'])
+
+    def to_dict(self):
+        # The email and date of birth stay out of API responses
+        return {
+            "id": self.id,
+            "airline": self.airline,
+            "reservation_code": self.reservation['reservation_code'],
+            "last_name": self.reservation['last_name'],
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started or None,
+            "finished": self.finished or None,
+            "boarding_passes": [boarding_pass.to_dict() for boarding_pass in self.boarding_passes],
+        }
+
+
+class JobQueue:
+    """
+    Live source for Orchestrator.run: yields submitted reservations, None while it is
+    empty, and stops once closed and drained. Cancelled jobs are dropped.
+    """
+
+    def __init__(self):
+        self._jobs = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def put(self, job):
+        with self._lock:
+            self._jobs.append(job)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            while self._jobs:
+                job = self._jobs.popleft()
+                if job.state == QUEUED:
+                    return job.reservation
+            if self._closed:
+                raise StopIteration
+            return None
+
+
+class CheckinDaemon:
+    """
+    Keeps an Orchestrator running over a JobQueue and tracks every submitted job, up
+    to the last `keep_finished` finished ones.
+    """
+
+    def __init__(self, orchestrator, journal, prepare=None, governor=None, keep_finished=KEEP_FINISHED_JOBS):
+        self.orchestrator = orchestrator
+        self.journal = journal
+        self.prepare = prepare
+        self.governor = governor
+        self.keep_finished = keep_finished
+        self.queue = JobQueue()
+        self.jobs = {}
+        self._finished = deque()
+        # Latest job per journal_key, to spot a reservation submitted twice
+        self._active = {}
+        self.started = time.time()
+        self.stopping = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.orchestrator.runner = self._wrap(orchestrator.runner)
+
+    def _wrap(self, runner):
+        def run(reservation):
+            with self._lock:
+                job = self.jobs.get(reservation['job_id'])
+                if job is None or job.state == CANCELLED or self.stopping:
+                    raise JobCancelled("Cancelled before it started")
+                job.state = RUNNING
+                job.attempts += 1
+                job.started = job.started or time.time()
+            try:
+                return runner(reservation)
+            finally:
+                with self._lock:
+                    # Back to queued until the orchestrator reports the outcome or retries it
+                    if job.state == RUNNING:
+                        job.state = QUEUED
+        return run
+
+    def submit(self, reservations):
+        """
+        Validate, normalize and queue reservations; returns their jobs, reusing the job of a
+        reservation that is already queued or running. Raises ValueError on invalid input.
+        """
+        normalized = []
+        for number, reservation in enumerate(reservations, 1):
+            try:
+                normalized.append(check_reservation(reservation))
+            except ValueError as e:
+                raise ValueError(f"Reservation {number}: {e}") from None
+
+        jobs = []
+        for reservation in normalized:
+            key = journal_key(reservation)
+            status, attempts = self.journal.lookup(reservation)
+            with self._lock:
+                # A reservation submitted again while its job is queued or running gets that job back
+                active = self._active.get(key)
+                if active is not None and active.state in (QUEUED, RUNNING):
+                    logging.info(f"Job {active.id} already covers {reservation['last_name']} with {active.airline}")
+                    jobs.append(active)
+                    continue
+                job_id = str(next(self._ids))
+                reservation = dict(reservation, job_id=job_id)
+                if self.prepare:
+                    reservation = self.prepare(reservation)
+                job = Job(job_id, reservation)
+                self.jobs[job_id] = job
+                if status == SUCCEEDED or (status == FAILED and attempts >= self.journal.max_attempts):
+                    job.state = SKIPPED
+                    job.error = "Already checked in" if status == SUCCEEDED else f"Failed {attempts} times"
+                    self._finish(job)
+                else:
+                    self._active[key] = job
+            if job.state == QUEUED:
+                self.queue.put(job)
+                logging.info(f"Queued job {job_id}: {reservation['last_name']} with {job.airline}")
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self, state=None):
+        with self._lock:
+            return [job for job in self.jobs.values() if state is None or job.state == state]
+
+    def _finish(self, job):
+        """Called with the lock held once a job will not change anymore; forgets the oldest finished jobs."""
+        self._finished.append(job.id)
+        while len(self._finished) > self.keep_finished:
+            old = self.jobs.pop(self._finished.popleft(), None)
+            if old is not None and self._active.get(journal_key(old.reservation)) is old:
+                del self._active[journal_key(old.reservation)]
+
+    def _is_cancelled(self, reservation):
+        # A forgotten job had finished, so it cannot be waiting for dispatch either
+        job = self.jobs.get(reservation['job_id'])
+        return job is None or job.state == CANCELLED
+
+    def _cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return False
+            job.state = CANCELLED
+            job.finished = time.time()
+            self._finish(job)
+        self._publish(job)
+        return True
+
+    def cancel(self, job_id):
+        """Cancel a job that is not running; returns False if it already started or finished."""
+        if not self._cancel(job_id):
+            return False
+        # A scheduled job would otherwise wait in the dispatcher until it is due
+        self.orchestrator.drop_pending(self._is_cancelled)
+        return True
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _publish(self, job):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(job.to_dict())
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        states = {}
+        per_airline = {}
+        for job in jobs:
+            states[job.state] = states.get(job.state, 0) + 1
+            if job.state in (QUEUED, RUNNING):
+                counts = per_airline.setdefault(job.airline, {QUEUED: 0, RUNNING: 0})
+                counts[job.state] += 1
+        for airline, counts in per_airline.items():
+            counts["limit"] = self.orchestrator.limit_for(airline)
+            counts["breaker"] = self.orchestrator.breaker_for(airline).state
+            if self.orchestrator.rate_limits:
+                counts.update(self.orchestrator.rate_limits.get(airline).snapshot())
+        running = states.get(RUNNING, 0)
+        run_stats = self.orchestrator.stats
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "queue_depth": states.get(QUEUED, 0),
+            "running": running,
+            "max_workers": self.orchestrator.max_workers,
+            "utilization": round(running / self.orchestrator.max_workers, 3),
+            "jobs": states,
+            "per_airline": per_airline,
+            "processed": run_stats.total,
+            "succeeded": run_stats.succeeded,
+            "failed": run_stats.failed,
+            "throughput_per_min": round(run_stats.throughput, 2),
+            "workers": self.governor.summary() if self.governor else {},
+        }
+
+    def run(self):
+        """Dispatch submitted jobs until shutdown() is called and in-flight check-ins finish."""
+        for result in self.orchestrator.run(self.queue):
+            with self._lock:
+                job = self.jobs.get(result.reservation['job_id'])
+                # Cancelled jobs never ran this attempt; cancel() already reported them
+                if job is None or job.state == CANCELLED:
+                    continue
+                job.finished = time.time()
+                if result.cancelled:
+                    # Stopped by shutdown() on its way to a worker
+                    job.state = CANCELLED
+                else:
+                    job.state = SUCCEEDED if result.success else FAILED
+                    job.error = result.error
+                    job.boarding_passes = result.boarding_passes
+                self._finish(job)
+            if not result.cancelled:
+                self.journal.record(result)
+                level = logging.INFO if result.success else logging.WARNING
+                logging.log(level, f"Job {job.id} {job.state}: {job.reservation['last_name']} with {job.airline} "
+                                   f"after {job.attempts} attempts")
+            self._publish(job)
+
+        for subscriber in list(self._subscribers):
+            subscriber.put(None)
+
+    def shutdown(self):
+        """Stop accepting work and cancel every job that has not started."""
+        logging.info("Shutting down, waiting for running check-ins to finish")
+        self.stopping = True
+        self.queue.close()
+        for job in self.list(QUEUED):
+            self._cancel(job.id)
+        self.orchestrator.drop_pending(self._is_cancelled)
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    daemon = None
+
+    def log_message(self, format, *args):
+        logging.debug(f"api {self.address_string()} {format % args}")
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        return parts.path.rstrip("/"), parse_qs(parts.query)
+
+    def do_POST(self):
+        path, _ = self._route()
+        if path != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self._send_json(400, {"error": "invalid Content-Length"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+            reservations = payload if isinstance(payload, list) else [payload]
+            if not all(isinstance(r, dict) for r in reservations):
+                raise ValueError("Expected a reservation object or a list of them")
+            jobs = self.daemon.submit(reservations)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, {"jobs": [job.to_dict() for job in jobs]})
+
+    def do_GET(self):
+        path, query = self._route()
+        if path == "/stats":
+            self._send_json(200, self.daemon.stats())
+        elif path == "/jobs":
+            state = query.get("state", [None])[0]
+            self._send_json(200, {"jobs": [job.to_dict() for job in self.daemon.list(state)]})
+        elif path == "/jobs/stream":
+            self._stream()
+        elif path.startswith("/jobs/"):
+            job = self.daemon.get(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "unknown job"})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        path, _ = self._route()
+        job_id = path[len("/jobs/"):] if path.startswith("/jobs/") else None
+        job = self.daemon.get(job_id) if job_id else None
+        if job is None:
+            self._send_json(404, {"error": "unknown job"})
+        elif self.daemon.cancel(job_id):
+            self._send_json(200, job.to_dict())
+        else:
+            self._send_json(409, {"error": f"Job is {job.state}", "job": job.to_dict()})
+
+    def _stream(self):
+        subscriber = self.daemon.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    self.wfile.write(b"\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.daemon.unsubscribe(subscriber)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(daemon, host="127.0.0.1", port=8750, socket_path=None):
+    handler = type("BoundDaemonHandler", (DaemonHandler,), {"daemon": daemon})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(daemon, host="127.0.0.1", port=8750, socket_path=None):
+    """Serve the API on a background thread and run the daemon until SIGINT/SIGTERM."""
+    server = create_server(daemon, host, port, socket_path)
+    threading.Thread(target=server.serve_forever, name="daemon-api", daemon=True).start()
+    logging.info(f"Check-in daemon listening on {socket_path or f'http://{host}:{server.server_address[1]}'}")
+
+    def stop(signum, frame):
+        # Not in the handler itself: the interrupted thread may hold the locks shutdown() takes
+        threading.Thread(target=daemon.shutdown, name="daemon-shutdown").start()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        daemon.run()
+    finally:
+        server.shutdown()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
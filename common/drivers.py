@@ -0,0 +1,170 @@
+"""
+Driver preparation, run once at startup.
+
+seleniumbase keeps its driver_fixing.lock and pyautogui.lock under
+downloaded_files/ in the working directory, and every fresh process patches or
+locates the undetected chromedriver again while holding them. Here the driver is
+resolved and patched once, under one lock, into a shared cache keyed by the
+installed Chrome version; workers only read from it afterwards.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DRIVER_CACHE_DIR = os.path.join(ROOT, "drivers")
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+# Span a bot subprocess records for its browser launch, read back by LaunchStats.record_spans
+LAUNCH_STEP = "browser_launch"
+
+
+def use_shared_workdir():
+    """Run from the repository root so every bot shares one downloaded_files/ directory."""
+    os.chdir(ROOT)
+
+
+def chrome_version():
+    """Version of the installed Chrome, e.g. "126.0.6478.126", or None if it cannot be found."""
+    for name in CHROME_BINARIES:
+        binary = shutil.which(name)
+        if not binary:
+            continue
+        try:
+            output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        for word in output.split():
+            if word[:1].isdigit():
+                return word
+    return None
+
+
+@contextmanager
+def cache_lock(cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, "prepare.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_manifest(cache_dir=DRIVER_CACHE_DIR):
+    try:
+        with open(os.path.join(cache_dir, "manifest.json")) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_chromedriver(cache_dir=DRIVER_CACHE_DIR):
+    """Path of the prepared chromedriver, or None to let Selenium resolve one itself."""
+    path = read_manifest(cache_dir).get("chromedriver")
+    return path if path and os.access(path, os.X_OK) else None
+
+
+def _resolve_chromedriver(cache_dir, version):
+    """Let Selenium Manager find or download chromedriver once and copy it into the cache."""
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        source = driver.service.path
+    finally:
+        driver.quit()
+    target = os.path.join(cache_dir, version, "chromedriver")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(source, target)
+    os.chmod(target, os.stat(target).st_mode | stat.S_IXUSR | stat.S_IRUSR)
+    return target
+
+
+def _patch_uc_driver():
+    """Launch one undetected driver so seleniumbase downloads and patches uc_driver now."""
+    from seleniumbase import Driver
+
+    driver = Driver(uc=True, headless2=True)
+    driver.quit()
+
+
+def prepare_drivers(cache_dir=DRIVER_CACHE_DIR, uc=True):
+    """
+    Make sure the cache holds a chromedriver and a patched uc_driver for the
+    installed Chrome. Cheap when it is already prepared: only `chrome --version`
+    runs. Returns the manifest.
+    """
+    version = chrome_version() or "unknown"
+    with cache_lock(cache_dir):
+        manifest = read_manifest(cache_dir)
+        if manifest.get("chrome_version") == version and cached_chromedriver(cache_dir) and (manifest.get("uc_patched") or not uc):
+            logging.info(f"Drivers already prepared for Chrome {version}")
+            return manifest
+
+        started = time.monotonic()
+        manifest = {"chrome_version": version}
+        manifest["chromedriver"] = _resolve_chromedriver(cache_dir, version)
+        if uc:
+            _patch_uc_driver()
+            manifest["uc_patched"] = True
+        manifest["prepared_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        manifest["prepare_seconds"] = round(time.monotonic() - started, 2)
+        with open(os.path.join(cache_dir, "manifest.json"), "w") as file:
+            json.dump(manifest, file, indent=2)
+        logging.info(f"Prepared drivers for Chrome {version} in {manifest['prepare_seconds']}s")
+        return manifest
+
+
+class LaunchStats:
+    """How long each browser launch took, per airline."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._launches = {}
+
+    def record(self, airline, seconds):
+        with self._lock:
+            self._launches.setdefault(airline, []).append(seconds)
+
+    def record_spans(self, spans):
+        """Record the launches bots recorded as spans, e.g. the spans read back from a subprocess."""
+        for record in spans:
+            if record["step"] == LAUNCH_STEP:
+                self.record(record["airline"], record["duration_ms"] / 1000)
+
+    def summary(self):
+        with self._lock:
+            launches = {airline: (values[0], sorted(values)) for airline, values in self._launches.items()}
+        return {
+            airline: {
+                "count": len(values),
+                "avg_s": round(sum(values) / len(values), 3),
+                "p95_s": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "first_s": round(first, 3),
+                "max_s": round(values[-1], 3),
+            }
+            for airline, (first, values) in launches.items()
+        }
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("Browser launch times:")
+        for airline, s in sorted(summary.items()):
+            logging.info(
+                f"  {airline}: {s['count']} launches, first {s['first_s']:.2f}s, avg {s['avg_s']:.2f}s, "
+                f"p95 {s['p95_s']:.2f}s, max {s['max_s']:.2f}s"
+            )
+
+
+LAUNCH_STATS = LaunchStats()
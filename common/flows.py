@@ -0,0 +1,716 @@
+"""
+Declarative check-in flows.
+
+A Flow describes an airline's check-in as data: the steps that open the
+reservation (`checkin`, once per reservation code) and the steps that send the
+boarding pass (`send`, once per email), each with its locators, readiness
+conditions, timeout and the signal that confirms it. Optional steps close
+dialogs the site may show (Dismiss) and capture the boarding pass PDFs
+(Capture) without ever failing the check-in. Flows are validated and
+compiled once when the airline is loaded; the compiled flow runs on a Selenium
+driver (run_checkin) or on a Playwright page (run_checkin_async).
+
+Every step is recorded as a span under its name and every wait in WAIT_STATS,
+so per-step timings show up in the trace summaries. The conditions of one step
+are independent and polled together, so a step waits for the slowest of them
+rather than for their sum.
+"""
+import argparse
+import logging
+import string
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from seleniumbase import Driver
+
+from common import async_actions
+from common.actions import LOCATE_SCRIPT, _candidates, click_first, fill_form, first_match
+from common.artifacts import capture_failure, capture_page_failure
+from common.boarding_passes import PdfCapture, capture_boarding_passes, emit_boarding_passes
+from common.browser import FULL_PROFILE, apply_profile, get_profile, record_page_metrics
+from common.drivers import LAUNCH_STATS, LAUNCH_STEP, use_shared_workdir
+from common.groups import send_to_passengers
+from common.network import ResponseMatcher, ResponseWatch, confirm_response
+from common.profiles import get_profiles, record_first_load
+from common.rate_limit import check_challenge, report_throttle
+from common.resilience import CheckinRejected
+from common.tracing import span, trace
+from common.waits import (WAIT_STATS, all_of, animations_finished, install_network_tracker, network_idle,
+                          spinner_gone, wait_until)
+
+# Fields a step's url or values may refer to, e.g. "{reservation_code}"
+RESERVATION_FIELDS = ("last_name", "reservation_code", "email", "date_of_birth")
+# Derived from the date of birth (DD-MM-YYYY, see common.preflight)
+DATE_OF_BIRTH_FIELDS = ("birth_day", "birth_month", "birth_year")
+TEMPLATE_FIELDS = RESERVATION_FIELDS + DATE_OF_BIRTH_FIELDS + ("base_url",)
+LOCATOR_KINDS = ("css", "xpath", "text")
+
+# How many elements the first matching candidate resolves to
+COUNT_SCRIPT = LOCATE_SCRIPT + """
+for (const candidate of arguments[0]) {
+    try {
+        const found = resolve(candidate);
+        if (found.length) {
+            return found.length;
+        }
+    } catch (error) {
+    }
+}
+return 0;
+"""
+
+
+class FlowError(ValueError):
+    """A flow definition that does not validate."""
+
+
+@dataclass(frozen=True)
+class Condition:
+    """
+    A readiness or success condition. `kind` is one of:
+
+    spinner_gone, network_idle, animations_finished
+        page-wide, as in common.waits
+    visible, gone
+        the locator has / has no visible match
+    settled
+        the locator is visible and no modal animation is running
+    new_match
+        the locator matches more elements than when the step started, e.g. a
+        confirmation banner when earlier sends left theirs on the page
+    """
+    kind: str
+    locator: object = None
+
+
+CONDITION_KINDS = ("spinner_gone", "network_idle", "animations_finished", "visible", "gone", "settled", "new_match")
+LOCATOR_CONDITIONS = ("visible", "gone", "settled", "new_match")
+
+SPINNER_GONE = Condition("spinner_gone")
+NETWORK_IDLE = Condition("network_idle")
+ANIMATIONS_FINISHED = Condition("animations_finished")
+
+
+def visible(locator):
+    return Condition("visible", locator)
+
+
+def gone(locator):
+    return Condition("gone", locator)
+
+
+def settled(locator):
+    return Condition("settled", locator)
+
+
+def new_match(locator):
+    return Condition("new_match", locator)
+
+
+@dataclass(frozen=True)
+class Open:
+    """Load `url` (a template) and check for a bot challenge; uc drivers drop chromedriver for `reconnect` seconds."""
+    name: str
+    url: str
+    reconnect: float = 3
+
+
+@dataclass(frozen=True)
+class Click:
+    name: str
+    locator: object
+    timeout: float
+    description: str
+    replaces: float = 0
+    required: bool = True
+
+
+@dataclass(frozen=True)
+class Fill:
+    """Fill `fields`, a tuple of (name, locator, value), in one go. String values are templates."""
+    name: str
+    fields: tuple
+    timeout: float
+    description: str
+    replaces: float = 0
+
+
+@dataclass(frozen=True)
+class Wait:
+    """Wait for every one of `conditions`; by default a timeout only logs a warning."""
+    name: str
+    conditions: tuple
+    timeout: float
+    description: str
+    replaces: float = 0
+    required: bool = False
+
+
+@dataclass(frozen=True)
+class RejectIf:
+    """Fail the check-in for good, without retries, when `locator` has a visible match."""
+    name: str
+    locator: object
+    message: str
+
+
+@dataclass(frozen=True)
+class Confirm:
+    """
+    Run `click` and wait until the `matcher` API response arrives, or every
+    `fallback` condition holds; see common.network.confirm_response.
+    """
+    name: str
+    click: Click
+    matcher: ResponseMatcher
+    timeout: float
+    description: str
+    fallback: tuple = ()
+    replaces: float = 0
+
+
+@dataclass(frozen=True)
+class Dismiss:
+    """
+    Close `dialog` with the first match of `close` if it shows up within `timeout`,
+    trying up to `attempts` times; a dialog that stays open only logs a warning.
+    `throttle` is reported to the rate limiter (see common.rate_limit) when it shows.
+    """
+    name: str
+    dialog: object
+    close: object
+    timeout: float
+    description: str
+    attempts: int = 3
+    throttle: str = ""
+
+
+@dataclass(frozen=True)
+class Capture:
+    """
+    Run `steps` (Click and Wait steps, e.g. opening a download option) and keep the
+    PDF responses matching `matcher` as the boarding passes of the check-in. The
+    steps and the wait for the PDF share `timeout`. Best effort: when a step fails
+    or no PDF arrives in time the check-in goes on without them.
+    """
+    name: str
+    steps: tuple
+    matcher: ResponseMatcher
+    timeout: float
+    description: str
+
+
+@dataclass(frozen=True)
+class Flow:
+    airline: str
+    base_url: str
+    checkin: tuple
+    send: tuple = ()
+    headless_supported: bool = False
+
+
+def _locator_problems(locator):
+    try:
+        candidates = _candidates(locator)
+    except (TypeError, IndexError):
+        return [f"invalid locator {locator!r}"]
+    if not candidates:
+        return ["empty locator"]
+    problems = []
+    for candidate in candidates:
+        if len(candidate) < 2 or candidate[0] not in LOCATOR_KINDS or not candidate[1]:
+            problems.append(f"invalid locator {candidate!r}")
+    return problems
+
+
+def _template_fields(value):
+    if not isinstance(value, str):
+        return set()
+    return {field for _, field, _, _ in string.Formatter().parse(value) if field is not None}
+
+
+def _step_fields(step):
+    if isinstance(step, Open):
+        return _template_fields(step.url)
+    if isinstance(step, Fill):
+        return set().union(*(_template_fields(value) for _, _, value in step.fields))
+    if isinstance(step, Capture):
+        return set().union(*(_step_fields(nested) for nested in step.steps))
+    return set()
+
+
+def _condition_problems(condition):
+    if not isinstance(condition, Condition) or condition.kind not in CONDITION_KINDS:
+        return [f"unknown condition {condition!r}"]
+    if condition.kind in LOCATOR_CONDITIONS:
+        return _locator_problems(condition.locator)
+    return []
+
+
+def _step_problems(step):
+    problems = [f"unknown field '{field}'" for field in sorted(_step_fields(step) - set(TEMPLATE_FIELDS))]
+
+    if getattr(step, "timeout", 1) <= 0:
+        problems.append("timeout must be positive")
+    if isinstance(step, (Click, RejectIf)):
+        problems += _locator_problems(step.locator)
+    elif isinstance(step, Fill):
+        if not step.fields:
+            problems.append("no fields")
+        for name, locator, _ in step.fields:
+            problems += [f"{name}: {problem}" for problem in _locator_problems(locator)]
+    elif isinstance(step, Wait):
+        if not step.conditions:
+            problems.append("no conditions")
+        for condition in step.conditions:
+            problems += _condition_problems(condition)
+    elif isinstance(step, Confirm):
+        problems += _step_problems(step.click)
+        for condition in step.fallback:
+            problems += _condition_problems(condition)
+    elif isinstance(step, Dismiss):
+        problems += _locator_problems(step.dialog) + _locator_problems(step.close)
+        if step.attempts < 1:
+            problems.append("attempts must be at least 1")
+    elif isinstance(step, Capture):
+        if not step.steps:
+            problems.append("no steps")
+        for nested in step.steps:
+            # A Confirm would read the same network events as the capture, and a Dismiss has waits of its own
+            if not isinstance(nested, (Click, Wait)):
+                problems.append(f"{type(nested).__name__} steps cannot run in a capture")
+            else:
+                problems += _step_problems(nested)
+    elif not isinstance(step, Open):
+        problems.append(f"unknown step type {type(step).__name__}")
+    return problems
+
+
+def validate(flow):
+    """Raise FlowError listing everything wrong with the flow."""
+    problems = []
+    if not flow.checkin or not isinstance(flow.checkin[0], Open):
+        problems.append("checkin must start with an Open step")
+    names = set()
+    for step in tuple(flow.checkin) + tuple(flow.send):
+        name = getattr(step, "name", "")
+        if not name:
+            problems.append(f"unnamed step {step!r}")
+        elif name in names:
+            problems.append(f"duplicate step name '{name}'")
+        names.add(name)
+        problems += [f"step '{name}': {problem}" for problem in _step_problems(step)]
+    if problems:
+        raise FlowError(f"Invalid {flow.airline} flow: " + "; ".join(problems))
+
+
+class CompiledConditions:
+    """Condition specs resolved once into a combined check for each engine."""
+
+    def __init__(self, conditions):
+        self.conditions = [(c.kind, _candidates(c.locator) if c.locator else None) for c in conditions]
+        self.counted = [candidates for kind, candidates in self.conditions if kind == "new_match"]
+
+    def baseline(self, driver):
+        """The match counts the new_match conditions compare against."""
+        return [driver.execute_script(COUNT_SCRIPT, candidates) for candidates in self.counted]
+
+    async def baseline_async(self, page):
+        return [await async_actions.execute_script(page, COUNT_SCRIPT, candidates) for candidates in self.counted]
+
+    def check(self, baseline):
+        counts = iter(baseline)
+        checks = []
+        for kind, candidates in self.conditions:
+            if kind == "spinner_gone":
+                checks.append(spinner_gone())
+            elif kind == "network_idle":
+                checks.append(network_idle())
+            elif kind == "animations_finished":
+                checks.append(animations_finished())
+            elif kind == "visible":
+                checks.append(first_match(candidates))
+            elif kind == "gone":
+                checks.append(_negate(first_match(candidates)))
+            elif kind == "settled":
+                checks.append(all_of(first_match(candidates), animations_finished()))
+            elif kind == "new_match":
+                checks.append(_more_than(candidates, next(counts)))
+        return all_of(*checks)
+
+    def check_async(self, baseline):
+        counts = iter(baseline)
+        checks = []
+        for kind, candidates in self.conditions:
+            if kind == "spinner_gone":
+                checks.append(async_actions.spinner_gone())
+            elif kind == "network_idle":
+                checks.append(async_actions.network_idle())
+            elif kind == "animations_finished":
+                checks.append(async_actions.animations_finished())
+            elif kind == "visible":
+                checks.append(async_actions.first_match(candidates))
+            elif kind == "gone":
+                checks.append(async_actions.element_gone(candidates))
+            elif kind == "settled":
+                checks.append(async_actions.all_of(async_actions.first_match(candidates), async_actions.animations_finished()))
+            elif kind == "new_match":
+                checks.append(_more_than_async(candidates, next(counts)))
+        return async_actions.all_of(*checks)
+
+
+def _negate(condition):
+    def negated(driver):
+        return not condition(driver)
+    return negated
+
+
+def _more_than(candidates, count):
+    def condition(driver):
+        return driver.execute_script(COUNT_SCRIPT, candidates) > count
+    return condition
+
+
+def _more_than_async(candidates, count):
+    async def condition(page):
+        return await async_actions.execute_script(page, COUNT_SCRIPT, candidates) > count
+    return condition
+
+
+def _render(value, context):
+    return value.format(**context) if isinstance(value, str) else value
+
+
+class CompiledStep:
+    """
+    A step with its locators and conditions resolved, runnable on either engine.
+    run() returns the BoardingPasses a Capture step saved, None for other steps.
+    """
+
+    def __init__(self, step, airline):
+        self.step = step
+        self.name = step.name
+        self.airline = airline
+        if isinstance(step, (Click, RejectIf)):
+            self.candidates = _candidates(step.locator)
+        elif isinstance(step, Fill):
+            self.fields = [(name, _candidates(locator), value) for name, locator, value in step.fields]
+        elif isinstance(step, Wait):
+            self.conditions = CompiledConditions(step.conditions)
+        elif isinstance(step, Confirm):
+            self.click = CompiledStep(step.click, airline)
+            self.fallback = CompiledConditions(step.fallback)
+        elif isinstance(step, Dismiss):
+            self.dialog = _candidates(step.dialog)
+            self.close = _candidates(step.close)
+
+    def _dismiss(self, driver):
+        step = self.step
+        for attempt in range(step.attempts):
+            if not wait_until(driver, first_match(self.dialog), step.timeout, f"{step.description} shown", required=False):
+                return
+            if attempt == 0 and step.throttle:
+                report_throttle(step.throttle)
+            wait_until(driver, animations_finished(), 5, f"{step.description} rendered", replaces=2, required=False)
+            if (click_first(driver, self.close, 5, f"{step.description} close button", required=False)
+                    and wait_until(driver, _negate(first_match(self.dialog)), 10, f"{step.description} closed", required=False)):
+                return
+        logging.warning(f"{step.description} still open after {step.attempts} attempts, continuing")
+
+    async def _dismiss_async(self, page):
+        step = self.step
+        for attempt in range(step.attempts):
+            if not await async_actions.find_first(page, self.dialog, step.timeout, f"{step.description} shown", required=False):
+                return
+            if attempt == 0 and step.throttle:
+                report_throttle(step.throttle)
+            await async_actions.wait_for(page, async_actions.animations_finished(), 5, f"{step.description} rendered",
+                                         replaces=2, required=False)
+            if (await async_actions.click_first(page, self.close, 5, f"{step.description} close button", required=False)
+                    and await async_actions.wait_for(page, async_actions.element_gone(self.dialog), 10,
+                                                     f"{step.description} closed", required=False)):
+                return
+        logging.warning(f"{step.description} still open after {step.attempts} attempts, continuing")
+
+    def _limited_steps(self, deadline):
+        """The capture's steps, each given no more than the time left until `deadline`."""
+        for nested in self.step.steps:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"out of time before {nested.name}")
+            yield CompiledStep(replace(nested, timeout=min(nested.timeout, remaining)), self.airline)
+
+    def _capture(self, driver, context):
+        step = self.step
+        deadline = time.monotonic() + step.timeout
+        try:
+            capture = PdfCapture(driver, step.matcher)
+            for nested in self._limited_steps(deadline):
+                with span(nested.name):
+                    nested.run(driver, context)
+            boarding_passes = capture_boarding_passes(driver, capture, self.airline, context["reservation_code"],
+                                                      max(0, deadline - time.monotonic()), step.description)
+        except Exception as e:
+            logging.warning(f"{step.description}: going on without the boarding passes, {str(e)}")
+            return []
+        logging.info(f"Captured {len(boarding_passes)} boarding pass PDFs")
+        return boarding_passes
+
+    async def _capture_async(self, page, context):
+        step = self.step
+        deadline = time.monotonic() + step.timeout
+        capture = async_actions.PdfCapture(page, step.matcher)
+        try:
+            for nested in self._limited_steps(deadline):
+                with span(nested.name):
+                    await nested.run_async(page, context)
+            boarding_passes = await async_actions.capture_boarding_passes(
+                page, capture, self.airline, context["reservation_code"], max(0, deadline - time.monotonic()),
+                step.description)
+        except Exception as e:
+            capture.close()
+            logging.warning(f"{step.description}: going on without the boarding passes, {str(e)}")
+            return []
+        logging.info(f"Captured {len(boarding_passes)} boarding pass PDFs")
+        return boarding_passes
+
+    def run(self, driver, context):
+        step = self.step
+        if isinstance(step, Open):
+            url = _render(step.url, context)
+            if hasattr(driver, "reconnect"):
+                # Like uc_open_with_reconnect, but in the current tab: the new tab that one opens
+                # has none of the profile's DevTools state
+                driver.execute_script("window.location.href = arguments[0];", url)
+                driver.reconnect(step.reconnect)
+                # The restarted chromedriver attaches with a new DevTools session
+                prepare_tab(driver)
+            else:
+                driver.get(url)
+            check_challenge(driver)
+            record_first_load(driver)
+        elif isinstance(step, Click):
+            click_first(driver, self.candidates, step.timeout, step.description, step.replaces, step.required)
+        elif isinstance(step, Fill):
+            fill_form(driver, [(name, candidates, _render(value, context)) for name, candidates, value in self.fields],
+                      step.timeout, step.description, step.replaces)
+        elif isinstance(step, Wait):
+            wait_until(driver, self.conditions.check(self.conditions.baseline(driver)), step.timeout,
+                       step.description, step.replaces, step.required)
+        elif isinstance(step, RejectIf):
+            if first_match(self.candidates)(driver):
+                raise CheckinRejected(step.message)
+        elif isinstance(step, Confirm):
+            fallback = self.fallback.check(self.fallback.baseline(driver)) if step.fallback else None
+            watch = ResponseWatch(driver, step.matcher)
+            self.click.run(driver, context)
+            confirm_response(driver, watch, step.timeout, step.description, fallback, step.replaces)
+        elif isinstance(step, Dismiss):
+            self._dismiss(driver)
+        elif isinstance(step, Capture):
+            return self._capture(driver, context)
+
+    async def run_async(self, page, context):
+        step = self.step
+        if isinstance(step, Open):
+            await page.goto(_render(step.url, context))
+            await async_actions.check_challenge(page)
+        elif isinstance(step, Click):
+            await async_actions.click_first(page, self.candidates, step.timeout, step.description, step.replaces, step.required)
+        elif isinstance(step, Fill):
+            await async_actions.fill_form(page, [(name, candidates, _render(value, context)) for name, candidates, value in self.fields],
+                                          step.timeout, step.description, step.replaces)
+        elif isinstance(step, Wait):
+            baseline = await self.conditions.baseline_async(page)
+            await async_actions.wait_for(page, self.conditions.check_async(baseline), step.timeout,
+                                         step.description, step.replaces, step.required)
+        elif isinstance(step, RejectIf):
+            if await async_actions.first_match(self.candidates)(page):
+                raise CheckinRejected(step.message)
+        elif isinstance(step, Confirm):
+            fallback = None
+            if step.fallback:
+                fallback = self.fallback.check_async(await self.fallback.baseline_async(page))
+            watch = async_actions.ResponseWatch(page, step.matcher)
+            await self.click.run_async(page, context)
+            await async_actions.confirm_response(page, watch, step.timeout, step.description, fallback, step.replaces)
+        elif isinstance(step, Dismiss):
+            await self._dismiss_async(page)
+        elif isinstance(step, Capture):
+            return await self._capture_async(page, context)
+
+
+class CompiledFlow:
+    def __init__(self, flow):
+        validate(flow)
+        self.flow = flow
+        self.airline = flow.airline
+        self.checkin = [CompiledStep(step, flow.airline) for step in flow.checkin]
+        self.send = [CompiledStep(step, flow.airline) for step in flow.send]
+        self.fields = set()
+        for step in tuple(flow.checkin) + tuple(flow.send):
+            self.fields |= _step_fields(step)
+
+    def context(self, reservation):
+        """The values the templates of the flow are rendered with; raises ValueError when one is missing."""
+        context = {field: reservation[field] for field in RESERVATION_FIELDS if reservation.get(field)}
+        context["base_url"] = self.flow.base_url
+        if self.fields & set(DATE_OF_BIRTH_FIELDS) and "date_of_birth" in context:
+            date = datetime.strptime(context["date_of_birth"], "%d-%m-%Y")
+            context.update(birth_day=date.day, birth_month=date.month, birth_year=date.year)
+        missing = sorted({"date_of_birth" if field in DATE_OF_BIRTH_FIELDS else field for field in self.fields - set(context)})
+        if missing:
+            raise ValueError(f"{self.airline} check-in needs {', '.join(missing)}")
+        return context
+
+
+def compile_flow(flow):
+    """Validate the flow and resolve its steps; raises FlowError."""
+    return CompiledFlow(flow)
+
+
+def run_steps(driver, steps, context, capture=True):
+    """Run the steps in order and return the BoardingPasses captured; Capture steps are skipped unless `capture`."""
+    boarding_passes = []
+    for step in steps:
+        if isinstance(step.step, Capture) and not capture:
+            continue
+        with span(step.name):
+            boarding_passes += step.run(driver, context) or []
+    return boarding_passes
+
+
+async def run_steps_async(page, steps, context):
+    boarding_passes = []
+    for step in steps:
+        with span(step.name):
+            boarding_passes += await step.run_async(page, context) or []
+    return boarding_passes
+
+
+def run_checkin(driver, flow, reservation):
+    """Open the reservation and send the boarding pass to its email; returns the captured BoardingPasses."""
+    reservation_code = reservation['reservation_code']
+    logging.info(f"Performing check-in for: {reservation['last_name']} - {reservation_code}")
+    try:
+        context = flow.context(reservation)
+        boarding_passes = run_steps(driver, flow.checkin, context)
+        boarding_passes += run_steps(driver, flow.send, context)
+        logging.info(f"Check-in completed and boarding pass sent for {reservation['last_name']} - {reservation_code}")
+        return boarding_passes
+    except Exception as e:
+        logging.error(f"An error occurred during check-in: {str(e)}")
+        capture_failure(driver, flow.airline, reservation_code, e)
+        raise
+
+
+def run_group_checkin(driver, flow, passengers):
+    """Open the reservation once and run the send steps for each distinct email of the party."""
+    lead = passengers[0]
+    reservation_code = lead['reservation_code']
+    logging.info(f"Performing group check-in for {len(passengers)} passengers - {reservation_code}")
+    try:
+        run_steps(driver, flow.checkin, flow.context(lead))
+    except Exception as e:
+        logging.error(f"An error occurred during check-in: {str(e)}")
+        capture_failure(driver, flow.airline, reservation_code, e)
+        raise
+
+    boarding_passes = []
+
+    def send(passenger):
+        # One PDF covers the whole reservation, so it is only captured until it arrives once
+        boarding_passes.extend(run_steps(driver, flow.send, flow.context(passenger), capture=not boarding_passes))
+        return list(boarding_passes)
+
+    return send_to_passengers(driver, flow.airline, reservation_code, passengers, send)
+
+
+async def run_checkin_async(page, flow, reservation):
+    """The same check-in on a Playwright page, for the contexts engine (see common/contexts.py)."""
+    reservation_code = reservation['reservation_code']
+    logging.info(f"Performing check-in for: {reservation['last_name']} - {reservation_code}")
+    try:
+        context = flow.context(reservation)
+        boarding_passes = await run_steps_async(page, flow.checkin, context)
+        boarding_passes += await run_steps_async(page, flow.send, context)
+        logging.info(f"Check-in completed and boarding pass sent for {reservation['last_name']} - {reservation_code}")
+        return boarding_passes
+    except Exception as e:
+        logging.error(f"An error occurred during check-in: {str(e)}")
+        await capture_page_failure(page, flow.airline, reservation_code, e)
+        raise
+
+
+def prepare_tab(driver):
+    """
+    Block the URLs of the driver's browser profile and install the network tracker in
+    its current DevTools session; both are lost when chromedriver restarts.
+    """
+    apply_profile(driver, getattr(driver, "browser_profile", FULL_PROFILE))
+    install_network_tracker(driver)
+
+
+def create_driver(flow, profile=FULL_PROFILE, user_data_dir=None):
+    """An undetected Chrome with performance logging, so Confirm steps can see the API responses."""
+    driver = Driver(uc=True, headless2=profile.headless and flow.headless_supported, block_images=profile.blocks_images,
+                    log_cdp_events=True, user_data_dir=user_data_dir)
+    driver.browser_profile = profile
+    prepare_tab(driver)
+    return driver
+
+
+def main(flow, create=None):
+    """
+    Command line entry point of a flow-defined bot, run by the orchestrator's subprocess
+    engine. `create(profile, user_data_dir)` starts a bot's own browser instead of create_driver.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=f"Perform {flow.airline.title()} check-in")
+    parser.add_argument("--last_name", required=True, help="Passenger's last name")
+    parser.add_argument("--reservation_code", required=True, help="Reservation code")
+    parser.add_argument("--email", required=True, help="Email address")
+    parser.add_argument("--date_of_birth", default="", help="Date of birth (DD-MM-YYYY)")
+    parser.add_argument("--browser_profile", choices=["full", "lean"], default="full", help="Browser profile")
+    args = parser.parse_args()
+
+    compiled = compile_flow(flow)
+    if create is None:
+        # seleniumbase keeps its driver locks under downloaded_files/ in the working directory
+        use_shared_workdir()
+    profiles = get_profiles()
+    lease = profiles.acquire(flow.airline) if profiles else None
+    launched_at = time.time()
+    started = time.monotonic()
+    try:
+        profile = get_profile(args.browser_profile)
+        user_data_dir = lease.path if lease else None
+        driver = create(profile, user_data_dir) if create else create_driver(flow, profile, user_data_dir)
+    except Exception:
+        if lease:
+            lease.release()
+        raise
+    launch_seconds = time.monotonic() - started
+    LAUNCH_STATS.record(flow.airline, launch_seconds)
+    driver.profile_lease = lease
+
+    try:
+        with trace(flow.airline, args.reservation_code, emit=True) as checkin_trace:
+            # So the launch time reaches the orchestrator too
+            checkin_trace.mark(LAUNCH_STEP, launched_at, launch_seconds, True)
+            try:
+                boarding_passes = run_checkin(driver, compiled, vars(args))
+            finally:
+                record_page_metrics(driver, profile)
+        emit_boarding_passes(boarding_passes)
+        return True
+    except Exception as e:
+        logging.error(f"An error occurred: {str(e)}")
+        return False
+    finally:
+        driver.quit()
+        if lease:
+            lease.release()
+        WAIT_STATS.log_summary()
+        LAUNCH_STATS.log_summary()
@@ -0,0 +1,330 @@
+"""
+Resource governor for the check-in workers.
+
+Samples RSS and CPU of the browser process tree each worker is driving (the
+chromedriver and Chrome processes of a pooled session, or the whole bot
+subprocess), kills trees that run past the wall-clock budget of a reservation,
+tells the browser pools to recycle sessions that grew past the memory limit and
+cleans up chrome/chromedriver processes left behind by an instance that crashed.
+
+Needs psutil; without it only the wall-clock budget of subprocess check-ins is
+enforced (by killing their process group).
+"""
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Inherited by every bot, chromedriver and browser this tool starts (see mark_owned_processes), set to
+# "<pid>:<start time>" of the instance that started it; orphan cleanup never touches a process without it
+OWNER_ENV = "AIRLINE_BOTS_OWNER"
+DRIVER_PROCESS_NAMES = ("chromedriver", "uc_driver")
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "google-chrome", "headless_shell")
+MB = 1024 * 1024
+
+
+def driver_pids(driver):
+    """Root processes of a Selenium session: chromedriver and, in uc mode, the separately started Chrome."""
+    pids = []
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is not None:
+        pids.append(process.pid)
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid and browser_pid not in pids:
+        pids.append(browser_pid)
+    return pids
+
+
+def process_tree(pids):
+    processes = []
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes.append(root)
+            processes.extend(root.children(recursive=True))
+        except psutil.Error:
+            pass
+    return processes
+
+
+def tree_usage(pids):
+    """(rss bytes, cpu seconds) summed over the process trees rooted at `pids`."""
+    rss = 0
+    cpu = 0.0
+    for process in process_tree(pids):
+        try:
+            rss += process.memory_info().rss
+            times = process.cpu_times()
+            cpu += times.user + times.system
+        except psutil.Error:
+            pass
+    return rss, cpu
+
+
+def kill_processes(processes):
+    """Kill psutil processes, in reverse order so children listed after their parents go first."""
+    for process in reversed(processes):
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+    return len(processes)
+
+
+def kill_tree(pids):
+    """Kill the process trees rooted at `pids`, children first. Returns how many processes were killed."""
+    if psutil is None:
+        killed = 0
+        for pid in pids:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+                killed += 1
+            except OSError:
+                pass
+        return killed
+    return kill_processes(process_tree(pids))
+
+
+def owner_id(pid=None):
+    """The marker of the running instance with `pid` (this one by default), or None if there is none."""
+    pid = os.getpid() if pid is None else pid
+    if psutil is None:
+        return str(pid)
+    try:
+        return f"{pid}:{psutil.Process(pid).create_time():.2f}"
+    except psutil.Error:
+        return None
+
+
+def mark_owned_processes():
+    """Mark every process started from here on as this instance's, so kill_orphans may clean it up."""
+    os.environ[OWNER_ENV] = owner_id()
+
+
+def _owner_running(owner):
+    """Whether the instance that wrote the marker `owner` is still running; a reused PID has another start time."""
+    pid, _, _ = owner.partition(":")
+    try:
+        return owner_id(int(pid)) == owner
+    except ValueError:
+        # A marker of an older version, which did not say whose it was
+        return False
+
+
+def _is_orphaned_browser(process, own=False):
+    name = process.name().lower()
+    is_driver = any(driver in name for driver in DRIVER_PROCESS_NAMES)
+    # Only browsers started for automation, never a desktop Chrome
+    is_browser = (any(name.startswith(browser) for browser in BROWSER_PROCESS_NAMES)
+                  and any(arg.startswith("--remote-debugging-port") for arg in process.cmdline()))
+    if not is_driver and not is_browser:
+        return False
+    # Other automation of the same user runs without the marker
+    try:
+        owner = process.environ().get(OWNER_ENV)
+    except psutil.AccessDenied:
+        return False
+    if owner is None:
+        return False
+    # uc mode starts Chrome detached, so the parent says nothing; the instance that started it does
+    if owner == owner_id():
+        return own
+    return not _owner_running(owner)
+
+
+def kill_orphans(own=False):
+    """
+    Kill chromedriver and automated Chrome processes started by an instance of this tool
+    that is no longer running. With `own`, also this instance's, once its workers are done.
+    """
+    if psutil is None:
+        return 0
+    user = psutil.Process().username()
+    orphans = []
+    for process in psutil.process_iter():
+        try:
+            if process.username() == user and _is_orphaned_browser(process, own):
+                orphans.append(process.pid)
+        except psutil.Error:
+            pass
+    if not orphans:
+        return 0
+    killed = kill_tree(orphans)
+    logging.warning(f"Killed {killed} orphaned browser processes")
+    return killed
+
+
+class WorkerResources:
+    def __init__(self):
+        self.reservations = 0
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self.memory_recycles = 0
+        self.budget_kills = 0
+
+    def to_dict(self):
+        return {
+            "reservations": self.reservations,
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+            "cpu_seconds": round(self.cpu_seconds, 1),
+            "memory_recycles": self.memory_recycles,
+            "budget_kills": self.budget_kills,
+        }
+
+
+class Watch:
+    def __init__(self, worker, pids):
+        self.worker = worker
+        self._pids = pids if callable(pids) else list(pids)
+        self.started = time.monotonic()
+        self.cpu_start = None
+        self.killed = False
+
+    @property
+    def pids(self):
+        return self._pids() if callable(self._pids) else self._pids
+
+
+class ResourceGovernor:
+    """
+    `watch` a process tree for the duration of a reservation from the worker thread
+    running it; a background thread samples the watched trees every `interval`
+    seconds. `max_rss_mb` and `budget` of 0 disable the memory limit and the
+    wall-clock budget.
+    """
+
+    def __init__(self, max_rss_mb=0, budget=0, interval=5.0, report_path=None):
+        self.max_rss = max_rss_mb * MB
+        self.budget = budget
+        self.interval = interval
+        self.report_path = report_path
+        self._workers = {}
+        self._watches = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if psutil is None and max_rss_mb:
+            logging.warning("psutil is not installed, browser memory will not be governed")
+
+    def start(self):
+        if self._thread is None and (psutil is not None or self.budget):
+            self._thread = threading.Thread(target=self._run, name="governor", daemon=True)
+            self._thread.start()
+        return self
+
+    def _worker(self, name):
+        resources = self._workers.get(name)
+        if resources is None:
+            resources = self._workers[name] = WorkerResources()
+        return resources
+
+    @contextmanager
+    def watch(self, pids):
+        """
+        Govern the process trees rooted at `pids` while the block runs. `pids` may be a
+        function returning them, e.g. for a driver whose chromedriver is restarted.
+        """
+        watch = Watch(threading.current_thread().name, pids)
+        with self._lock:
+            self._worker(watch.worker).reservations += 1
+            self._watches.append(watch)
+        try:
+            yield watch
+        finally:
+            with self._lock:
+                self._watches.remove(watch)
+            self._sample(watch)
+
+    def _sample(self, watch):
+        if psutil is None:
+            return
+        rss, cpu = tree_usage(watch.pids)
+        with self._lock:
+            resources = self._worker(watch.worker)
+            resources.peak_rss = max(resources.peak_rss, rss)
+            if watch.cpu_start is None:
+                watch.cpu_start = cpu
+            elif cpu > watch.cpu_start:
+                resources.cpu_seconds += cpu - watch.cpu_start
+                watch.cpu_start = cpu
+
+    def _enforce_budget(self, watch):
+        elapsed = time.monotonic() - watch.started
+        if not self.budget or watch.killed or elapsed < self.budget:
+            return
+        watch.killed = True
+        logging.warning(f"Reservation on {watch.worker} exceeded its {self.budget:.0f}s budget, killing its browser")
+        kill_tree(watch.pids)
+        with self._lock:
+            self._worker(watch.worker).budget_kills += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                watches = list(self._watches)
+            for watch in watches:
+                self._sample(watch)
+                self._enforce_budget(watch)
+
+    def recycle_reason(self, pids):
+        """Why a pooled session rooted at `pids` should be quit instead of reused, or None."""
+        if not self.max_rss or psutil is None:
+            return None
+        rss, _ = tree_usage(pids)
+        if rss < self.max_rss:
+            return None
+        with self._lock:
+            self._worker(threading.current_thread().name).memory_recycles += 1
+        return f"browser uses {rss / MB:.0f} MB, over the {self.max_rss / MB:.0f} MB limit"
+
+    def snapshot(self, pids):
+        """The processes of a session, taken before quit for reap()."""
+        return process_tree(pids) if psutil is not None else []
+
+    def reap(self, processes):
+        """
+        Kill the processes of a snapshot() still running after quit. psutil checks each
+        process's creation time, so a PID reused since the snapshot is left alone.
+        """
+        leftovers = [process for process in processes if process.is_running()]
+        if leftovers:
+            logging.warning(f"Killing {len(leftovers)} browser processes left running after quit")
+            kill_processes(leftovers)
+
+    def summary(self):
+        with self._lock:
+            return {name: resources.to_dict() for name, resources in sorted(self._workers.items())}
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("Worker resources:")
+        for worker, s in summary.items():
+            logging.info(
+                f"  {worker}: {s['reservations']} reservations, peak {s['peak_rss_mb']} MB, "
+                f"{s['cpu_seconds']} CPU s, {s['memory_recycles']} memory recycles, {s['budget_kills']} budget kills"
+            )
+
+    def save(self):
+        if not self.report_path:
+            return
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        # Every pool and engine is closed by now, so whatever this instance left running is leftover
+        kill_orphans(own=True)
@@ -0,0 +1,66 @@
+import logging
+from collections import OrderedDict
+
+from common.artifacts import capture_failure
+from common.journal import journal_key
+from common.orchestrator import PassengerResult
+from common.resilience import is_transient
+
+
+def group_reservations(reservations, window=1000):
+    """
+    Merge rows that share (airline, reservation_code) into one group job.
+
+    Rows are streamed; at most `window` groups are held open at once and the oldest
+    is released when the window is full, so parties listed close together in the
+    input are grouped without reading the whole file. A group looks like its lead
+    passenger's row with every row under 'passengers' and the earliest dispatch_at.
+    """
+    open_groups = OrderedDict()
+
+    def release(group):
+        rows = group['passengers']
+        if len(rows) > 1:
+            logging.info(f"Grouped {len(rows)} passengers on {group['airline']} {group['reservation_code']}")
+        dispatch_times = [row['dispatch_at'] for row in rows if row.get('dispatch_at')]
+        if dispatch_times:
+            group['dispatch_at'] = min(dispatch_times)
+        return group
+
+    for reservation in reservations:
+        key = journal_key(reservation)[:2]
+        group = open_groups.get(key)
+        if group is None:
+            group = dict(reservation, passengers=[])
+            group.pop('dispatch_at', None)
+            open_groups[key] = group
+        group['passengers'].append(reservation)
+        if len(open_groups) > window:
+            _, oldest = open_groups.popitem(last=False)
+            yield release(oldest)
+
+    for group in open_groups.values():
+        yield release(group)
+
+
+def send_to_passengers(driver, airline, reservation_code, passengers, send):
+    """
+    Call `send(passenger)` once per distinct email in the party and map the outcome,
+    with any BoardingPasses `send` returns, back to every passenger sharing that
+    email. A failed send is captured as a failure artifact and does not stop the
+    remaining emails.
+    """
+    outcomes = {}
+    for passenger in passengers:
+        email = passenger['email'].strip().lower()
+        if email in outcomes:
+            continue
+        try:
+            boarding_passes = send(passenger) or []
+            outcomes[email] = (True, "", False, boarding_passes)
+        except Exception as e:
+            logging.error(f"Failed to send boarding pass to {email} for {reservation_code}: {str(e)}")
+            capture_failure(driver, airline, reservation_code, e)
+            outcomes[email] = (False, str(e), is_transient(e), [])
+
+    return [PassengerResult(p, *outcomes[p['email'].strip().lower()]) for p in passengers]
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from common.orchestrator import airline_key
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def journal_key(reservation):
+    return (
+        airline_key(reservation['airline']),
+        reservation['reservation_code'].strip().upper(),
+        " ".join(reservation['last_name'].split()).upper(),
+    )
+
+
+class RunJournal:
+    """
+    Append-only JSON lines journal of reservation outcomes.
+
+    The journal file is the source of truth. A SQLite index next to it holds the
+    latest status and attempt count per (airline, reservation_code, last_name), so
+    lookups stay fast and memory flat for inputs of any size. The index is caught
+    up from the journal on open and rebuilt if it is missing or out of sync.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path + ".index", check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS outcomes (
+                airline TEXT NOT NULL,
+                reservation_code TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                PRIMARY KEY (airline, reservation_code, last_name)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._catch_up()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _indexed_bytes(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'journal_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _apply(self, entry):
+        key = (entry['airline'], entry['reservation_code'], entry['last_name'])
+        self._db.execute("""
+            INSERT INTO outcomes (airline, reservation_code, last_name, status, attempts) VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (airline, reservation_code, last_name)
+            DO UPDATE SET status = excluded.status, attempts = attempts + 1
+        """, (*key, entry['status']))
+
+    def _set_indexed_bytes(self, size):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_bytes', ?)", (size,))
+
+    def _catch_up(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        offset = self._indexed_bytes()
+        if offset > size:
+            logging.warning(f"Journal index is ahead of {self.path}, rebuilding it")
+            self._db.execute("DELETE FROM outcomes")
+            offset = 0
+        if offset == size:
+            return
+
+        applied = 0
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # A torn final write from a crash; it is rewritten by the next append
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    logging.warning(f"Skipping corrupt entry in {self.path} at byte {offset - len(line)}: {str(e)}")
+                    continue
+                applied += 1
+        self._set_indexed_bytes(offset)
+        self._db.commit()
+        if offset < size:
+            with open(self.path, "r+b") as file:
+                file.truncate(offset)
+        logging.info(f"Indexed {applied} journal entries from {self.path}")
+
+    def lookup(self, reservation):
+        """Return (status, attempts) for a reservation, or (None, 0) if it never ran."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, attempts FROM outcomes WHERE airline = ? AND reservation_code = ? AND last_name = ?",
+                journal_key(reservation),
+            ).fetchone()
+        return row if row else (None, 0)
+
+    def pending(self, reservations):
+        """Yield only the reservations that still need to run."""
+        skipped = 0
+        for reservation in reservations:
+            status, attempts = self.lookup(reservation)
+            if status == SUCCEEDED:
+                skipped += 1
+                continue
+            if status == FAILED and attempts >= self.max_attempts:
+                logging.warning(
+                    f"Skipping {reservation['last_name']} - {reservation['reservation_code']}: "
+                    f"failed {attempts} times"
+                )
+                skipped += 1
+                continue
+            yield reservation
+        if skipped:
+            logging.info(f"Skipped {skipped} reservations already completed or out of attempts")
+
+    def record(self, result):
+        """Append one entry per passenger of the result."""
+        finished_at = datetime.now(timezone.utc).isoformat()
+        entries = []
+        for passenger in result.passenger_results():
+            airline, reservation_code, last_name = journal_key(passenger.reservation)
+            entries.append({
+                "airline": airline,
+                "reservation_code": reservation_code,
+                "last_name": last_name,
+                "status": SUCCEEDED if passenger.success else FAILED,
+                "error": passenger.error,
+                "boarding_passes": [boarding_pass.path for boarding_pass in passenger.boarding_passes],
+                "duration": round(result.duration, 3),
+                "finished_at": finished_at,
+            })
+        with self._lock:
+            self._file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for entry in entries:
+                self._apply(entry)
+            self._set_indexed_bytes(self._file.tell())
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._db.close()
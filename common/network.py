@@ -0,0 +1,156 @@
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from selenium.common.exceptions import TimeoutException
+
+from common.tracing import current_trace
+from common.waits import wait_until
+
+# Chrome capability that makes chromedriver record CDP events in the "performance" log
+PERFORMANCE_LOGGING = {"performance": "ALL"}
+# Only the Network domain is needed, which keeps the log small
+PERF_LOGGING_PREFS = {"enableNetwork": True, "enablePage": False}
+# Span recording how each confirmation was decided, so every check-in shows whether the API response was seen
+CONFIRMATION_STEP = "confirmation"
+
+
+class ConfirmationFailed(Exception):
+    """The airline's API answered the confirming request with an error status."""
+
+
+@dataclass(frozen=True)
+class ResponseMatcher:
+    """The API call whose response confirms a step, e.g. sending the boarding pass."""
+    url_pattern: str
+    method: str = "POST"
+
+    def matches(self, url, method):
+        return method == self.method and re.search(self.url_pattern, url) is not None
+
+    @staticmethod
+    def is_success(status):
+        return 200 <= status < 300
+
+
+def read_network_events(driver):
+    """Drain the performance log and return its CDP Network events, or None when it is not enabled."""
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return None
+    events = []
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"].startswith("Network."):
+            events.append(message)
+    return events
+
+
+class ResponseWatch:
+    """
+    Watches the browser's network events for the response to a matching request.
+
+    Create it right before the action that sends the request: it discards every
+    event logged so far, so responses to earlier requests are never matched.
+    """
+
+    def __init__(self, driver, matcher):
+        self.driver = driver
+        self.matcher = matcher
+        self.requests = {}
+        self.available = read_network_events(driver) is not None
+
+    def poll(self):
+        """Return (status, url) of the matching response once it arrived; status 0 if the request failed."""
+        for event in read_network_events(self.driver) or []:
+            params = event["params"]
+            request_id = params.get("requestId")
+            if event["method"] == "Network.requestWillBeSent":
+                request = params["request"]
+                if self.matcher.matches(request["url"], request["method"]):
+                    self.requests[request_id] = request["url"]
+            elif event["method"] == "Network.responseReceived" and request_id in self.requests:
+                return params["response"]["status"], self.requests[request_id]
+            elif event["method"] == "Network.loadingFailed" and request_id in self.requests:
+                return 0, self.requests[request_id]
+        return None
+
+
+class ConfirmationStats:
+    """How each confirmation was decided, keyed by its description."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, description, signal):
+        with self._lock:
+            counts = self._stats.setdefault(description, {})
+            counts[signal] = counts.get(signal, 0) + 1
+
+    def record_spans(self, spans):
+        """Record the confirmations bots recorded as spans, e.g. the spans read back from a subprocess."""
+        for record in spans:
+            if record["step"] == CONFIRMATION_STEP:
+                self.record(record["description"], record["signal"])
+
+    def snapshot(self):
+        with self._lock:
+            return {description: dict(counts) for description, counts in self._stats.items()}
+
+    def log_summary(self):
+        stats = self.snapshot()
+        if not stats:
+            return
+        logging.info("Confirmations by signal:")
+        for description, counts in sorted(stats.items()):
+            logging.info(f"  {description}: " + ", ".join(f"{signal} {n}" for signal, n in sorted(counts.items())))
+            if counts.get("dom") and not counts.get("network"):
+                logging.warning(f"  {description}: the API response was never seen, check its ResponseMatcher")
+
+
+CONFIRMATION_STATS = ConfirmationStats()
+
+
+def record_confirmation(description, signal):
+    """Count how a confirmation was decided and add it to the current check-in's trace."""
+    CONFIRMATION_STATS.record(description, signal)
+    current = current_trace()
+    if current is not None:
+        current.mark(CONFIRMATION_STEP, time.time(), 0, signal in ("network", "dom"), description=description, signal=signal)
+    if signal == "dom":
+        logging.info(f"{description}: confirmed by the page, the API response was not seen")
+
+
+def confirm_response(driver, watch, timeout, description, fallback=None, replaces=0):
+    """
+    Wait until the watched API response arrives, or the DOM `fallback` condition
+    holds, and return which signal confirmed it ("network" or "dom").
+
+    An error status raises ConfirmationFailed as soon as the response arrives.
+    The fallback covers browsers without performance logging and responses the
+    matcher does not recognise; TimeoutException is raised when neither shows up.
+    """
+    def condition(driver):
+        outcome = watch.poll() if watch.available else None
+        if outcome:
+            status, url = outcome
+            if watch.matcher.is_success(status):
+                return "network"
+            record_confirmation(description, "failed")
+            raise ConfirmationFailed(f"{description}: {url} answered with status {status or 'network error'}")
+        if fallback and fallback(driver):
+            return "dom"
+        return False
+
+    try:
+        signal = wait_until(driver, condition, timeout, description, replaces)
+    except TimeoutException:
+        record_confirmation(description, "timeout")
+        raise
+    record_confirmation(description, signal)
+    return signal
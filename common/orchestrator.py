@@ -0,0 +1,334 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from queue import SimpleQueue
+
+from common.resilience import OPEN, CheckinCancelled, CircuitBreaker, backoff_delay, is_transient
+
+# How often the dispatcher checks a live source that had nothing to give
+IDLE_POLL = 0.05
+
+
+def airline_key(airline):
+    return " ".join(airline.split()).upper()
+
+
+@dataclass
+class PassengerResult:
+    reservation: dict
+    success: bool
+    error: str = ""
+    transient: bool = False
+    boarding_passes: list = field(default_factory=list)
+
+
+@dataclass
+class CheckinResult:
+    """
+    Outcome of one job: a single reservation, or a group of passengers sharing a
+    reservation code (reservation['passengers']) with a PassengerResult for each.
+    """
+    reservation: dict
+    success: bool
+    started: float
+    finished: float
+    error: str = ""
+    transient: bool = False
+    attempts: int = 1
+    passengers: list = field(default_factory=list)
+    cancelled: bool = False
+
+    @property
+    def airline(self):
+        return airline_key(self.reservation['airline'])
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+    def passenger_results(self):
+        if self.passengers:
+            return self.passengers
+        rows = self.reservation.get('passengers') or [self.reservation]
+        return [PassengerResult(row, self.success, self.error, self.transient) for row in rows]
+
+    @property
+    def boarding_passes(self):
+        """The BoardingPasses captured for the job, each distinct PDF once."""
+        unique = {}
+        for passenger in self.passengers:
+            for boarding_pass in passenger.boarding_passes:
+                unique.setdefault(boarding_pass.sha256, boarding_pass)
+        return list(unique.values())
+
+
+@dataclass
+class RunStats:
+    started: float = field(default_factory=time.monotonic)
+    finished: float = 0.0
+    succeeded: int = 0
+    failed: int = 0
+    per_airline: dict = field(default_factory=dict)
+
+    def record(self, result):
+        counts = self.per_airline.setdefault(result.airline, {"succeeded": 0, "failed": 0})
+        for passenger in result.passenger_results():
+            if passenger.success:
+                self.succeeded += 1
+                counts["succeeded"] += 1
+            else:
+                self.failed += 1
+                counts["failed"] += 1
+
+    @property
+    def total(self):
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self):
+        """Reservations processed per minute of wall-clock time."""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.total * 60 / self.elapsed
+
+    def log_summary(self):
+        logging.info(
+            f"Processed {self.total} reservations ({self.succeeded} succeeded, {self.failed} failed) "
+            f"in {self.elapsed:.1f}s - {self.throughput:.2f} reservations/min"
+        )
+        for airline, counts in sorted(self.per_airline.items()):
+            logging.info(f"  {airline}: {counts['succeeded']} succeeded, {counts['failed']} failed")
+
+
+class Orchestrator:
+    """
+    Runs check-ins concurrently with a global worker cap and a cap per airline.
+
+    Reservations are pulled lazily from the input into per-airline queues and only
+    handed to the thread pool when both a global and an airline slot are free, so a
+    busy airline never ties up workers that could serve another one.
+
+    A reservation with a `dispatch_at` timestamp (wall-clock seconds) is held back
+    until `prewarm` seconds before that time; each queue is ordered by it.
+
+    Transient failures are retried up to `retries` times with jittered exponential
+    backoff, and each airline has a circuit breaker that stops dispatching to it while
+    it keeps failing, leaving the workers to the other airlines.
+
+    With `rate_limits` (see common.rate_limit) dispatch to each airline is also paced
+    by its adaptive token bucket, which is fed the outcome of every check-in and
+    the throttles seen during it, whether or not the breaker also counts it.
+
+    A live source (see common.daemon) yields None when it has nothing queued; the
+    dispatcher then checks it again every IDLE_POLL seconds until it is exhausted.
+    Reservations already taken from it can be withdrawn with drop_pending().
+    """
+
+    def __init__(self, runner, max_workers=4, airline_limits=None, rate_limits=None,
+                 buffer_size=None, prewarm=0, retries=2, retry_base=5.0, retry_cap=120.0,
+                 breaker_threshold=3, breaker_cooldown=60.0):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.airline_limits = {airline_key(k): v for k, v in (airline_limits or {}).items()}
+        self.rate_limits = rate_limits
+        self.buffer_size = buffer_size or max(64, max_workers * 8)
+        self.prewarm = prewarm
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breakers = {}
+        self.stats = RunStats()
+        self._drops = SimpleQueue()
+        self._wakeup = threading.Event()
+
+    def limit_for(self, airline):
+        return max(1, min(self.airline_limits.get(airline, self.max_workers), self.max_workers))
+
+    def breaker_for(self, airline):
+        if airline not in self.breakers:
+            self.breakers[airline] = CircuitBreaker(airline, self.breaker_threshold, self.breaker_cooldown)
+        return self.breakers[airline]
+
+    def drop_pending(self, predicate):
+        """
+        Remove the reservations matching `predicate` that wait for dispatch (e.g.
+        cancelled scheduled jobs), waking the dispatcher if it sleeps until one is due.
+        """
+        self._drops.put(predicate)
+        self._wakeup.set()
+
+    def _execute(self, reservation, attempt):
+        started = time.monotonic()
+        error = ""
+        transient = False
+        passengers = []
+        try:
+            outcome = self.runner(reservation)
+            if isinstance(outcome, list):
+                # Group jobs report one PassengerResult per passenger, and so do jobs returning boarding passes
+                passengers = outcome
+                success = all(p.success for p in passengers)
+                transient = any(p.transient for p in passengers if not p.success)
+                error = "; ".join(sorted({p.error for p in passengers if p.error}))
+            else:
+                success = bool(outcome)
+                # A script that exits non-zero gives no reason, so assume it may work next time
+                transient = not success
+        except CheckinCancelled as e:
+            return CheckinResult(reservation, False, started, time.monotonic(), str(e), attempts=attempt, cancelled=True)
+        except Exception as e:
+            logging.error(f"Unhandled error processing {reservation['last_name']}: {str(e)}")
+            success = False
+            error = str(e)
+            transient = is_transient(e)
+        finished = time.monotonic()
+        return CheckinResult(reservation, success, started, finished, error, transient, attempt, passengers)
+
+    def _split_for_retry(self, result):
+        """
+        Split a failed job into a result for the passengers that are finished (None
+        if there are none) and the job to retry with only the transient failures.
+        """
+        done, failed = [], []
+        for passenger in result.passengers:
+            (failed if not passenger.success and passenger.transient else done).append(passenger)
+
+        retry = dict(result.reservation)
+        # The check-in window has already opened, so a retry is not a scheduled dispatch
+        retry.pop('dispatch_at', None)
+        if not done:
+            return None, retry
+
+        retry['passengers'] = [p.reservation for p in failed]
+        partial = CheckinResult(
+            dict(result.reservation, passengers=[p.reservation for p in done]),
+            all(p.success for p in done), result.started, result.finished,
+            "; ".join(sorted({p.error for p in done if p.error})), False, result.attempts, done,
+        )
+        return partial, retry
+
+    def run(self, reservations):
+        """Yield a CheckinResult for every reservation as soon as it finishes."""
+        self.stats = RunStats()
+        source = iter(reservations)
+        exhausted = False
+        pending = {}
+        buffered = 0
+        sequence = itertools.count()
+        in_flight = {}
+        futures = {}
+
+        def enqueue(reservation, ready_at, attempt):
+            queue = pending.setdefault(airline_key(reservation['airline']), [])
+            heapq.heappush(queue, (ready_at, next(sequence), attempt, reservation))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="worker") as executor:
+            while True:
+                while not self._drops.empty():
+                    predicate = self._drops.get_nowait()
+                    for airline, queue in pending.items():
+                        kept = [entry for entry in queue if not predicate(entry[3])]
+                        buffered -= len(queue) - len(kept)
+                        heapq.heapify(kept)
+                        queue[:] = kept
+
+                idle = False
+                while not exhausted and buffered < self.buffer_size:
+                    try:
+                        reservation = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if reservation is None:
+                        idle = True
+                        break
+                    dispatch_at = reservation.get('dispatch_at')
+                    enqueue(reservation, dispatch_at - self.prewarm if dispatch_at else 0, 1)
+                    buffered += 1
+
+                now = time.time()
+                next_due = None
+                for airline, queue in pending.items():
+                    breaker = self.breaker_for(airline)
+                    while queue and len(futures) < self.max_workers and in_flight.get(airline, 0) < self.limit_for(airline):
+                        due = queue[0][0]
+                        if due > now:
+                            next_due = due if next_due is None else min(next_due, due)
+                            break
+                        # Checked before the breaker, which lets a half-open probe through only once
+                        limiter = self.rate_limits.get(airline) if self.rate_limits else None
+                        delay = limiter.delay() if limiter else 0
+                        if delay > 0:
+                            next_due = now + delay if next_due is None else min(next_due, now + delay)
+                            break
+                        if not breaker.allow(now):
+                            # Open: wait for the next probe. Half-open: wait for the probe's result
+                            due = breaker.next_probe_at if breaker.state == OPEN else None
+                            if due is not None:
+                                next_due = due if next_due is None else min(next_due, due)
+                            break
+                        if limiter:
+                            limiter.take()
+                        _, _, attempt, reservation = heapq.heappop(queue)
+                        buffered -= 1
+                        in_flight[airline] = in_flight.get(airline, 0) + 1
+                        futures[executor.submit(self._execute, reservation, attempt)] = airline
+
+                timeout = None if next_due is None else max(0, next_due - time.time())
+                if idle:
+                    timeout = IDLE_POLL if timeout is None else min(timeout, IDLE_POLL)
+                if not futures:
+                    if exhausted and not buffered:
+                        break
+                    if timeout is not None:
+                        self._wakeup.wait(timeout)
+                        self._wakeup.clear()
+                    continue
+
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    airline = futures.pop(future)
+                    in_flight[airline] -= 1
+                    result = future.result()
+                    # The limiter and the breaker each react on their own: pace and outage
+                    if self.rate_limits:
+                        self.rate_limits.record_result(airline, result)
+                    if result.cancelled:
+                        # Not an outcome of the airline, so limiters and stats stay as they are and
+                        # the breaker only gets its probe slot back
+                        self.breaker_for(airline).release_probe()
+                        yield result
+                        continue
+
+                    breaker = self.breaker_for(airline)
+                    if result.success or not result.transient:
+                        breaker.record_success()
+                    else:
+                        breaker.record_failure()
+                        if result.attempts <= self.retries:
+                            delay = backoff_delay(result.attempts, self.retry_base, self.retry_cap)
+                            logging.info(
+                                f"Retrying {result.reservation['last_name']} with {airline} in {delay:.1f}s "
+                                f"(attempt {result.attempts + 1} of {self.retries + 1})"
+                            )
+                            partial, retry = self._split_for_retry(result)
+                            enqueue(retry, time.time() + delay, result.attempts + 1)
+                            buffered += 1
+                            if partial is None:
+                                continue
+                            result = partial
+
+                    self.stats.record(result)
+                    yield result
+
+        self.stats.finished = time.monotonic()
@@ -0,0 +1,237 @@
+"""
+Pre-flight pass over the reservation input, run before any browser starts.
+
+The input (CSV, or JSON lines for .jsonl/.ndjson files) is streamed once to
+normalize and validate every row and drop duplicates; rejected rows go to a
+JSON lines file with their reasons. The accepted rows are then streamed again,
+normalized, so only a digest of each row is held in memory to spot duplicates.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from common.orchestrator import airline_key
+from common.scheduler import parse_departure
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$")
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d")
+# What the flows expect, see common.flows.DATE_OF_BIRTH_FIELDS
+DATE_OF_BIRTH_FORMAT = "%d-%m-%Y"
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+# Columns the bots read as text; JSON lines may hold numbers in them, e.g. a numeric reservation code
+TEXT_FIELDS = ("airline", "reservation_code", "last_name", "email", "date_of_birth", "departure")
+
+
+@dataclass(frozen=True)
+class AirlineRules:
+    # What the airline accepts in its reservation code field
+    code_pattern: str = r"^[A-Z0-9]{6}$"
+    requires_date_of_birth: bool = False
+
+
+# Aeromexico also takes the 13-digit ticket number, and only it asks for the date of birth
+AIRLINE_RULES = {
+    "AEROMEXICO": AirlineRules(code_pattern=r"^(?:[A-Z0-9]{6}|\d{13})$", requires_date_of_birth=True),
+    "VOLARIS": AirlineRules(),
+    "VIVA AEROBUS": AirlineRules(),
+}
+
+
+def read_rows(path):
+    """Yield (line number, row) from a CSV or JSON lines file."""
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        if path.lower().endswith(JSON_LINES_EXTENSIONS):
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError as e:
+                        row = {"_error": f"invalid JSON ({e})"}
+                    yield number, row if isinstance(row, dict) else {"_error": "not a JSON object"}
+        else:
+            reader = csv.DictReader(file)
+            for row in reader:
+                # Header keys are normalized too, e.g. " Email" -> "email"
+                yield reader.line_num, {(key or "").strip().lower(): value for key, value in row.items()}
+
+
+def normalize_date(value):
+    """Parse a date in any of DATE_FORMATS; raises ValueError."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized date of birth '{value}', expected DD-MM-YYYY")
+
+
+def normalize_reservation(row):
+    """
+    Return (normalized row, errors). Whitespace is trimmed and collapsed, the airline,
+    reservation code and last name are upper-cased, the email lower-cased and the
+    date of birth rewritten as DD-MM-YYYY. Nulls count as missing, integers in
+    TEXT_FIELDS as text, and any other non-text value there is an error.
+    """
+    if "_error" in row:
+        return row, [row["_error"]]
+
+    normalized = {}
+    errors = []
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key in TEXT_FIELDS and not isinstance(value, str):
+            if isinstance(value, int) and not isinstance(value, bool):
+                value = str(value)
+            else:
+                errors.append(f"{key.replace('_', ' ')} is not text ({type(value).__name__})")
+                continue
+        normalized[key] = " ".join(value.split()) if isinstance(value, str) else value
+    if errors:
+        return normalized, errors
+
+    airline = airline_key(normalized.get("airline", ""))
+    rules = AIRLINE_RULES.get(airline)
+    if not airline:
+        errors.append("missing airline")
+    elif rules is None:
+        errors.append(f"unknown airline '{normalized['airline']}'")
+    normalized["airline"] = airline
+    rules = rules or AirlineRules()
+
+    normalized["reservation_code"] = normalized.get("reservation_code", "").replace(" ", "").upper()
+    if not normalized["reservation_code"]:
+        errors.append("missing reservation code")
+    elif not re.match(rules.code_pattern, normalized["reservation_code"]):
+        errors.append(f"invalid reservation code '{normalized['reservation_code']}'")
+
+    normalized["last_name"] = normalized.get("last_name", "").upper()
+    if not normalized["last_name"]:
+        errors.append("missing last name")
+
+    normalized["email"] = normalized.get("email", "").replace(" ", "").lower()
+    if not normalized["email"]:
+        errors.append("missing email")
+    elif not EMAIL_PATTERN.match(normalized["email"]):
+        errors.append(f"invalid email '{normalized['email']}'")
+
+    date_of_birth = normalized.get("date_of_birth", "")
+    if date_of_birth:
+        try:
+            parsed = normalize_date(date_of_birth)
+            if not date(1900, 1, 1) <= parsed <= date.today():
+                raise ValueError(f"date of birth '{date_of_birth}' out of range")
+            normalized["date_of_birth"] = parsed.strftime(DATE_OF_BIRTH_FORMAT)
+        except ValueError as e:
+            errors.append(str(e))
+    elif rules.requires_date_of_birth:
+        errors.append("missing date of birth")
+    normalized.setdefault("date_of_birth", "")
+
+    if normalized.get("departure"):
+        try:
+            parse_departure(normalized["departure"])
+        except ValueError:
+            errors.append(f"invalid departure '{normalized['departure']}'")
+
+    return normalized, errors
+
+
+def duplicate_key(normalized):
+    """
+    Digest of the whole normalized row: passengers sharing a reservation code and
+    last name are told apart by their email, date of birth or any other column.
+    """
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).digest()
+
+
+def check_reservation(row):
+    """The normalized row, or ValueError listing everything wrong with it."""
+    normalized, errors = normalize_reservation(row)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return normalized
+
+
+@dataclass
+class PreflightReport:
+    total: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    reasons: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def log_summary(self, rejects_path):
+        logging.info(
+            f"Pre-flight checked {self.total} rows in {self.elapsed:.2f}s: {self.accepted} accepted, "
+            f"{self.rejected} rejected ({self.duplicates} duplicates)"
+        )
+        for reason, count in sorted(self.reasons.items(), key=lambda item: -item[1]):
+            logging.info(f"  {reason}: {count}")
+        if self.rejected:
+            logging.warning(f"Rejected rows written to {rejects_path}")
+
+
+class Preflight:
+    """
+    `run()` streams the input once, writes the rejects and returns a PreflightReport;
+    `accepted()` then streams the normalized rows that passed.
+    """
+
+    def __init__(self, path, rejects_path=None):
+        self.path = path
+        self.rejects_path = rejects_path or f"{os.path.splitext(path)[0]}.rejects.jsonl"
+        self.report = None
+        self._rejected_lines = set()
+
+    def run(self):
+        started = time.monotonic()
+        report = PreflightReport()
+        seen = {}
+        rejects = None
+        try:
+            for number, row in read_rows(self.path):
+                report.total += 1
+                normalized, errors = normalize_reservation(row)
+                if not errors:
+                    key = duplicate_key(normalized)
+                    if key in seen:
+                        errors = [f"duplicate of line {seen[key]}"]
+                        report.duplicates += 1
+                    else:
+                        seen[key] = number
+                if not errors:
+                    report.accepted += 1
+                    continue
+
+                report.rejected += 1
+                self._rejected_lines.add(number)
+                for error in errors:
+                    # Counted by kind, without the offending value
+                    reason = "duplicate" if error.startswith("duplicate") else re.split(r" '| \(", error)[0]
+                    report.reasons[reason] = report.reasons.get(reason, 0) + 1
+                if rejects is None:
+                    os.makedirs(os.path.dirname(self.rejects_path) or ".", exist_ok=True)
+                    rejects = open(self.rejects_path, "w")
+                rejects.write(json.dumps({"line": number, "errors": errors, "row": row}) + "\n")
+        finally:
+            if rejects:
+                rejects.close()
+        if not report.rejected and os.path.exists(self.rejects_path):
+            # Do not leave the rejects of an earlier run next to a clean input
+            os.remove(self.rejects_path)
+        report.elapsed = time.monotonic() - started
+        self.report = report
+        return report
+
+    def accepted(self):
+        for number, row in read_rows(self.path):
+            if number not in self._rejected_lines:
+                yield normalize_reservation(row)[0]
@@ -0,0 +1,291 @@
+"""
+Persistent Chrome profiles per airline, kept warm across check-ins and runs.
+
+Each airline has a few profile slots, profiles/<airline>/<n>/, used as Chrome's
+user data directory. A slot is leased under an exclusive file lock, so
+concurrent bots (threads or subprocesses) never share one; when every slot is
+busy the browser gets a throwaway cold profile instead.
+
+Before each lease the state the previous reservation left behind is wiped:
+storage, history, form data, sessions and every cookie except cookie-consent
+and bot-challenge clearance. The HTTP and code caches are kept, so the
+airline's SPA bundles load from disk.
+
+PAGE_LOADS compares the first page load of each check-in in warm and cold
+profiles, in new and in reused (pooled) browsers.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+
+from common.artifacts import slug
+from common.browser import collect_page_metrics
+from common.orchestrator import airline_key
+from common.tracing import current_trace
+
+# Shared with bot subprocesses so they lease from the same slots
+PROFILES_DIR_ENV = "AIRLINE_BOTS_PROFILES_DIR"
+PROFILES_PER_AIRLINE_ENV = "AIRLINE_BOTS_PROFILES_PER_AIRLINE"
+WARM_MARKER = ".warm"
+FIRST_LOAD_STEP = "first_page_load"
+
+# Cookie-consent banners and bot-challenge clearances; every other cookie belongs to the reservation
+RETAINED_COOKIES = (
+    "OptanonConsent", "OptanonAlertBoxClosed", "cookieconsent_status", "CookieConsent", "euconsent-v2",
+    "cf_clearance", "_abck", "bm_sz",
+)
+# Reservation state under the profile's Default/ directory
+WIPED_PATHS = (
+    "Local Storage", "Session Storage", "IndexedDB", "Service Worker", "File System", "databases", "Sessions",
+    "History", "History-journal", "Web Data", "Web Data-journal", "Login Data", "Login Data-journal",
+    "Visited Links", "Top Sites", "Top Sites-journal", "Shortcuts", "Shortcuts-journal",
+    "Current Session", "Current Tabs", "Last Session", "Last Tabs",
+)
+COOKIE_DATABASES = (os.path.join("Network", "Cookies"), "Cookies")
+# Left behind by a Chrome that did not exit cleanly; the slot lock already guarantees exclusive use
+SINGLETON_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie")
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def wipe_profile(path):
+    """Remove the reservation-specific state from a Chrome user data directory, keeping its caches."""
+    for name in SINGLETON_FILES:
+        _remove(os.path.join(path, name))
+    default = os.path.join(path, "Default")
+    for name in WIPED_PATHS:
+        _remove(os.path.join(default, name))
+
+    for name in COOKIE_DATABASES:
+        database = os.path.join(default, name)
+        if not os.path.exists(database):
+            continue
+        try:
+            with sqlite3.connect(database) as connection:
+                placeholders = ", ".join("?" * len(RETAINED_COOKIES))
+                connection.execute(f"DELETE FROM cookies WHERE name NOT IN ({placeholders})", RETAINED_COOKIES)
+            connection.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not filter cookies in {database}, removing them all: {str(e)}")
+            _remove(database)
+        _remove(f"{database}-journal")
+
+    # Otherwise Chrome offers to restore the previous session after a killed browser
+    preferences = os.path.join(default, "Preferences")
+    try:
+        with open(preferences) as file:
+            settings = json.load(file)
+        settings.setdefault("profile", {})["exit_type"] = "Normal"
+        with open(preferences, "w") as file:
+            json.dump(settings, file)
+    except (OSError, ValueError):
+        pass
+
+
+class ProfileLease:
+    """One leased profile directory; `warm` when an earlier check-in already filled its cache."""
+
+    def __init__(self, airline, path, warm, lock=None):
+        self.airline = airline
+        self.path = path
+        self.warm = warm
+        self._lock = lock
+
+    @property
+    def temporary(self):
+        return self._lock is None
+
+    def release(self):
+        if self.temporary:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        try:
+            with open(os.path.join(self.path, WARM_MARKER), "w") as marker:
+                marker.write(time.strftime("%Y-%m-%dT%H:%M:%S"))
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+            self._lock.close()
+
+
+class WarmProfiles:
+    """Up to `per_airline` persistent profile slots per airline under `root`."""
+
+    def __init__(self, root="profiles", per_airline=4):
+        self.root = root
+        self.per_airline = max(1, per_airline)
+
+    def acquire(self, airline):
+        """Lease a free slot with its reservation state wiped, or a temporary cold profile when all are busy."""
+        directory = os.path.join(self.root, slug(airline))
+        os.makedirs(directory, exist_ok=True)
+        for slot in range(self.per_airline):
+            path = os.path.join(directory, str(slot))
+            # The lock lives next to the profile, Chrome owns everything inside it
+            lock = open(f"{path}.lock", "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            try:
+                warm = os.path.exists(os.path.join(path, WARM_MARKER))
+                if warm:
+                    wipe_profile(path)
+                os.makedirs(path, exist_ok=True)
+            except Exception:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                lock.close()
+                raise
+            return ProfileLease(airline, path, warm, lock)
+
+        logging.info(f"All {self.per_airline} {airline} profiles are in use, starting with a cold one")
+        return ProfileLease(airline, tempfile.mkdtemp(prefix=f"{slug(airline)}-profile-"), False)
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def configure_profiles(root, per_airline=4):
+    global _profiles
+    root = os.path.abspath(root)
+    with _profiles_lock:
+        _profiles = WarmProfiles(root, per_airline)
+    os.environ[PROFILES_DIR_ENV] = root
+    os.environ[PROFILES_PER_AIRLINE_ENV] = str(per_airline)
+    return _profiles
+
+
+def get_profiles():
+    """The configured WarmProfiles, or None when warm profiles are off."""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None and os.environ.get(PROFILES_DIR_ENV):
+            _profiles = WarmProfiles(os.environ[PROFILES_DIR_ENV], int(os.environ.get(PROFILES_PER_AIRLINE_ENV, 4)))
+        return _profiles
+
+
+def release_profile(driver):
+    """Give back the profile a driver was started with, after it quit."""
+    lease = getattr(driver, "profile_lease", None)
+    if lease is not None:
+        lease.release()
+
+
+def clear_reservation_cookies(driver):
+    """Delete the browser's cookies except RETAINED_COOKIES."""
+    for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]:
+        if cookie["name"] not in RETAINED_COOKIES:
+            driver.execute_cdp_cmd("Network.deleteCookies", {
+                "name": cookie["name"], "domain": cookie["domain"], "path": cookie["path"],
+            })
+
+
+def load_kind(warm, reused):
+    """E.g. "warm/new": whether the profile was warm, and whether the browser was new or reused from a pool."""
+    return f"{'warm' if warm else 'cold'}/{'reused' if reused else 'new'}"
+
+
+class PageLoadStats:
+    """First page load of each check-in per airline, split by warm or cold profile and new or reused browser."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loads = {}
+
+    def record(self, airline, warm, load_ms, transfer_bytes, reused=False):
+        with self._lock:
+            loads = self._loads.setdefault(airline, {}).setdefault(load_kind(warm, reused), [])
+            loads.append((load_ms, transfer_bytes))
+
+    def record_spans(self, spans):
+        """Record the first page loads bots recorded as spans, e.g. the spans read back from a subprocess."""
+        for record in spans:
+            if record["step"] == FIRST_LOAD_STEP:
+                self.record(airline_key(record["airline"]), record["profile"] == "warm",
+                            record["duration_ms"], record.get("transfer_bytes", 0), record.get("browser") == "reused")
+
+    def summary(self):
+        with self._lock:
+            loads = {airline: {kind: sorted(values) for kind, values in kinds.items()}
+                     for airline, kinds in self._loads.items()}
+        summary = {}
+        for airline, kinds in loads.items():
+            summary[airline] = {
+                kind: {
+                    "count": len(values),
+                    "avg_ms": round(sum(ms for ms, _ in values) / len(values), 1),
+                    "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))][0], 1),
+                    "avg_kib": round(sum(size for _, size in values) / len(values) / 1024, 1),
+                }
+                for kind, values in kinds.items()
+            }
+        return summary
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("First page load per check-in:")
+        for airline, kinds in sorted(summary.items()):
+            for kind, s in sorted(kinds.items()):
+                logging.info(
+                    f"  {airline} [{kind}]: {s['count']} loads, avg {s['avg_ms']:.0f}ms, p95 {s['p95_ms']:.0f}ms, "
+                    f"{s['avg_kib']:.0f} KiB transferred"
+                )
+            # Compared in new browsers only, where the cache comes from the profile alone
+            warm, cold = kinds.get(load_kind(True, False)), kinds.get(load_kind(False, False))
+            if warm and cold:
+                logging.info(
+                    f"  {airline} warm profiles save {cold['avg_ms'] - warm['avg_ms']:.0f}ms and "
+                    f"{cold['avg_kib'] - warm['avg_kib']:.0f} KiB per first page load"
+                )
+            new, reused = kinds.get(load_kind(False, False)), kinds.get(load_kind(False, True))
+            if new and reused:
+                logging.info(
+                    f"  {airline} reused browsers save {new['avg_ms'] - reused['avg_ms']:.0f}ms and "
+                    f"{new['avg_kib'] - reused['avg_kib']:.0f} KiB per first page load in cold profiles"
+                )
+
+    def save(self, path):
+        summary = self.summary()
+        if not summary:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+PAGE_LOADS = PageLoadStats()
+# Browsers that already loaded a page, i.e. reused from a pool, whose in-memory cache is warm whatever the profile
+_loaded = weakref.WeakSet()
+
+
+def record_first_load(driver):
+    """
+    Called by a bot right after it opened the first page of a check-in. Records the
+    load as a span, so it also reaches the orchestrator from a subprocess.
+    """
+    current = current_trace()
+    metrics = collect_page_metrics(driver)
+    if current is None or not metrics or metrics["load_ms"] is None:
+        return
+    lease = getattr(driver, "profile_lease", None)
+    warm = bool(lease and lease.warm)
+    reused = driver in _loaded
+    _loaded.add(driver)
+    current.mark(FIRST_LOAD_STEP, time.time(), metrics["load_ms"] / 1000, True, profile="warm" if warm else "cold",
+                browser="reused" if reused else "new", transfer_bytes=metrics["transfer_bytes"])
+    PAGE_LOADS.record(airline_key(current.airline), warm, metrics["load_ms"], metrics["transfer_bytes"], reused)
@@ -0,0 +1,185 @@
+"""
+Adaptive per-airline rate limits for dispatching check-ins.
+
+Each airline has a token bucket refilled at its current rate (check-ins per
+minute). The rate grows additively while check-ins succeed and is halved when the
+site shows signs of throttling: error dialogs, bot-challenge pages or timeouts.
+Bots report what they see with report_throttle(); it is recorded as a
+"throttled" span, so the orchestrator also learns about it from bot subprocesses.
+
+Throttles are held until the check-in they were seen in finishes and then applied
+however it ended. The airline's circuit breaker counts the failures on its own;
+once it closes again the refill rate stays down until check-ins succeed.
+"""
+import logging
+import threading
+import time
+
+from common.orchestrator import airline_key
+from common.tracing import current_trace
+
+THROTTLE_STEP = "throttled"
+# Fragments of failure messages that mean the site is slowing us down rather than rejecting the reservation
+THROTTLE_ERRORS = ("timed out", "timeout", "challenge", "too many requests", "status 429", "status 503")
+
+# Markers of the common bot-challenge interstitials (Cloudflare, Akamai, PerimeterX)
+CHALLENGE_SCRIPT = """
+const html = document.documentElement ? document.documentElement.innerHTML : '';
+return /challenge-platform|cf-chl-|px-captcha|_Incapsula_Resource|Access Denied|Just a moment\\.\\.\\./.test(document.title + html);
+"""
+
+
+def is_throttle_error(error):
+    error = (error or "").lower()
+    return any(fragment in error for fragment in THROTTLE_ERRORS)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate follows additive-increase / multiplicative-decrease."""
+
+    def __init__(self, name, rate=6.0, min_rate=1.0, max_rate=30.0, burst=2, increase=1.0, decrease=0.5):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = float(self.burst)
+        self.throttles = 0
+        self.last_throttle = ""
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate / 60)
+        self._updated = now
+
+    def delay(self):
+        """Seconds until a check-in may be dispatched."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                return 0.0
+            return (1 - self.tokens) * 60 / self.rate
+
+    def take(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_throttle(self, reason):
+        with self._lock:
+            previous = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # Drop the saved-up burst so the slower pace applies right away
+            self.tokens = min(self.tokens, 0.0)
+            self.throttles += 1
+            self.last_throttle = reason
+        logging.warning(f"{self.name} is throttling ({reason}), rate {previous:.1f} -> {self.rate:.1f} check-ins/min")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "rate_per_min": round(self.rate, 2),
+                "throttles": self.throttles,
+                "last_throttle": self.last_throttle,
+            }
+
+
+class RateLimits:
+    """One AdaptiveRateLimiter per airline, created on first use."""
+
+    def __init__(self, rates=None, default_rate=6.0, min_rate=1.0, max_rate=30.0, burst=2):
+        self.configure(rates, default_rate, min_rate, max_rate, burst)
+        self._limiters = {}
+        # Throttles per (airline, reservation code) whose check-in is still running
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rates=None, default_rate=6.0, min_rate=1.0, max_rate=30.0, burst=2):
+        self.rates = {airline_key(k): v for k, v in (rates or {}).items()}
+        self.default_rate = default_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+
+    def get(self, airline):
+        with self._lock:
+            limiter = self._limiters.get(airline)
+            if limiter is None:
+                rate = min(self.max_rate, max(self.min_rate, self.rates.get(airline, self.default_rate)))
+                limiter = AdaptiveRateLimiter(airline, rate, self.min_rate, self.max_rate, self.burst)
+                self._limiters[airline] = limiter
+            return limiter
+
+    def hold_throttle(self, airline, reservation_code, reason):
+        """Keep a throttle seen during a check-in until record_result() knows how the check-in ended."""
+        with self._lock:
+            self._pending.setdefault((airline, reservation_code), []).append(reason)
+
+    def record_result(self, airline, result):
+        """
+        Speed up after a success, then apply the throttles held for the check-in. A
+        transient failure that looks like throttling, e.g. a timeout, counts as one
+        when the bot reported none.
+        """
+        with self._lock:
+            reasons = self._pending.pop((airline, result.reservation.get("reservation_code")), [])
+        if not reasons and not result.success and result.transient and is_throttle_error(result.error):
+            reasons = [result.error.splitlines()[0][:120]]
+        if not result.success and not reasons:
+            return
+        limiter = self.get(airline)
+        if result.success:
+            limiter.record_success()
+        for reason in reasons:
+            limiter.record_throttle(reason)
+
+    def record_spans(self, spans):
+        """Hold the throttles bots recorded as spans, e.g. the spans read back from a subprocess."""
+        for record in spans:
+            if record["step"] == THROTTLE_STEP:
+                self.hold_throttle(airline_key(record["airline"]), record["reservation_code"], record.get("reason", ""))
+
+    def summary(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {airline: limiter.snapshot() for airline, limiter in sorted(limiters.items())}
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("Rate limits:")
+        for airline, s in summary.items():
+            last = f", last: {s['last_throttle']}" if s["last_throttle"] else ""
+            logging.info(f"  {airline}: {s['rate_per_min']} check-ins/min, {s['throttles']} throttles{last}")
+
+
+RATE_LIMITS = RateLimits()
+
+
+def report_throttle(reason):
+    """Called by a bot that hit an error dialog, a bot challenge or similar pushback."""
+    current = current_trace()
+    if current is None:
+        logging.warning(f"Throttled: {reason}")
+        return
+    current.mark(THROTTLE_STEP, time.time(), 0, False, reason=reason)
+    RATE_LIMITS.hold_throttle(airline_key(current.airline), current.reservation_code, reason)
+
+
+def check_challenge(driver):
+    """Report a throttle when the page is a bot-challenge interstitial; returns whether it is."""
+    try:
+        challenged = driver.execute_script(CHALLENGE_SCRIPT)
+    except Exception:
+        return False
+    if challenged:
+        report_throttle("bot challenge")
+    return bool(challenged)
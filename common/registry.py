@@ -0,0 +1,120 @@
+import importlib
+import inspect
+import time
+from dataclasses import dataclass
+
+from common.browser import FULL_PROFILE
+from common.drivers import LAUNCH_STATS
+from common.flows import compile_flow, create_driver, run_checkin, run_checkin_async, run_group_checkin
+from common.orchestrator import PassengerResult, airline_key
+from common.resilience import is_transient
+
+# Compiled once per airline, see load_airlines
+_flows = {}
+
+
+def reservation_kwargs(function, reservation):
+    accepted = inspect.signature(function).parameters
+    return {name: reservation[name] for name in list(accepted)[1:] if name in reservation}
+
+
+@dataclass(frozen=True)
+class Airline:
+    name: str
+    package: str
+
+    @property
+    def module(self):
+        return importlib.import_module(f"{self.package}.main")
+
+    @property
+    def flow(self):
+        """The compiled FLOW of a bot defined as data (see common.flows), or None."""
+        flow = _flows.get(self.name)
+        if flow is None and hasattr(self.module, "FLOW"):
+            flow = _flows[self.name] = compile_flow(self.module.FLOW)
+        return flow
+
+    def create_driver(self, profile=FULL_PROFILE, profiles=None):
+        """
+        Start the airline's browser, in a persistent profile leased from `profiles`
+        (a WarmProfiles) when given; release_profile gives it back after quit.
+        """
+        lease = profiles.acquire(self.name) if profiles else None
+        user_data_dir = lease.path if lease else None
+        started = time.monotonic()
+        try:
+            if hasattr(self.module, "create_driver"):
+                driver = self.module.create_driver(profile, user_data_dir)
+            else:
+                driver = create_driver(self.flow.flow, profile, user_data_dir)
+        except Exception:
+            if lease:
+                lease.release()
+            raise
+        LAUNCH_STATS.record(self.name, time.monotonic() - started)
+        driver.profile_lease = lease
+        return driver
+
+    def perform_checkin(self, driver, reservation):
+        """
+        Call the airline's perform_checkin with the reservation fields it accepts.
+        The bots take different subsets of fields in different orders, so they are
+        always passed by keyword. Bots defined as a FLOW run on the shared step engine.
+        """
+        if not hasattr(self.module, "perform_checkin"):
+            return run_checkin(driver, self.flow, reservation)
+        return self.module.perform_checkin(driver, **reservation_kwargs(self.module.perform_checkin, reservation))
+
+    def perform_checkin_async(self, page, reservation):
+        """The same for the Playwright flow of the contexts engine; returns a coroutine."""
+        if not hasattr(self.module, "perform_checkin_async"):
+            return run_checkin_async(page, self.flow, reservation)
+        perform_checkin_async = self.module.perform_checkin_async
+        return perform_checkin_async(page, **reservation_kwargs(perform_checkin_async, reservation))
+
+    def perform_group_checkin(self, driver, group):
+        """
+        Check in every passenger of a group job in one session and return a
+        PassengerResult per passenger. Bots with neither their own group flow nor a
+        FLOW fall back to one full check-in per passenger on the same driver.
+        """
+        passengers = group['passengers']
+        perform_group_checkin = getattr(self.module, "perform_group_checkin", None)
+        if perform_group_checkin is not None:
+            return perform_group_checkin(driver, passengers)
+        if self.flow is not None:
+            return run_group_checkin(driver, self.flow, passengers)
+
+        results = []
+        for passenger in passengers:
+            try:
+                self.perform_checkin(driver, passenger)
+                results.append(PassengerResult(passenger, True))
+            except Exception as e:
+                results.append(PassengerResult(passenger, False, str(e), is_transient(e)))
+        return results
+
+
+AIRLINES = {
+    "AEROMEXICO": Airline("AEROMEXICO", "aeromexico"),
+    "VOLARIS": Airline("VOLARIS", "volaris"),
+    "VIVA AEROBUS": Airline("VIVA AEROBUS", "vivaaerobus"),
+}
+
+
+def get_airline(name):
+    try:
+        return AIRLINES[airline_key(name)]
+    except KeyError:
+        raise KeyError(f"Unknown airline: {name}") from None
+
+
+def load_airlines():
+    """
+    Import every bot and compile its flow up front, so worker threads never race on
+    the first import and an invalid flow fails at startup.
+    """
+    for airline in AIRLINES.values():
+        airline.flow
+    return AIRLINES
@@ -0,0 +1,92 @@
+import logging
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CheckinRejected(Exception):
+    """The airline answered but the check-in cannot succeed (e.g. reservation not found); never retried."""
+
+
+class CheckinCancelled(Exception):
+    """The check-in was called off before it started; says nothing about the airline."""
+
+
+def is_transient(error):
+    return not isinstance(error, (CheckinRejected, CheckinCancelled))
+
+
+def backoff_delay(attempt, base=5.0, cap=120.0):
+    """Exponential backoff with full jitter for the given retry attempt (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Stops dispatching to an airline after `failure_threshold` consecutive transient
+    failures. After `cooldown` seconds one probe reservation is let through: success
+    closes the breaker, failure re-opens it with the cooldown doubled (up to
+    `max_cooldown`).
+    """
+
+    def __init__(self, name, failure_threshold=3, cooldown=60.0, max_cooldown=600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def next_probe_at(self):
+        return self.opened_at + self.cooldown
+
+    def allow(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now >= self.next_probe_at:
+                self.state = HALF_OPEN
+                logging.info(f"Circuit for {self.name} half-open, sending a probe reservation")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(f"Circuit for {self.name} closed, airline is healthy again")
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+
+    def release_probe(self):
+        """The probe was called off without an outcome: let the next reservation probe instead."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.time() - self.cooldown
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        logging.warning(
+            f"Circuit for {self.name} opened after {self.failures} consecutive failures, "
+            f"pausing dispatch for {self.cooldown:.0f}s"
+        )
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common.orchestrator import airline_key
+
+# Hours before departure each airline opens web check-in (override with --checkin-offset)
+DEFAULT_CHECKIN_OFFSETS = {
+    "AEROMEXICO": 24,
+    "VOLARIS": 72,
+    "VIVA AEROBUS": 48,
+}
+
+# Below this, wait_for_dispatch stops sleeping and spins so the dispatch lands on time
+SPIN_THRESHOLD = 0.02
+
+
+def parse_departure(value):
+    """
+    Parse the optional departure column, e.g. "2024-07-01 06:45" or an ISO 8601
+    timestamp. Naive times are taken as local time on this host.
+    """
+    return datetime.fromisoformat(value.strip())
+
+
+def schedule_reservations(reservations, offsets):
+    """
+    Set `dispatch_at` on every reservation with a departure time to the moment its
+    airline's check-in window opens. Reservations without a departure, or whose
+    window is already open, are left to run immediately.
+    """
+    for reservation in reservations:
+        departure = (reservation.get('departure') or "").strip()
+        if departure:
+            airline = airline_key(reservation['airline'])
+            opens_at = parse_departure(departure) - timedelta(hours=offsets[airline])
+            if opens_at.timestamp() > time.time():
+                reservation['dispatch_at'] = opens_at.timestamp()
+                logging.info(f"Scheduled {reservation['last_name']} with {airline} for {opens_at.isoformat(' ')}")
+            else:
+                logging.info(f"Check-in window already open for {reservation['last_name']} with {airline}")
+        yield reservation
+
+
+class DispatchLag:
+    """How far behind its target time each scheduled dispatch actually started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    def record(self, airline, lag_ms):
+        with self._lock:
+            self._lags.setdefault(airline, []).append(lag_ms)
+
+    def log_summary(self):
+        with self._lock:
+            lags = {airline: sorted(values) for airline, values in self._lags.items()}
+        if not lags:
+            return
+        logging.info("Scheduled dispatch lag behind check-in window opening:")
+        for airline, values in sorted(lags.items()):
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            logging.info(
+                f"  {airline}: {len(values)} dispatches, avg {sum(values) / len(values):.1f}ms, "
+                f"p95 {p95:.1f}ms, max {values[-1]:.1f}ms"
+            )
+
+
+DISPATCH_LAG = DispatchLag()
+
+
+def wait_for_dispatch(reservation):
+    """
+    Block until the reservation's dispatch time and record the lag in milliseconds.
+    Called after the browser is leased so the check-in starts on a warm session.
+    """
+    dispatch_at = reservation.get('dispatch_at')
+    if not dispatch_at:
+        return None
+
+    while True:
+        remaining = dispatch_at - time.time()
+        if remaining <= 0:
+            break
+        if remaining > SPIN_THRESHOLD:
+            time.sleep(remaining - SPIN_THRESHOLD)
+
+    lag_ms = (time.time() - dispatch_at) * 1000
+    DISPATCH_LAG.record(airline_key(reservation['airline']), lag_ms)
+    logging.info(f"Dispatched {reservation['last_name']} {lag_ms:.1f}ms after check-in opened")
+    return lag_ms
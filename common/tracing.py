@@ -0,0 +1,162 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prefix of the span lines a bot prints to stdout when run as a subprocess
+TRACE_PREFIX = "TRACE "
+
+QUANTILES = (0.5, 0.95)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """The timing spans of one reservation's check-in."""
+
+    def __init__(self, airline, reservation_code):
+        self.airline = airline
+        self.reservation_code = reservation_code
+        self.spans = []
+
+    def add(self, step, started, duration, ok, **attrs):
+        self.spans.append({
+            "airline": self.airline,
+            "reservation_code": self.reservation_code,
+            "step": step,
+            "start": round(started, 3),
+            "duration_ms": round(duration * 1000, 1),
+            "ok": ok,
+            **attrs,
+        })
+
+    def mark(self, step, started, duration, ok, **attrs):
+        """
+        Add a marker span: an event or measurement of another kind than a step, e.g. a
+        throttle or the browser launch, kept out of the step latencies.
+        """
+        self.add(step, started, duration, ok, marker=True, **attrs)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(airline, reservation_code, emit=False):
+    """
+    Collect the spans recorded in this context. With `emit`, the spans are printed
+    to stdout on exit so the orchestrator can read them back from a subprocess.
+    """
+    current = Trace(airline, reservation_code)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        if emit:
+            for record in current.spans:
+                print(TRACE_PREFIX + json.dumps(record), flush=True)
+
+
+@contextmanager
+def span(step, **attrs):
+    """Time a check-in step. A step that raises is recorded with ok=False."""
+    started = time.time()
+    begin = time.monotonic()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        current = _current_trace.get()
+        if current is not None:
+            current.add(step, started, time.monotonic() - begin, ok, **attrs)
+
+
+def parse_emitted_spans(output):
+    return [json.loads(line[len(TRACE_PREFIX):]) for line in (output or "").splitlines() if line.startswith(TRACE_PREFIX)]
+
+
+def quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class SpanCollector:
+    """
+    Gathers spans from every check-in, appends them to a JSON lines file and
+    writes per-step duration summaries in Prometheus text format. Marker spans
+    (see Trace.mark) are only written to the file; their own stats report them.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._file = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+            self._file = open(jsonl_path, "a", encoding="utf-8")
+
+    def add(self, spans):
+        with self._lock:
+            for record in spans:
+                if not record.get("marker"):
+                    key = (record["airline"], record["step"])
+                    self._durations.setdefault(key, []).append(record["duration_ms"] / 1000)
+                if self._file:
+                    self._file.write(json.dumps(record) + "\n")
+            if self._file:
+                self._file.flush()
+
+    def summary(self):
+        """{(airline, step): {"count", "sum", "p50", "p95"}} in seconds."""
+        with self._lock:
+            durations = {key: sorted(values) for key, values in self._durations.items()}
+        return {
+            key: {
+                "count": len(values),
+                "sum": sum(values),
+                **{f"p{int(q * 100)}": quantile(values, q) for q in QUANTILES},
+            }
+            for key, values in durations.items()
+        }
+
+    def write_prometheus(self):
+        if not self.prometheus_path:
+            return
+        lines = [
+            "# HELP checkin_step_duration_seconds Duration of each check-in step.",
+            "# TYPE checkin_step_duration_seconds summary",
+        ]
+        for (airline, step), stats in sorted(self.summary().items()):
+            labels = f'airline="{airline}",step="{step}"'
+            for q in QUANTILES:
+                lines.append(f'checkin_step_duration_seconds{{{labels},quantile="{q}"}} {stats[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"checkin_step_duration_seconds_sum{{{labels}}} {stats['sum']:.6f}")
+            lines.append(f"checkin_step_duration_seconds_count{{{labels}}} {stats['count']}")
+
+        os.makedirs(os.path.dirname(self.prometheus_path) or ".", exist_ok=True)
+        tmp_path = self.prometheus_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("Check-in step latency (p50 / p95):")
+        for (airline, step), stats in sorted(summary.items()):
+            logging.info(f"  {airline} {step}: {stats['p50'] * 1000:.0f}ms / {stats['p95'] * 1000:.0f}ms over {stats['count']}")
+
+    def close(self):
+        self.write_prometheus()
+        if self._file:
+            self._file.close()
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from common.tracing import span
+
+# Loading indicators used by the airline sites
+SPINNER_SELECTORS = ".spinner, .loader, .loading, [class*='spinner'], [class*='loader'], mat-spinner, app-loader"
+
+# Counts the page's fetch/XHR requests. Installed in every new document by
+# install_network_tracker, so requests started by the action before a wait are seen too.
+NETWORK_TRACKER_SCRIPT = """
+if (!window.__pendingRequests) {
+    window.__pendingRequests = {count: 0, lastActivity: performance.now()};
+    const tracker = window.__pendingRequests;
+    const started = () => { tracker.count++; tracker.lastActivity = performance.now(); };
+    const finished = () => { tracker.count--; tracker.lastActivity = performance.now(); };
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function() {
+            started();
+            return originalFetch.apply(this, arguments).finally(finished);
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        started();
+        this.addEventListener('loadend', finished, {once: true});
+        return originalSend.apply(this, arguments);
+    };
+}
+"""
+
+NETWORK_IDLE_SCRIPT = "const quietMs = arguments[0];" + NETWORK_TRACKER_SCRIPT + """
+if (document.readyState !== 'complete' || window.__pendingRequests.count > 0) {
+    return false;
+}
+const resources = performance.getEntriesByType('resource');
+const lastResource = resources.length ? resources[resources.length - 1].responseEnd : 0;
+const lastActivity = Math.max(lastResource, window.__pendingRequests.lastActivity);
+return performance.now() - lastActivity >= quietMs;
+"""
+
+ANIMATIONS_FINISHED_SCRIPT = """
+if (!document.getAnimations) {
+    return true;
+}
+return document.getAnimations().every(a =>
+    a.playState !== 'running' || a.effect.getTiming().iterations === Infinity);
+"""
+
+
+def element_present(by, value):
+    return EC.presence_of_element_located((by, value))
+
+
+def element_visible(by, value):
+    return EC.visibility_of_element_located((by, value))
+
+
+def element_clickable(by, value):
+    return EC.element_to_be_clickable((by, value))
+
+
+def element_gone(by, value):
+    return EC.invisibility_of_element_located((by, value))
+
+
+def spinner_gone(selectors=SPINNER_SELECTORS):
+    def condition(driver):
+        return driver.execute_script(
+            "return Array.from(document.querySelectorAll(arguments[0])).every(e => !e.offsetParent);",
+            selectors,
+        )
+    return condition
+
+
+def install_network_tracker(driver):
+    """Run NETWORK_TRACKER_SCRIPT in every document the driver opens from now on."""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_SCRIPT})
+    except Exception as e:
+        logging.warning(f"Could not install the network tracker, network_idle waits start counting at their first poll: {str(e)}")
+
+
+def network_idle(quiet_ms=500):
+    """
+    No fetch/XHR in flight and no resource finished loading for `quiet_ms`. Without
+    install_network_tracker the requests are only counted from the first poll.
+    """
+    def condition(driver):
+        return driver.execute_script(NETWORK_IDLE_SCRIPT, quiet_ms)
+    return condition
+
+
+def animations_finished():
+    """No finite CSS animation or transition is still running, e.g. a modal sliding in."""
+    def condition(driver):
+        return driver.execute_script(ANIMATIONS_FINISHED_SCRIPT)
+    return condition
+
+
+def element_settled(by, value):
+    """The element is visible and every modal animation on the page has finished."""
+    visible = element_visible(by, value)
+    finished = animations_finished()
+
+    def condition(driver):
+        element = visible(driver)
+        return element if element and finished(driver) else False
+    return condition
+
+
+def all_of(*conditions):
+    def condition(driver):
+        result = True
+        for check in conditions:
+            result = check(driver)
+            if not result:
+                return False
+        return result
+    return condition
+
+
+class WaitStats:
+    """Aggregated durations of every wait, keyed by its description."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, description, elapsed, timed_out, replaces):
+        with self._lock:
+            stats = self._stats.setdefault(description, {
+                "count": 0, "timeouts": 0, "total": 0.0, "max": 0.0, "saved": 0.0,
+            })
+            stats["count"] += 1
+            stats["timeouts"] += int(timed_out)
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["saved"] += replaces - elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return {description: dict(stats) for description, stats in self._stats.items()}
+
+    def log_summary(self):
+        stats = self.snapshot()
+        if not stats:
+            return
+        logging.info("Wait times (time saved is relative to the fixed sleep each wait replaced):")
+        for description, s in sorted(stats.items()):
+            logging.info(
+                f"  {description}: {s['count']} waits, avg {s['total'] / s['count']:.2f}s, "
+                f"max {s['max']:.2f}s, {s['timeouts']} timeouts, saved {s['saved']:.1f}s"
+            )
+
+
+WAIT_STATS = WaitStats()
+
+
+def wait_until(driver, condition, timeout, description, replaces=0, required=True):
+    """
+    Wait for `condition` for at most `timeout` seconds and record how long it took.
+
+    `replaces` is the fixed sleep this wait stands in for, used to report the time
+    saved. When `required` is False a timeout is logged and None is returned instead
+    of raising TimeoutException.
+    """
+    started = time.monotonic()
+    timed_out = False
+    try:
+        with span(f"wait: {description}"):
+            return WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+    except TimeoutException:
+        timed_out = True
+        if required:
+            raise
+        logging.warning(f"Timed out after {timeout}s waiting for: {description}")
+        return None
+    finally:
+        WAIT_STATS.record(description, time.monotonic() - started, timed_out, replaces)
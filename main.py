@@ -1,57 +1,378 @@
-import csv
+import argparse
+import signal
 import subprocess
+import sys
 import os
-import time
 import logging
+import threading
+from contextlib import nullcontext
+from functools import partial
+
+from common.artifacts import configure_artifacts
+from common.boarding_passes import configure_boarding_passes, parse_emitted_boarding_passes
+from common.browser import ProfileReport, collect_page_metrics, configure_browser_profile, get_profile, lean_profile
+from common.browser_pool import BrowserPools
+from common.contexts import ContextEngine
+from common.daemon import KEEP_FINISHED_JOBS, CheckinDaemon, serve
+from common.drivers import LAUNCH_STATS, prepare_drivers
+from common.governor import ResourceGovernor, driver_pids, kill_orphans, mark_owned_processes
+from common.groups import group_reservations
+from common.journal import RunJournal
+from common.network import CONFIRMATION_STATS
+from common.orchestrator import Orchestrator, PassengerResult
+from common.preflight import Preflight
+from common.profiles import PAGE_LOADS, configure_profiles
+from common.rate_limit import RATE_LIMITS
+from common.registry import get_airline, load_airlines
+from common.scheduler import DEFAULT_CHECKIN_OFFSETS, DISPATCH_LAG, schedule_reservations, wait_for_dispatch
+from common.tracing import SpanCollector, parse_emitted_spans, trace
+from common.waits import WAIT_STATS
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+
+PROFILE_REPORT_PATH = os.path.join("reports", "browser_profiles.json")
+SPANS_PATH = os.path.join("reports", "checkin_spans.jsonl")
+PROMETHEUS_PATH = os.path.join("reports", "checkin_steps.prom")
+WORKER_RESOURCES_PATH = os.path.join("reports", "worker_resources.json")
+PAGE_LOADS_PATH = os.path.join("reports", "first_page_loads.json")
+
+# Default number of concurrent check-ins allowed against each airline site
+DEFAULT_AIRLINE_LIMITS = {
+    "VOLARIS": 2,
+    "AEROMEXICO": 2,
+    "VIVA AEROBUS": 2,
+}
 
-def run_airline_script(airline, last_name, reservation_code, email, date_of_birth):
+# Bot subprocesses run in their own session, out of reach of Ctrl-C; see interrupt_bots
+_running_bots = set()
+_running_bots_lock = threading.Lock()
+
+def run_airline_script(airline, last_name, reservation_code, email, date_of_birth, browser_profile="full", collector=None,
+                       governor=None, report=None):
     script_path = os.path.join(airline.lower().replace(" ", ""), "main.py")
     if not os.path.exists(script_path):
         logging.error(f"Script not found for airline: {airline}")
         return False
 
     cmd = [
-        "python3.10",
+        sys.executable,
         script_path,
         "--last_name", last_name,
         "--reservation_code", reservation_code,
         "--email", email,
-        "--date_of_birth", date_of_birth
+        "--date_of_birth", date_of_birth,
+        "--browser_profile", browser_profile
     ]
 
+    logging.info(f"Starting process for {last_name} with {airline}")
+    # Own session, so the bot and every browser it started can be killed as one group
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True)
+    with _running_bots_lock:
+        _running_bots.add(process)
     try:
-        logging.info(f"Starting process for {last_name} with {airline}")
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        with governor.watch([process.pid]) if governor else nullcontext() as watch:
+            stdout, stderr = process.communicate()
+    finally:
+        with _running_bots_lock:
+            _running_bots.discard(process)
+    spans = parse_emitted_spans(stdout)
+    # Throttles, launches, page loads and confirmations in the bot only reach this process through its spans
+    RATE_LIMITS.record_spans(spans)
+    LAUNCH_STATS.record_spans(spans)
+    PAGE_LOADS.record_spans(spans)
+    CONFIRMATION_STATS.record_spans(spans)
+    if report:
+        report.record_spans(spans)
+    if collector:
+        collector.add(spans)
+    if process.returncode == 0:
         logging.info(f"Successfully processed reservation for {last_name} with {airline}")
-        logging.debug(f"Output: {result.stdout}")
-        return True
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error processing reservation for {last_name} with {airline}: {e}")
-        logging.error(f"Error output: {e.stderr}")
-        return False
+        logging.debug(f"Output: {stdout}")
+        return parse_emitted_boarding_passes(stdout) or True
+    if watch and watch.killed:
+        logging.error(f"Killed process for {last_name} with {airline} after the {governor.budget:.0f}s budget")
+    else:
+        logging.error(f"Error processing reservation for {last_name} with {airline}: exit status {process.returncode}")
+    logging.error(f"Error output: {stderr}")
+    return False
+
+def interrupt_bots(signum, frame):
+    """SIGINT handler of a batch run: kill the process group of every running bot, then stop as Ctrl-C would."""
+    with _running_bots_lock:
+        processes = list(_running_bots)
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    if processes:
+        logging.warning(f"Interrupted, killed {len(processes)} running bots")
+    signal.default_int_handler(signum, frame)
+
+def with_boarding_passes(row, outcome):
+    """A runner outcome carrying the BoardingPasses a check-in returned, if any."""
+    if isinstance(outcome, list) and outcome:
+        return [PassengerResult(row, True, boarding_passes=outcome)]
+    return True
+
+def subprocess_runner(profile, collector, governor=None, report=None):
+    def run(row):
+        wait_for_dispatch(row)
+        outcome = run_airline_script(row['airline'], row['last_name'], row['reservation_code'], row['email'],
+                                     row['date_of_birth'], browser_profile=profile.name, collector=collector,
+                                     governor=governor, report=report)
+        return with_boarding_passes(row, outcome) if outcome else False
+    return run
+
+def in_process_runner(pools, report, collector, governor=None):
+    def run(row):
+        airline = get_airline(row['airline'])
+        logging.info(f"Starting check-in for {row['last_name']} with {airline.name}")
+        with pools.lease(airline) as driver:
+            wait_for_dispatch(row)
+            with governor.watch(partial(driver_pids, driver)) if governor else nullcontext(), \
+                    trace(airline.name, row['reservation_code']) as checkin_trace:
+                try:
+                    if 'passengers' in row:
+                        return airline.perform_group_checkin(driver, row)
+                    return with_boarding_passes(row, airline.perform_checkin(driver, row))
+                finally:
+                    report.record(airline.name, pools.profile, collect_page_metrics(driver))
+                    collector.add(checkin_trace.spans)
+    return run
+
+def context_runner(engine):
+    def run(row):
+        airline = get_airline(row['airline'])
+        logging.info(f"Starting check-in for {row['last_name']} with {airline.name} in a browser context")
+        wait_for_dispatch(row)
+        return with_boarding_passes(row, engine.checkin(airline, row))
+    return run
+
+def parse_airline_values(values, defaults, convert):
+    parsed = dict(defaults)
+    for value in values:
+        airline, _, setting = value.rpartition("=")
+        if not airline:
+            raise argparse.ArgumentTypeError(f"Invalid value '{value}', expected AIRLINE=VALUE")
+        parsed[airline.strip().upper()] = convert(setting)
+    return parsed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run airline check-ins for every reservation in a CSV file, or as a daemon")
+    parser.add_argument("--input", default="reservations.csv", help="Reservations CSV or JSON lines (.jsonl) file")
+    parser.add_argument("--rejects", help="Where rows failing pre-flight validation are written "
+                                          "(default: <input>.rejects.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of concurrent check-ins")
+    parser.add_argument("--airline-limit", action="append", default=[], metavar="AIRLINE=N",
+                        help="Maximum concurrent check-ins for one airline (repeatable)")
+    parser.add_argument("--engine", choices=["inprocess", "subprocess", "contexts"], default="inprocess",
+                        help="Run the bots in this process with pooled browsers, one script per reservation, or "
+                             "as isolated contexts of one shared browser per airline (needs Playwright)")
+    parser.add_argument("--recycle-after", type=int, default=20,
+                        help="Quit a pooled browser after this many reservations (0 = never)")
+    parser.add_argument("--browser-profile", choices=["full", "lean"], default="full",
+                        help="'lean' runs headless where the site allows it and blocks heavy resources and trackers")
+    parser.add_argument("--block-resource", default="image,font,media",
+                        help="Comma-separated resource types the lean profile blocks (image, font, media)")
+    parser.add_argument("--block-url", action="append", default=[], metavar="PATTERN",
+                        help="Extra URL pattern for the lean profile to block, e.g. '*ads.example.com*' (repeatable)")
+    parser.add_argument("--journal", default=os.path.join("runs", "journal.jsonl"),
+                        help="Journal of reservation outcomes used to resume interrupted runs")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Attempts a failed reservation gets across runs before it is skipped")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Keep running and start each reservation when its airline's check-in window opens, "
+                             "based on the optional 'departure' column (local time, e.g. 2024-07-01 06:45)")
+    parser.add_argument("--checkin-offset", action="append", default=[], metavar="AIRLINE=HOURS",
+                        help="Hours before departure an airline opens check-in (repeatable)")
+    parser.add_argument("--prewarm", type=float, default=10,
+                        help="Seconds before a scheduled check-in to lease and warm up its browser")
+    parser.add_argument("--artifacts-dir", default="artifacts",
+                        help="Where failure screenshots, DOM snapshots and traces are written, by run and airline")
+    parser.add_argument("--artifacts-max-mb", type=float, default=500,
+                        help="Total size of failure artifacts to keep before the oldest are deleted")
+    parser.add_argument("--artifacts-max-age-days", type=float, default=7,
+                        help="Delete failure artifacts older than this")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries for a reservation that failed for a transient reason")
+    parser.add_argument("--retry-base", type=float, default=5,
+                        help="Base delay in seconds of the jittered exponential retry backoff")
+    parser.add_argument("--retry-cap", type=float, default=120, help="Maximum retry backoff in seconds")
+    parser.add_argument("--breaker-threshold", type=int, default=3,
+                        help="Consecutive failures that pause dispatch to an airline")
+    parser.add_argument("--breaker-cooldown", type=float, default=60,
+                        help="Seconds before a paused airline is probed again")
+    parser.add_argument("--rate", action="append", default=[], metavar="AIRLINE=N",
+                        help="Starting check-ins per minute for an airline, e.g. --rate 'VIVA AEROBUS=4' (repeatable)")
+    parser.add_argument("--default-rate", type=float, default=6,
+                        help="Starting check-ins per minute for airlines without --rate")
+    parser.add_argument("--min-rate", type=float, default=1, help="Check-ins per minute an airline never drops below")
+    parser.add_argument("--max-rate", type=float, default=30,
+                        help="Check-ins per minute an airline is sped up to while its check-ins succeed")
+    parser.add_argument("--rate-burst", type=int, default=2,
+                        help="Check-ins that may start back to back before the rate applies")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon taking reservations over a local HTTP API instead of reading --input")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the daemon API listens on")
+    parser.add_argument("--port", type=int, default=8750, help="Port the daemon API listens on")
+    parser.add_argument("--socket", help="Serve the daemon API on this Unix socket instead of TCP")
+    parser.add_argument("--warm", type=int, default=1,
+                        help="Browsers the daemon starts per airline before the first reservation arrives")
+    parser.add_argument("--keep-jobs", type=int, default=KEEP_FINISHED_JOBS,
+                        help="Finished jobs the daemon keeps for its API, oldest forgotten first")
+    parser.add_argument("--max-browser-mb", type=float, default=1500,
+                        help="Recycle a pooled browser whose processes use more memory than this (0 disables)")
+    parser.add_argument("--checkin-budget", type=float, default=900,
+                        help="Kill the browser of a check-in still running after this many seconds (0 disables)")
+    parser.add_argument("--governor-interval", type=float, default=5,
+                        help="Seconds between samples of the workers' browser memory and CPU")
+    parser.add_argument("--boarding-passes-dir", default="boarding_passes",
+                        help="Where captured boarding-pass PDFs are stored, one directory per reservation")
+    parser.add_argument("--prepare-drivers", action=argparse.BooleanOptionalAction, default=True,
+                        help="Resolve and patch chromedriver once at startup into the shared drivers/ cache")
+    parser.add_argument("--warm-profiles", action="store_true",
+                        help="Start browsers in persistent per-airline profiles that keep the HTTP cache and consent "
+                             "cookies; reservation data is wiped between uses")
+    parser.add_argument("--profiles-dir", default="profiles", help="Where the warm browser profiles are kept")
+    parser.add_argument("--profiles-per-airline", type=int, default=None,
+                        help="Warm profiles kept per airline (default: --workers)")
+    return parser.parse_args()
+
+def run_batch(args, orchestrator, journal, reservations):
+    if args.schedule:
+        offsets = parse_airline_values(args.checkin_offset, DEFAULT_CHECKIN_OFFSETS, float)
+        reservations = schedule_reservations(reservations, offsets)
+        # The whole input has to be queued to order it by check-in time
+        orchestrator.buffer_size = float("inf")
+        orchestrator.prewarm = args.prewarm
+
+    jobs = journal.pending(reservations)
+    if args.engine == "inprocess":
+        # Passengers sharing a reservation code are checked in together in one session
+        jobs = group_reservations(jobs)
+
+    for result in orchestrator.run(jobs):
+        journal.record(result)
+        last_name = result.reservation['last_name']
+        if result.success:
+            logging.info(f"Completed processing for {last_name} with {result.airline} in {result.duration:.1f}s")
+            for boarding_pass in result.boarding_passes:
+                logging.info(f"Boarding pass for {last_name}: {boarding_pass.path}")
+        else:
+            logging.warning(f"Failed to process reservation for {last_name} with {result.airline} "
+                            f"after {result.attempts} attempts")
+
+def serve_jobs(args, orchestrator, journal, pools, governor=None):
+    prepare = None
+    if args.schedule:
+        offsets = parse_airline_values(args.checkin_offset, DEFAULT_CHECKIN_OFFSETS, float)
+        prepare = lambda reservation: next(schedule_reservations([reservation], offsets))
+        # Scheduled jobs wait in the dispatcher, so they must not hold back new submissions
+        orchestrator.buffer_size = float("inf")
+        orchestrator.prewarm = args.prewarm
+
+    daemon = CheckinDaemon(orchestrator, journal, prepare, governor, args.keep_jobs)
+    if pools and args.warm:
+        # Start browsers in the background so the API is up right away
+        threading.Thread(target=pools.warm, args=(load_airlines().values(), args.warm),
+                         name="warmup", daemon=True).start()
+    serve(daemon, args.host, args.port, args.socket)
 
 def main():
-    with open('reservations.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            last_name = row['last_name']
-            reservation_code = row['reservation_code']
-            email = row['email']
-            date_of_birth = row['date_of_birth']
-            airline = row['airline']
-
-            success = run_airline_script(airline, last_name, reservation_code, email, date_of_birth)
-            
-            if success:
-                logging.info(f"Completed processing for {last_name}. Waiting before next reservation...")
-                time.sleep(10)  # Wait for 10 seconds before processing the next reservation
-            else:
-                logging.warning(f"Failed to process reservation for {last_name}. Moving to next reservation...")
+    args = parse_args()
+    preflight = None
+    if not args.serve:
+        # Validate the whole input before any browser starts
+        preflight = Preflight(args.input, args.rejects)
+        preflight.run().log_summary(preflight.rejects_path)
+        if not preflight.report.accepted:
+            logging.warning("No valid reservations to process.")
+            return
+    if args.browser_profile == "lean":
+        block_types = [t.strip() for t in args.block_resource.split(",") if t.strip()]
+        profile = lean_profile(block_types, args.block_url)
+    else:
+        profile = get_profile(args.browser_profile)
+    # Bot subprocesses only get the profile's name on their command line
+    configure_browser_profile(profile)
+
+    artifacts = configure_artifacts(args.artifacts_dir, max_bytes=int(args.artifacts_max_mb * 1024 * 1024),
+                                    max_age_days=args.artifacts_max_age_days)
+    configure_boarding_passes(args.boarding_passes_dir)
+    profiles = None
+    if args.warm_profiles and args.engine != "contexts":
+        profiles = configure_profiles(args.profiles_dir, args.profiles_per_airline or args.workers)
+    collector = SpanCollector(SPANS_PATH, PROMETHEUS_PATH)
+    RATE_LIMITS.configure(parse_airline_values(args.rate, {}, float), args.default_rate, args.min_rate,
+                          args.max_rate, args.rate_burst)
+    # Browsers left behind by a previous run that crashed
+    mark_owned_processes()
+    kill_orphans()
+    governor = ResourceGovernor(args.max_browser_mb, args.checkin_budget, args.governor_interval,
+                                WORKER_RESOURCES_PATH).start()
+    report = ProfileReport(PROFILE_REPORT_PATH)
+    orchestrator = Orchestrator(
+        subprocess_runner(profile, collector, governor, report),
+        max_workers=args.workers,
+        airline_limits=parse_airline_values(args.airline_limit, DEFAULT_AIRLINE_LIMITS, int),
+        rate_limits=RATE_LIMITS,
+        retries=args.retries,
+        retry_base=args.retry_base,
+        retry_cap=args.retry_cap,
+        breaker_threshold=args.breaker_threshold,
+        breaker_cooldown=args.breaker_cooldown,
+    )
+    if args.prepare_drivers and args.engine != "contexts":
+        try:
+            prepare_drivers()
+        except Exception as e:
+            logging.warning(f"Failed to prepare drivers, every browser will resolve its own: {str(e)}")
+    journal = RunJournal(args.journal, max_attempts=args.max_attempts)
+    pools = None
+    engine = None
+    if args.engine == "inprocess":
+        load_airlines()
+        pools = BrowserPools(orchestrator.limit_for, max_uses=args.recycle_after, profile=profile, governor=governor,
+                             profiles=profiles)
+        orchestrator.runner = in_process_runner(pools, report, collector, governor)
+    elif args.engine == "contexts":
+        load_airlines()
+        engine = ContextEngine(profile, collector)
+        orchestrator.runner = context_runner(engine)
+
+    try:
+        if args.serve:
+            serve_jobs(args, orchestrator, journal, pools, governor)
+        else:
+            # The daemon handles SIGINT itself and lets running check-ins finish
+            signal.signal(signal.SIGINT, interrupt_bots)
+            run_batch(args, orchestrator, journal, preflight.accepted())
+    finally:
+        journal.close()
+        collector.close()
+        artifacts.close()
+        if pools:
+            pools.close()
+        if engine:
+            engine.close()
+        governor.close()
 
     logging.info("All reservations processed.")
+    orchestrator.stats.log_summary()
+    WAIT_STATS.log_summary()
+    LAUNCH_STATS.log_summary()
+    governor.log_summary()
+    RATE_LIMITS.log_summary()
+    governor.save()
+    CONFIRMATION_STATS.log_summary()
+    DISPATCH_LAG.log_summary()
+    collector.log_summary()
+    report.save()
+    report.log_summary()
+    PAGE_LOADS.log_summary()
+    PAGE_LOADS.save(PAGE_LOADS_PATH)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
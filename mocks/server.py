@@ -0,0 +1,175 @@
+"""
+Local mock versions of the Aeromexico, Volaris and Viva Aerobus check-in sites.
+
+The pages reproduce the DOM the bots depend on and call small JSON APIs, so every
+flow runs end to end against localhost. Each request can be delayed and API calls
+can fail at a configurable rate; reservation codes starting with "ERR" always fail.
+
+    python -m mocks.server --port 8765 --latency 0.3 --jitter 0.2 --error-rate 0.05
+
+Point the bots at it with the *_BASE_URL environment variables printed on start.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+# Mount point, page path and environment variable of each mock site
+SITES = {
+    "aeromexico": {"page": "/es-mx/check-in", "env": "AEROMEXICO_BASE_URL"},
+    "volaris": {"page": "/", "env": "VOLARIS_BASE_URL"},
+    "vivaaerobus": {"page": "/es-mx/check-in", "env": "VIVAAEROBUS_BASE_URL"},
+}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2
+    jitter: float = 0.1
+    error_rate: float = 0.0
+
+    def delay(self):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def should_fail(self, body):
+        if str(body.get("pnr") or body.get("reservationCode") or "").upper().startswith("ERR"):
+            return True
+        return random.random() < self.error_rate
+
+
+def boarding_pass_pdf(site, pnr):
+    """A minimal one-page PDF naming the reservation, the same bytes for the same reservation."""
+    text = f"{site} boarding pass {pnr}".replace("(", "").replace(")", "")
+    stream = f"BT /F1 18 Tf 40 100 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 400 200] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+class MockAirlineHandler(BaseHTTPRequestHandler):
+    config = MockConfig()
+    pages = {}
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock {self.address_string()} {format % args}")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _site(self):
+        path = urlsplit(self.path).path
+        site, _, rest = path.lstrip("/").partition("/")
+        return site, "/" + rest
+
+    def do_GET(self):
+        site, path = self._site()
+        if site in SITES and path.endswith("/api/boarding-passes/pdf"):
+            self.config.delay()
+            pnr = parse_qs(urlsplit(self.path).query).get("pnr", [""])[0]
+            self._send(200, "application/pdf", boarding_pass_pdf(site, pnr))
+            return
+        if site not in SITES or path != SITES[site]["page"]:
+            self._send(404, "text/plain", b"Not found")
+            return
+        self.config.delay()
+        self._send(200, "text/html; charset=utf-8", self.pages[site])
+
+    def do_POST(self):
+        site, path = self._site()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        if site not in SITES or "/api/" not in path:
+            self._send(404, "application/json", b'{"error": "not found"}')
+            return
+
+        self.config.delay()
+        if self.config.should_fail(body):
+            self._send(500, "application/json", json.dumps({"error": "injected failure"}).encode())
+        else:
+            self._send(200, "application/json", json.dumps({"ok": True, "endpoint": path}).encode())
+
+
+def load_pages():
+    pages = {}
+    for site in SITES:
+        with open(os.path.join(PAGES_DIR, f"{site}.html"), "rb") as file:
+            pages[site] = file.read()
+    return pages
+
+
+def create_server(host="127.0.0.1", port=0, config=None):
+    handler = type("ConfiguredMockHandler", (MockAirlineHandler,), {
+        "config": config or MockConfig(),
+        "pages": load_pages(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def base_urls(server):
+    host, port = server.server_address[:2]
+    return {SITES[site]["env"]: f"http://{host}:{port}/{site}" for site in SITES}
+
+
+def start_in_thread(config=None, host="127.0.0.1", port=0):
+    """Start a mock server on a background thread and return (server, base_urls)."""
+    server = create_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="mock-airlines", daemon=True).start()
+    return server, base_urls(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock airline check-in sites on localhost")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Base delay of every request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- variation of the delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls that fail")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = create_server(args.host, args.port, MockConfig(args.latency, args.jitter, args.error_rate))
+    for env, url in base_urls(server).items():
+        logging.info(f"export {env}={url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
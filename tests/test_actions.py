@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import TimeoutException
+
+from common.actions import (FILL_FORM_SCRIPT, FIND_FIRST_SCRIPT, _candidates, click_first, css, fill_form, find_first,
+                            text, xpath)
+
+
+class FakeDriver:
+    """A page holding the selectors in `present`; the selectors in `appear` show up after that many polls."""
+
+    def __init__(self, present=(), appear=None):
+        self.present = set(present)
+        self.appear = dict(appear or {})
+        self.calls = []
+        self.filled = {}
+
+    def _tick(self):
+        for value, polls in list(self.appear.items()):
+            if polls <= 0:
+                self.present.add(value)
+                del self.appear[value]
+            else:
+                self.appear[value] = polls - 1
+
+    def _locate(self, candidates):
+        for index, candidate in enumerate(candidates):
+            if candidate[1] in self.present:
+                return index
+        return None
+
+    def execute_script(self, script, *args):
+        self._tick()
+        self.calls.append(args)
+        if script == FIND_FIRST_SCRIPT:
+            candidates, enabled, click = args
+            index = self._locate(candidates)
+            return None if index is None else [index, f"element {candidates[index][1]}"]
+        if script == FILL_FORM_SCRIPT:
+            missing = [name for name, candidates, _ in args[0] if self._locate(candidates) is None]
+            if missing:
+                return {"missing": missing}
+            self.filled = {name: value for name, _, value in args[0]}
+            fallbacks = {name: self._locate(candidates) for name, candidates, _ in args[0] if self._locate(candidates)}
+            return {"filled": len(args[0]), "fallbacks": fallbacks}
+        raise AssertionError("unexpected script")
+
+
+def test_a_single_locator_or_a_list_of_candidates():
+    assert _candidates(css("#code")) == [["css", "#code"]]
+    assert _candidates((css("#code"), xpath("//input"), text("Code", "label"))) == [
+        ["css", "#code"], ["xpath", "//input"], ["text", "Code", "label"],
+    ]
+
+
+def test_find_first_falls_back_in_one_poll(caplog):
+    driver = FakeDriver({"#new-code"})
+    element = find_first(driver, [css("#old-code"), css("#new-code")], 1, "Code field")
+    assert element == "element #new-code"
+    assert len(driver.calls) == 1
+    assert "Code field: first 1 locator(s) did not match, used ['css', '#new-code']" in caplog.text
+
+
+def test_click_first_waits_for_an_enabled_match():
+    driver = FakeDriver(appear={"#search": 2})
+    assert click_first(driver, css("#search"), 2, "Search button")
+    candidates, enabled, click = driver.calls[-1]
+    assert enabled and click
+    assert len(driver.calls) == 3
+
+
+def test_optional_click_returns_false_on_timeout():
+    assert click_first(FakeDriver(), css("#cookies"), 0.2, "Cookie banner", required=False) is False
+
+
+def test_fill_form_sets_every_field_at_once(caplog):
+    driver = FakeDriver({"#last-name", "#code"})
+    assert fill_form(driver, [("last_name", [css("#surname"), css("#last-name")], "PEREZ"),
+                              ("code", css("#code"), "ABC123")], 1, "Reservation form")
+    assert driver.filled == {"last_name": "PEREZ", "code": "ABC123"}
+    assert "Reservation form (last_name): first 1 locator(s) did not match" in caplog.text
+
+
+def test_fill_form_names_the_missing_fields():
+    driver = FakeDriver({"#code"})
+    with pytest.raises(TimeoutException, match="Reservation form: fields not found: last_name, email"):
+        fill_form(driver, [("last_name", css("#last-name"), "PEREZ"), ("code", css("#code"), "ABC123"),
+                           ("email", css("#email"), "a@b.co")], 0.2, "Reservation form")
+    assert driver.filled == {}
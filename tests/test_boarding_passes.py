@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import json
+import os
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from common import boarding_passes
+from common.boarding_passes import (BOARDING_PASSES_DIR_ENV, BoardingPassStore, PdfCapture, configure_boarding_passes,
+                                    emit_boarding_passes, parse_emitted_boarding_passes)
+from common.network import ResponseMatcher
+
+PDF = b"%PDF-1.4 boarding pass"
+
+
+def test_save_names_the_file_by_its_hash(tmp_path):
+    store = BoardingPassStore(str(tmp_path))
+    saved = store.save("Viva Aerobus", " abc123 ", PDF)
+
+    sha256 = hashlib.sha256(PDF).hexdigest()
+    assert saved.path == os.path.join(str(tmp_path), "viva-aerobus", "ABC123", f"{sha256}.pdf")
+    assert (saved.sha256, saved.size, saved.duplicate) == (sha256, len(PDF), False)
+    with open(saved.path, "rb") as file:
+        assert file.read() == PDF
+    assert os.listdir(os.path.dirname(saved.path)) == [f"{sha256}.pdf"]
+
+
+def test_same_pdf_is_stored_once(tmp_path):
+    store = BoardingPassStore(str(tmp_path))
+    first = store.save("VOLARIS", "ABC123", PDF)
+    second = store.save("VOLARIS", "ABC123", PDF)
+    assert second.duplicate and second.path == first.path
+
+
+def test_rejects_content_that_is_not_a_pdf(tmp_path):
+    store = BoardingPassStore(str(tmp_path))
+    with pytest.raises(ValueError, match="not a PDF"):
+        store.save("VOLARIS", "ABC123", b"<html>session expired</html>")
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_emitted_boarding_passes_round_trip(tmp_path, capsys):
+    saved = BoardingPassStore(str(tmp_path)).save("VOLARIS", "ABC123", PDF)
+    print("Check-in completed")
+    emit_boarding_passes([saved])
+    assert parse_emitted_boarding_passes(capsys.readouterr().out) == [saved]
+    assert parse_emitted_boarding_passes(None) == []
+
+
+def test_configure_stores_an_absolute_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(boarding_passes, "_store", None)
+    monkeypatch.delenv(BOARDING_PASSES_DIR_ENV, raising=False)
+    store = configure_boarding_passes("passes")
+    assert store.root == str(tmp_path / "passes")
+    assert os.environ[BOARDING_PASSES_DIR_ENV] == store.root
+    assert boarding_passes.get_store() is store
+
+
+def event(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+class FakeDriver:
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.log = []
+        self.fetched = []
+
+    def get_log(self, kind):
+        entries, self.log = self.log, []
+        return entries
+
+    def respond(self, request_id, url, method="GET", mime_type="application/pdf", finished=True):
+        self.log += [
+            event("Network.requestWillBeSent", requestId=request_id, request={"url": url, "method": method}),
+            event("Network.responseReceived", requestId=request_id, response={"url": url, "mimeType": mime_type}),
+        ]
+        if finished:
+            self.log.append(event("Network.loadingFinished", requestId=request_id))
+
+    def execute_cdp_cmd(self, command, params):
+        body = self.bodies[params["requestId"]]
+        if body is None:
+            raise RuntimeError("No resource with given identifier found")
+        return {"body": base64.b64encode(body).decode(), "base64Encoded": True}
+
+    def execute_async_script(self, script, url):
+        self.fetched.append(url)
+        return base64.b64encode(PDF).decode()
+
+
+def test_capture_reads_pdf_responses_once_they_finish():
+    driver = FakeDriver({"1": PDF, "2": b"{}"})
+    capture = PdfCapture(driver)
+    assert capture.available
+    driver.respond("1", "https://example.com/pass", finished=False)
+    driver.respond("2", "https://example.com/api/status", mime_type="application/json")
+    assert capture.poll() == 0
+    driver.log.append(event("Network.loadingFinished", requestId="1"))
+    assert capture.poll() == 1
+    assert capture.pdfs == [PDF]
+
+
+def test_capture_matches_by_url_and_refetches_evicted_bodies():
+    driver = FakeDriver({"1": None, "2": b"%PDF-1.4 other"})
+    capture = PdfCapture(driver, ResponseMatcher(r"/boarding-pass$", "GET"))
+    driver.respond("1", "https://example.com/boarding-pass", mime_type="application/octet-stream")
+    driver.respond("2", "https://example.com/other", mime_type="application/octet-stream")
+    assert capture.poll() == 1
+    assert capture.pdfs == [PDF]
+    assert driver.fetched == ["https://example.com/boarding-pass"]
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from common.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self, driver_pid, browser_pid):
+        self.service = SimpleNamespace(process=SimpleNamespace(pid=driver_pid))
+        self.browser_pid = browser_pid
+        self.window_handles = ["main"]
+        self.switch_to = SimpleNamespace(window=lambda handle: None)
+        self.current_url = "about:blank"
+        self.quit_called = False
+
+    def reconnect(self, timeout):
+        self.service.process = SimpleNamespace(pid=self.service.process.pid + 1)
+
+    def execute_cdp_cmd(self, command, params):
+        return {}
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeGovernor:
+    def __init__(self, recycle=False):
+        self.recycle = recycle
+        self.checked = []
+        self.snapshots = []
+
+    def recycle_reason(self, pids):
+        self.checked.append(pids)
+        return "too big" if self.recycle else None
+
+    def snapshot(self, pids):
+        self.snapshots.append(pids)
+        return []
+
+    def reap(self, processes):
+        pass
+
+
+def test_governor_sees_the_restarted_chromedriver():
+    governor = FakeGovernor(recycle=True)
+    drivers = iter([FakeDriver(100, 200)])
+    pool = BrowserPool("VOLARIS", lambda: next(drivers), 1, governor=governor)
+    with pool.lease() as driver:
+        driver.reconnect(0)
+    assert governor.checked == [[101, 200]]
+    assert governor.snapshots == [[101, 200]]
+    assert driver.quit_called
+
+
+def test_sessions_are_reused_until_max_uses():
+    started = []
+
+    def factory():
+        started.append(FakeDriver(100 + len(started), 200))
+        return started[-1]
+
+    pool = BrowserPool("VOLARIS", factory, 1, max_uses=2, governor=FakeGovernor())
+    leased = []
+    for _ in range(3):
+        with pool.lease() as driver:
+            leased.append(driver)
+    assert leased[0] is leased[1] is started[0] and leased[2] is started[1]
+    assert started[0].quit_called and not started[1].quit_called
+    pool.close()
+    assert started[1].quit_called
@@ -0,0 +1,167 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from common.daemon import CANCELLED, QUEUED, SKIPPED, CheckinDaemon, create_server
+from common.journal import SUCCEEDED, RunJournal
+from common.orchestrator import CheckinResult, Orchestrator
+
+
+def reservation(code="ABC123", last_name="Perez", **extra):
+    return {"airline": "volaris", "reservation_code": code, "last_name": last_name, "email": "a@b.co", **extra}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    yield journal
+    journal.close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_submit_normalizes_and_dedupes(journal):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    first = daemon.submit([reservation(), reservation(" abc123 ", "perez")])
+    again = daemon.submit([reservation()])
+    assert first[0] is first[1] is again[0]
+    assert first[0].reservation["reservation_code"] == "ABC123"
+    assert len(daemon.queue) == 1
+
+
+def test_submit_rejects_invalid_input(journal):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    with pytest.raises(ValueError, match="Reservation 2: .*missing email"):
+        daemon.submit([reservation(), reservation(email="")])
+    # Nothing is queued from a batch with an invalid reservation
+    assert daemon.list() == []
+
+
+def test_journaled_reservation_is_skipped(journal):
+    journal.record(CheckinResult(reservation(), True, 0.0, 1.0))
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    job, = daemon.submit([reservation()])
+    assert job.state == SKIPPED and job.error == "Already checked in"
+    assert len(daemon.queue) == 0
+
+
+def test_cancelled_job_never_runs_and_can_be_resubmitted(journal):
+    calls = []
+    daemon = CheckinDaemon(Orchestrator(lambda row: calls.append(row) or True), journal)
+    job, = daemon.submit([reservation()])
+    assert daemon.cancel(job.id)
+    assert job.state == CANCELLED
+    assert not daemon.cancel(job.id)
+
+    resubmitted, = daemon.submit([reservation()])
+    assert resubmitted.id != job.id and resubmitted.state == QUEUED
+
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    wait_until(lambda: resubmitted.state == SUCCEEDED)
+    daemon.shutdown()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert [row["job_id"] for row in calls] == [resubmitted.id]
+    assert job.state == CANCELLED
+    assert journal.lookup(reservation()) == (SUCCEEDED, 1)
+
+
+def test_shutdown_cancels_scheduled_jobs(journal):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    scheduled, = daemon.submit([reservation(dispatch_at=time.time() + 3600)])
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    wait_until(lambda: len(daemon.queue) == 0)
+
+    started = time.monotonic()
+    daemon.shutdown()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 5
+    assert scheduled.state == CANCELLED
+    assert journal.lookup(reservation()) == (None, 0)
+
+
+def test_shutdown_lets_running_check_ins_finish(journal):
+    release = threading.Event()
+
+    def runner(row):
+        release.wait(5)
+        return True
+
+    daemon = CheckinDaemon(Orchestrator(runner, max_workers=1, airline_limits={"VOLARIS": 1}), journal)
+    running, queued = daemon.submit([reservation("ABC123"), reservation("DEF456")])
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    wait_until(lambda: running.attempts == 1)
+
+    daemon.shutdown()
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert running.state == SUCCEEDED
+    assert queued.state == CANCELLED
+
+
+def test_subscribers_get_every_finished_job(journal):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    subscriber = daemon.subscribe()
+    job, = daemon.submit([reservation()])
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    finished = subscriber.get(timeout=5)
+    daemon.shutdown()
+    thread.join(5)
+    assert finished["id"] == job.id and finished["state"] == SUCCEEDED
+    # The email and date of birth stay out of what is published
+    assert "email" not in finished
+    assert subscriber.get(timeout=5) is None
+
+
+def test_oldest_finished_jobs_are_forgotten(journal):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal, keep_finished=2)
+    jobs = [daemon.submit([reservation(code)])[0] for code in ("AAA111", "BBB222", "CCC333", "DDD444")]
+    for job in jobs[:3]:
+        daemon.cancel(job.id)
+    assert [job.id for job in daemon.list()] == [jobs[1].id, jobs[2].id, jobs[3].id]
+    assert daemon.get(jobs[0].id) is None
+    # Queued and running jobs are never forgotten
+    assert daemon.get(jobs[3].id).state == QUEUED
+
+    resubmitted, = daemon.submit([reservation("AAA111")])
+    assert resubmitted.state == QUEUED and resubmitted.id != jobs[0].id
+
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    wait_until(lambda: resubmitted.state == SUCCEEDED and jobs[3].state == SUCCEEDED)
+    daemon.shutdown()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(daemon.list()) == 2
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length_is_a_bad_request(journal, length):
+    daemon = CheckinDaemon(Orchestrator(lambda row: True), journal)
+    server = create_server(daemon, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        connection.putrequest("POST", "/jobs")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert json.loads(response.read()) == {"error": "invalid Content-Length"}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,348 @@
+import base64
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("seleniumbase")
+
+from common import boarding_passes, flows, groups
+from common.actions import FILL_FORM_SCRIPT, FIND_FIRST_SCRIPT, css
+from common.boarding_passes import BoardingPassStore
+from common.browser import FULL_PROFILE, PAGE_METRICS_SCRIPT, lean_profile
+from common.flows import (COUNT_SCRIPT, SPINNER_GONE, Capture, Click, CompiledStep, Confirm, Dismiss, Fill, Flow,
+                          FlowError, Open, RejectIf, Wait, compile_flow, new_match, run_checkin, run_group_checkin,
+                          validate, visible)
+from common.network import ResponseMatcher
+from common.rate_limit import CHALLENGE_SCRIPT
+from common.resilience import CheckinRejected
+from common.tracing import trace
+from common.waits import NETWORK_TRACKER_SCRIPT
+
+PDF = b"%PDF-1.4 boarding pass"
+
+
+class FakeDriver:
+    """Records the DevTools state of each chromedriver session and what was set when a page started loading."""
+
+    def __init__(self, **options):
+        self.options = options
+        self.session = 0
+        self.blocked = {}
+        self.new_document_scripts = {}
+        self.loads = []
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Network.setBlockedURLs":
+            self.blocked[self.session] = params["urls"]
+        elif command == "Page.addScriptToEvaluateOnNewDocument":
+            self.new_document_scripts.setdefault(self.session, []).append(params["source"])
+        return {}
+
+    def execute_script(self, script, *args):
+        if script.startswith("window.location.href"):
+            self.loads.append((args[0], self.blocked.get(self.session)))
+        return None
+
+
+class FakeUcDriver(FakeDriver):
+    def reconnect(self, timeout):
+        self.session += 1
+
+
+class FakePlainDriver(FakeDriver):
+    def get(self, url):
+        self.loads.append((url, self.blocked.get(self.session)))
+
+
+def open_step(driver):
+    context = {"reservation_code": "ABC123"}
+    CompiledStep(Open("open", "https://example.com/{reservation_code}", reconnect=0), "VOLARIS").run(driver, context)
+
+
+def test_uc_page_loads_in_the_tab_with_blocked_urls(monkeypatch):
+    monkeypatch.setattr(flows, "Driver", FakeUcDriver)
+    profile = lean_profile()
+    driver = flows.create_driver(Flow("VOLARIS", "https://example.com", ()), profile)
+    open_step(driver)
+
+    assert driver.loads == [("https://example.com/ABC123", profile.blocked_urls)]
+    # Set again for the session of the restarted chromedriver
+    assert driver.blocked[driver.session] == profile.blocked_urls
+
+
+def test_uc_network_tracker_survives_the_reconnect(monkeypatch):
+    monkeypatch.setattr(flows, "Driver", FakeUcDriver)
+    driver = flows.create_driver(Flow("VOLARIS", "https://example.com", ()), FULL_PROFILE)
+    assert driver.new_document_scripts == {0: [NETWORK_TRACKER_SCRIPT]}
+    open_step(driver)
+    assert driver.new_document_scripts[driver.session] == [NETWORK_TRACKER_SCRIPT]
+
+
+def test_plain_driver_loads_with_get(monkeypatch):
+    monkeypatch.setattr(flows, "Driver", FakePlainDriver)
+    driver = flows.create_driver(Flow("VOLARIS", "https://example.com", ()), lean_profile())
+    open_step(driver)
+    assert [url for url, _ in driver.loads] == ["https://example.com/ABC123"]
+
+
+def test_full_profile_blocks_nothing(monkeypatch):
+    monkeypatch.setattr(flows, "Driver", FakeUcDriver)
+    driver = flows.create_driver(Flow("VOLARIS", "https://example.com", ()), FULL_PROFILE)
+    open_step(driver)
+    assert driver.loads == [("https://example.com/ABC123", None)]
+
+
+def event(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def response_events(request_id, url, method, status=200, mime_type="application/json"):
+    return [
+        event("Network.requestWillBeSent", requestId=request_id, request={"url": url, "method": method}),
+        event("Network.responseReceived", requestId=request_id,
+              response={"url": url, "status": status, "mimeType": mime_type}),
+        event("Network.loadingFinished", requestId=request_id),
+    ]
+
+
+class FakeSite:
+    """
+    A driver whose page is a count of elements per CSS selector. Clicking a selector
+    runs its handler, which changes the page or logs network events.
+    """
+
+    def __init__(self, elements=(), on_click=None, email_status=200):
+        self.elements = Counter(elements)
+        self.on_click = on_click or {}
+        self.email_status = email_status
+        self.log = []
+        self.requests = 0
+        self.opened = []
+        self.clicked = []
+        self.filled = []
+
+    def _match(self, candidates):
+        for index, candidate in enumerate(candidates):
+            if self.elements[candidate[1]]:
+                return index
+        return None
+
+    def get(self, url):
+        self.opened.append(url)
+
+    def get_log(self, kind):
+        entries, self.log = self.log, []
+        return entries
+
+    def get_screenshot_as_png(self):
+        return b""
+
+    page_source = "<html></html>"
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Network.getResponseBody":
+            return {"body": base64.b64encode(PDF).decode(), "base64Encoded": True}
+        raise RuntimeError(f"no {command} here")
+
+    def respond(self, path, method="POST", status=200, mime_type="application/json"):
+        self.requests += 1
+        self.log += response_events(str(self.requests), f"https://example.com{path}", method, status, mime_type)
+
+    def execute_script(self, script, *args):
+        if script == FIND_FIRST_SCRIPT:
+            candidates, _, click = args
+            index = self._match(candidates)
+            if index is None:
+                return None
+            if click:
+                selector = candidates[index][1]
+                self.clicked.append(selector)
+                self.on_click.get(selector, lambda site: None)(self)
+            return [index, {}]
+        if script == FILL_FORM_SCRIPT:
+            fields = args[0]
+            missing = [name for name, candidates, _ in fields if self._match(candidates) is None]
+            if missing:
+                return {"missing": missing}
+            self.filled.append({name: value for name, _, value in fields})
+            fallbacks = {name: self._match(candidates) for name, candidates, _ in fields if self._match(candidates)}
+            return {"filled": len(fields), "fallbacks": fallbacks}
+        if script == COUNT_SCRIPT:
+            index = self._match(args[0])
+            return 0 if index is None else self.elements[args[0][index][1]]
+        if script == CHALLENGE_SCRIPT:
+            return False
+        if script == PAGE_METRICS_SCRIPT:
+            return {"transfer_bytes": 0, "requests": 0, "load_ms": None}
+        # Spinners, network idle and animations
+        return True
+
+
+def show(selector):
+    def handler(site):
+        site.elements[selector] += 1
+    return handler
+
+
+def send_email(site):
+    site.respond("/api/email", status=site.email_status)
+
+
+def download_pdf(site):
+    site.respond("/api/boarding-pass.pdf", "GET", mime_type="application/pdf")
+
+
+FLOW = Flow(
+    airline="VOLARIS",
+    base_url="https://example.com",
+    checkin=(
+        Open("open", "{base_url}/checkin/{reservation_code}", reconnect=0),
+        Dismiss("error_dialog", css(".error-dialog"), css(".error-dialog .close"), 0.3, "Error dialog",
+                throttle="error dialog"),
+        RejectIf("not_found", css(".not-found"), "Reservation not found"),
+        Fill("lookup", (
+            ("last_name", [css("#last-name-old"), css("#last-name")], "{last_name}"),
+            ("code", css("#code"), "{reservation_code}"),
+        ), 1, "Reservation form"),
+        Click("search", css("#search"), 1, "Search button"),
+        Wait("passengers", (visible(css("#passengers")), SPINNER_GONE), 1, "Passenger list", required=True),
+    ),
+    send=(
+        Fill("email", (("email", css("#email"), "{email}"),), 1, "Email form"),
+        Confirm("send", Click("send_click", css("#send"), 1, "Send button"), ResponseMatcher(r"/api/email"), 1,
+                "Boarding pass sent", fallback=(new_match(css(".sent")),)),
+        Capture("boarding_pass", (Click("download", css("#download"), 1, "Download button"),),
+                ResponseMatcher(r"\.pdf$", "GET"), 1, "Boarding pass PDF"),
+    ),
+)
+
+PAGE = ("#last-name", "#code", "#search", "#email", "#send", "#download")
+
+
+def site(*extra, **options):
+    on_click = {"#search": show("#passengers"), "#send": send_email, "#download": download_pdf}
+    return FakeSite(PAGE + extra, on_click, **options)
+
+
+def reservation(email="ana@example.com", last_name="PEREZ"):
+    return {"airline": "VOLARIS", "reservation_code": "ABC123", "last_name": last_name, "email": email,
+            "date_of_birth": ""}
+
+
+@pytest.fixture(autouse=True)
+def failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(boarding_passes, "_store", BoardingPassStore(str(tmp_path / "boarding_passes")))
+    failures = []
+    for module in (flows, groups):
+        monkeypatch.setattr(module, "capture_failure", lambda driver, airline, code, error: failures.append(str(error)))
+    return failures
+
+
+def test_checkin_runs_every_step():
+    driver = site()
+    with trace("VOLARIS", "ABC123") as current:
+        passes = run_checkin(driver, compile_flow(FLOW), reservation())
+
+    assert driver.opened == ["https://example.com/checkin/ABC123"]
+    assert driver.filled == [{"last_name": "PEREZ", "code": "ABC123"}, {"email": "ana@example.com"}]
+    assert driver.clicked == ["#search", "#send", "#download"]
+    assert [(p.reservation_code, p.size) for p in passes] == [("ABC123", len(PDF))]
+    steps = [s["step"] for s in current.spans if not s["step"].startswith("wait: ") and not s.get("marker")]
+    assert steps == ["open", "error_dialog", "not_found", "lookup", "search", "passengers", "email", "send",
+                     "download", "boarding_pass"]
+    confirmation, = [s for s in current.spans if s["step"] == "confirmation"]
+    assert confirmation["signal"] == "network"
+
+
+def test_rejected_reservation(failures):
+    driver = site(".not-found")
+    with pytest.raises(CheckinRejected, match="Reservation not found"):
+        run_checkin(driver, compile_flow(FLOW), reservation())
+    assert driver.filled == []
+    assert failures == ["Reservation not found"]
+
+
+def test_dialog_is_dismissed_and_reported_as_a_throttle():
+    driver = site(".error-dialog", ".error-dialog .close")
+    driver.on_click[".error-dialog .close"] = lambda site: site.elements.subtract([".error-dialog"])
+    with trace("VOLARIS", "ABC123") as current:
+        run_checkin(driver, compile_flow(FLOW), reservation())
+    assert driver.clicked[0] == ".error-dialog .close"
+    throttle, = [s for s in current.spans if s["step"] == "throttled"]
+    assert throttle["reason"] == "error dialog" and throttle["marker"]
+
+
+def test_failed_send_status_fails_the_check_in(failures):
+    driver = site(email_status=500)
+    with pytest.raises(Exception, match="status 500"):
+        run_checkin(driver, compile_flow(FLOW), reservation())
+    assert len(failures) == 1
+
+
+def test_send_confirmed_by_the_page_without_the_response():
+    driver = site(".sent")
+    driver.on_click["#send"] = show(".sent")
+    with trace("VOLARIS", "ABC123") as current:
+        run_checkin(driver, compile_flow(FLOW), reservation())
+    confirmation, = [s for s in current.spans if s["step"] == "confirmation"]
+    assert confirmation["signal"] == "dom"
+
+
+def test_group_sends_once_per_email_and_captures_once():
+    driver = site()
+    passengers = [reservation("ana@example.com"), reservation("ANA@example.com ", "LOPEZ"),
+                  reservation("luis@example.com", "DIAZ")]
+    results = run_group_checkin(driver, compile_flow(FLOW), passengers)
+
+    assert driver.clicked == ["#search", "#send", "#download", "#send"]
+    assert [f.get("email") for f in driver.filled[1:]] == ["ana@example.com", "luis@example.com"]
+    assert [(r.reservation["last_name"], r.success, len(r.boarding_passes)) for r in results] == [
+        ("PEREZ", True, 1), ("LOPEZ", True, 1), ("DIAZ", True, 1),
+    ]
+
+
+def test_group_send_failure_only_fails_that_email(failures):
+    driver = site()
+    sends = []
+
+    def send_email_once(site):
+        sends.append(1)
+        site.respond("/api/email", status=200 if len(sends) == 1 else 500)
+
+    driver.on_click["#send"] = send_email_once
+    passengers = [reservation("ana@example.com"), reservation("luis@example.com", "DIAZ")]
+    results = run_group_checkin(driver, compile_flow(FLOW), passengers)
+    assert [(r.success, r.transient) for r in results] == [(True, False), (False, True)]
+    assert "status 500" in results[1].error
+    assert len(failures) == 1
+
+
+def test_context_derives_the_birth_date_fields():
+    flow = compile_flow(Flow("AEROMEXICO", "https://example.com", (
+        Open("open", "{base_url}/{reservation_code}"),
+        Fill("birth", (("day", css("#day"), "{birth_day}"), ("year", css("#year"), "{birth_year}")), 1, "Birth date"),
+    )))
+    context = flow.context(dict(reservation(), date_of_birth="01-07-1990"))
+    assert (context["birth_day"], context["birth_month"], context["birth_year"]) == (1, 7, 1990)
+    with pytest.raises(ValueError, match="needs date_of_birth"):
+        flow.context(reservation())
+
+
+def test_invalid_flow_lists_every_problem():
+    flow = Flow("VOLARIS", "https://example.com", (
+        Click("search", css("#search"), 1, "Search"),
+        Click("search", ["id", "search"], 0, "Search again"),
+        Fill("lookup", (("code", css("#code"), "{pnr}"),), 1, "Form"),
+        Wait("ready", (), 1, "Ready"),
+        Capture("pdf", (Confirm("send", Click("c", css("#c"), 1, "C"), ResponseMatcher("x"), 1, "Send"),),
+                ResponseMatcher("pdf", "GET"), 1, "PDF"),
+    ))
+    with pytest.raises(FlowError) as error:
+        validate(flow)
+    message = str(error.value)
+    for problem in ("checkin must start with an Open step", "duplicate step name 'search'",
+                    "timeout must be positive", "invalid locator ['id', 'search']", "unknown field 'pnr'",
+                    "step 'ready': no conditions", "Confirm steps cannot run in a capture"):
+        assert problem in message
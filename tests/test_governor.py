@@ -0,0 +1,136 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+psutil = pytest.importorskip("psutil")
+
+from common import governor
+from common.governor import OWNER_ENV, ResourceGovernor, driver_pids, kill_orphans, owner_id
+
+
+@pytest.fixture
+def fake_chromedriver(tmp_path):
+    """Start processes named chromedriver with the given owner marker."""
+    path = tmp_path / "chromedriver"
+    shutil.copy(shutil.which("sleep"), path)
+    processes = []
+
+    def start(owner):
+        env = dict(os.environ, **({OWNER_ENV: owner} if owner else {}))
+        process = subprocess.Popen([str(path), "60"], env=env)
+        processes.append(process)
+        return process
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def dead_owner():
+    process = subprocess.Popen(["sleep", "60"])
+    owner = owner_id(process.pid)
+    process.kill()
+    process.wait()
+    return owner
+
+
+def test_owner_id_tells_reused_pids_apart():
+    assert owner_id() == owner_id(os.getpid())
+    pid, _, started = owner_id().partition(":")
+    assert pid == str(os.getpid()) and float(started) > 0
+    assert not governor._owner_running(f"{os.getpid()}:1.00")
+    assert governor._owner_running(owner_id())
+
+
+def test_only_processes_of_stopped_instances_are_orphans(fake_chromedriver):
+    other = subprocess.Popen(["sleep", "60"])
+    try:
+        orphan = fake_chromedriver(dead_owner())
+        running_instance = fake_chromedriver(owner_id(other.pid))
+        unmarked = fake_chromedriver(None)
+        own = fake_chromedriver(owner_id())
+        legacy = fake_chromedriver("1")
+
+        assert kill_orphans() == 2
+        assert orphan.wait(5) is not None and legacy.wait(5) is not None
+        for process in (running_instance, unmarked, own):
+            assert process.poll() is None
+
+        assert kill_orphans(own=True) == 1
+        assert own.wait(5) is not None
+        assert running_instance.poll() is None and unmarked.poll() is None
+    finally:
+        other.kill()
+        other.wait()
+
+
+class FakeService:
+    def __init__(self, pid):
+        self.process = type("Process", (), {"pid": pid})()
+
+
+class FakeDriver:
+    def __init__(self, driver_pid, browser_pid=None):
+        self.service = FakeService(driver_pid)
+        self.browser_pid = browser_pid
+
+
+def test_driver_pids():
+    assert driver_pids(FakeDriver(10, 20)) == [10, 20]
+    assert driver_pids(FakeDriver(10, 10)) == [10]
+    assert driver_pids(object()) == []
+
+
+def test_reap_kills_what_is_left_of_a_snapshot():
+    resources = ResourceGovernor()
+    gone = subprocess.Popen(["sleep", "60"])
+    leftover = subprocess.Popen(["sleep", "60"])
+    snapshot = resources.snapshot([gone.pid, leftover.pid])
+    assert [p.pid for p in snapshot] == [gone.pid, leftover.pid]
+    gone.kill()
+    gone.wait()
+    resources.reap(snapshot)
+    assert leftover.wait(5) is not None
+
+
+def test_budget_kills_the_watched_tree():
+    process = subprocess.Popen(["sleep", "60"], start_new_session=True)
+    resources = ResourceGovernor(budget=0.2, interval=0.05).start()
+    try:
+        with resources.watch([process.pid]) as watch:
+            process.wait(5)
+        assert watch.killed
+        assert resources.summary()["MainThread"]["budget_kills"] == 1
+    finally:
+        resources.close()
+
+
+def test_recycle_reason_over_the_memory_limit():
+    process = subprocess.Popen(["sleep", "60"])
+    try:
+        assert ResourceGovernor(max_rss_mb=0).recycle_reason([process.pid]) is None
+        assert ResourceGovernor(max_rss_mb=100000).recycle_reason([process.pid]) is None
+        # Any process uses more than a byte
+        tiny = ResourceGovernor()
+        tiny.max_rss = 1
+        assert "over the" in tiny.recycle_reason([process.pid])
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_watch_follows_a_restarted_chromedriver():
+    first, second = subprocess.Popen(["sleep", "60"]), subprocess.Popen(["sleep", "60"])
+    roots = [first.pid]
+    resources = ResourceGovernor(budget=0.2, interval=0.05).start()
+    try:
+        with resources.watch(lambda: list(roots)):
+            first.kill()
+            first.wait()
+            roots[:] = [second.pid]
+            second.wait(5)
+    finally:
+        resources.close()
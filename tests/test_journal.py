@@ -0,0 +1,100 @@
+import json
+
+from common.journal import FAILED, SUCCEEDED, RunJournal
+from common.orchestrator import CheckinResult
+
+
+def reservation(code="ABC123", last_name="Perez"):
+    return {"airline": "volaris", "reservation_code": code, "last_name": last_name, "email": "a@b.co"}
+
+
+def result(row, success=True):
+    return CheckinResult(row, success, 0.0, 1.0, "" if success else "timed out", not success)
+
+
+def test_rerun_skips_succeeded_reservations(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record(result(reservation("ABC123")))
+    journal.record(result(reservation("DEF456"), success=False))
+    journal.close()
+
+    journal = RunJournal(path)
+    # The key is normalized, so spacing and case do not matter
+    assert journal.lookup(reservation(" abc123 ", "perez")) == (SUCCEEDED, 1)
+    pending = list(journal.pending([reservation("ABC123"), reservation("DEF456"), reservation("GHI789")]))
+    assert [row["reservation_code"] for row in pending] == ["DEF456", "GHI789"]
+    journal.close()
+
+
+def test_reservation_out_of_attempts_is_skipped(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"), max_attempts=2)
+    row = reservation()
+    journal.record(result(row, success=False))
+    assert list(journal.pending([row])) == [row]
+    journal.record(result(row, success=False))
+    assert journal.lookup(row) == (FAILED, 2)
+    assert list(journal.pending([row])) == []
+    journal.close()
+
+
+def test_group_result_records_every_passenger(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    group = dict(reservation(), passengers=[reservation(last_name="Perez"), reservation(last_name="Lopez")])
+    journal.record(result(group))
+    assert journal.lookup(reservation(last_name="Lopez")) == (SUCCEEDED, 1)
+    assert journal.lookup(reservation(last_name="Perez")) == (SUCCEEDED, 1)
+    journal.close()
+
+
+def test_torn_last_line_is_dropped_on_resume(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record(result(reservation("ABC123")))
+    journal.close()
+    # A crash in the middle of an append
+    with open(path, "a") as file:
+        file.write('{"airline": "VOLARIS", "reservation_code": "DEF4')
+
+    journal = RunJournal(path)
+    assert journal.lookup(reservation("DEF456")) == (None, 0)
+    journal.record(result(reservation("DEF456")))
+    journal.close()
+
+    with open(path) as file:
+        entries = [json.loads(line) for line in file]
+    assert [entry["reservation_code"] for entry in entries] == ["ABC123", "DEF456"]
+
+
+def test_missing_index_is_rebuilt_from_the_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record(result(reservation("ABC123")))
+    journal.record(result(reservation("ABC123")))
+    journal.close()
+    (tmp_path / "journal.jsonl.index").unlink()
+
+    journal = RunJournal(path)
+    assert journal.lookup(reservation("ABC123")) == (SUCCEEDED, 2)
+    journal.close()
+
+
+def test_corrupt_complete_lines_are_skipped(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.record(result(reservation("ABC123")))
+    journal.close()
+    with open(path, "a") as file:
+        file.write('{"airline": "VOLARIS", garbage\n')
+        file.write('{"airline": "VOLARIS"}\n')
+        file.write('[]\n')
+    (tmp_path / "journal.jsonl.index").unlink()
+
+    journal = RunJournal(path)
+    assert journal.lookup(reservation("ABC123")) == (SUCCEEDED, 1)
+    journal.record(result(reservation("DEF456")))
+    journal.close()
+
+    journal = RunJournal(path)
+    assert journal.lookup(reservation("DEF456")) == (SUCCEEDED, 1)
+    journal.close()
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from common.orchestrator import Orchestrator, PassengerResult
+from common.resilience import CLOSED, OPEN, CheckinCancelled, CheckinRejected
+
+
+def reservation(code="ABC123", last_name="Perez", airline="volaris"):
+    return {"airline": airline, "reservation_code": code, "last_name": last_name, "email": "a@b.co"}
+
+
+def orchestrator(runner, **kwargs):
+    kwargs.setdefault("retry_base", 0.01)
+    kwargs.setdefault("retry_cap", 0.05)
+    return Orchestrator(runner, **kwargs)
+
+
+def test_transient_failure_is_retried():
+    calls = []
+
+    def runner(row):
+        calls.append(row["reservation_code"])
+        return len(calls) > 1
+
+    orch = orchestrator(runner, retries=2)
+    results = list(orch.run([reservation()]))
+    assert len(calls) == 2
+    assert [(r.success, r.attempts) for r in results] == [(True, 2)]
+    assert orch.stats.succeeded == 1 and orch.stats.failed == 0
+    assert orch.breaker_for("VOLARIS").state == CLOSED
+
+
+def test_retries_are_bounded():
+    calls = []
+
+    def runner(row):
+        calls.append(row)
+        return False
+
+    orch = orchestrator(runner, retries=2, breaker_threshold=10)
+    results = list(orch.run([reservation()]))
+    assert len(calls) == 3
+    assert [(r.success, r.transient, r.attempts) for r in results] == [(False, True, 3)]
+    assert orch.stats.failed == 1
+
+
+def test_rejected_check_in_is_not_retried():
+    calls = []
+
+    def runner(row):
+        calls.append(row)
+        raise CheckinRejected("Reservation not found")
+
+    orch = orchestrator(runner, retries=2, breaker_threshold=1)
+    results = list(orch.run([reservation()]))
+    assert len(calls) == 1
+    assert not results[0].success and not results[0].transient
+    # The airline answered, so its breaker stays closed
+    assert orch.breaker_for("VOLARIS").state == CLOSED
+
+
+def test_breaker_holds_the_airline_until_the_probe():
+    started = []
+
+    def runner(row):
+        started.append((row["airline"], time.monotonic()))
+        return row["airline"] == "aeromexico"
+
+    orch = orchestrator(runner, retries=0, breaker_threshold=2, breaker_cooldown=0.3,
+                        airline_limits={"VOLARIS": 1})
+    rows = [reservation(str(n) * 6) for n in range(3)] + [reservation("XYZ789", airline="aeromexico")]
+    results = list(orch.run(rows))
+
+    assert len(results) == 4
+    volaris = [at for airline, at in started if airline == "volaris"]
+    # Two failures open the breaker; the third reservation is the probe after the cooldown
+    assert volaris[2] - volaris[1] >= 0.25
+    # The other airline is not held back
+    assert [airline for airline, _ in started].index("aeromexico") < 3
+    # The probe failed too, so the breaker reopened with a longer cooldown
+    breaker = orch.breaker_for("VOLARIS")
+    assert breaker.state == OPEN and breaker.cooldown == 0.6
+
+
+def test_cancelled_check_in_is_not_counted():
+    def runner(row):
+        raise CheckinCancelled("Cancelled before it started")
+
+    orch = orchestrator(runner, retries=2, breaker_threshold=1)
+    results = list(orch.run([reservation()]))
+    assert [(r.cancelled, r.attempts) for r in results] == [(True, 1)]
+    assert orch.stats.total == 0
+    assert orch.breaker_for("VOLARIS").state == CLOSED
+
+
+def test_group_retries_only_the_transient_failures():
+    calls = []
+
+    def runner(row):
+        calls.append([p["last_name"] for p in row["passengers"]])
+        if len(calls) == 1:
+            return [PassengerResult(row["passengers"][0], True),
+                    PassengerResult(row["passengers"][1], False, "timed out", transient=True),
+                    PassengerResult(row["passengers"][2], False, "no seat", transient=False)]
+        return [PassengerResult(p, True) for p in row["passengers"]]
+
+    group = dict(reservation(), passengers=[reservation(last_name=name) for name in ("Perez", "Lopez", "Diaz")])
+    orch = orchestrator(runner, retries=1)
+    results = list(orch.run([group]))
+
+    assert calls == [["Perez", "Lopez", "Diaz"], ["Lopez"]]
+    first, retried = results
+    assert [(p.reservation["last_name"], p.success) for p in first.passengers] == [("Perez", True), ("Diaz", False)]
+    assert [(p.reservation["last_name"], p.success) for p in retried.passengers] == [("Lopez", True)]
+    assert orch.stats.succeeded == 2 and orch.stats.failed == 1
+
+
+def test_airline_limit_caps_concurrency():
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def runner(row):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return True
+
+    orch = orchestrator(runner, max_workers=4, airline_limits={"VOLARIS": 2})
+    results = list(orch.run([reservation(str(n) * 6) for n in range(6)]))
+    assert len(results) == 6
+    assert running["peak"] == 2
+
+
+def test_dropped_scheduled_reservation_never_runs():
+    orch = orchestrator(lambda row: True)
+    rows = [dict(reservation(), dispatch_at=time.time() + 3600)]
+    timer = threading.Timer(0.1, orch.drop_pending, [lambda row: row["reservation_code"] == "ABC123"])
+    timer.start()
+    started = time.monotonic()
+    assert list(orch.run(rows)) == []
+    assert time.monotonic() - started < 5
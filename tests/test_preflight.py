@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from common.preflight import Preflight, check_reservation, normalize_reservation
+
+
+def row(**fields):
+    base = {"airline": "volaris", "reservation_code": "abc123", "last_name": "perez", "email": "a@b.co"}
+    return dict(base, **fields)
+
+
+def test_row_is_normalized():
+    normalized = check_reservation(row(
+        airline="  viva   aerobus ", reservation_code=" ab c123 ", last_name=" de  la  cruz ",
+        email=" Ana.Perez@Example.COM ", date_of_birth="1990/07/01",
+    ))
+    assert normalized == {
+        "airline": "VIVA AEROBUS", "reservation_code": "ABC123", "last_name": "DE LA CRUZ",
+        "email": "ana.perez@example.com", "date_of_birth": "01-07-1990",
+    }
+
+
+def test_every_problem_is_reported():
+    _, errors = normalize_reservation({"airline": "interjet", "reservation_code": "abc", "email": "nobody"})
+    assert errors == [
+        "unknown airline 'interjet'", "invalid reservation code 'ABC'", "missing last name", "invalid email 'nobody'",
+    ]
+
+
+@pytest.mark.parametrize("date_of_birth, error", [
+    ("31-02-1990", "unrecognized date of birth '31-02-1990', expected DD-MM-YYYY"),
+    ("01-01-1850", "date of birth '01-01-1850' out of range"),
+])
+def test_invalid_date_of_birth(date_of_birth, error):
+    assert normalize_reservation(row(date_of_birth=date_of_birth))[1] == [error]
+
+
+def test_aeromexico_rules():
+    assert check_reservation(row(airline="aeromexico", reservation_code="1391234567890",
+                                 date_of_birth="01-07-1990"))["reservation_code"] == "1391234567890"
+    assert normalize_reservation(row(airline="aeromexico"))[1] == ["missing date of birth"]
+    # Ticket numbers are Aeromexico's only
+    assert normalize_reservation(row(reservation_code="1391234567890"))[1] == [
+        "invalid reservation code '1391234567890'",
+    ]
+
+
+def test_non_text_fields():
+    assert check_reservation(row(reservation_code=123456, date_of_birth=None))["reservation_code"] == "123456"
+    assert normalize_reservation(row(reservation_code=1.5, last_name=True))[1] == [
+        "reservation code is not text (float)", "last name is not text (bool)",
+    ]
+
+
+def test_invalid_departure():
+    assert normalize_reservation(row(departure="tomorrow"))[1] == ["invalid departure 'tomorrow'"]
+    assert check_reservation(row(departure="2024-07-01 06:45"))["departure"] == "2024-07-01 06:45"
+
+
+def test_csv_rejects_and_duplicates(tmp_path):
+    path = tmp_path / "reservations.csv"
+    path.write_text(
+        "Airline, Last_Name ,Reservation_Code,Email\n"
+        "volaris,Perez,abc123,a@b.co\n"
+        "volaris,PEREZ, ABC123 ,a@b.co\n"
+        "volaris,Lopez,def456,not-an-email\n"
+        "viva aerobus,Diaz,ghi789,d@b.co\n"
+    )
+    preflight = Preflight(str(path))
+    report = preflight.run()
+
+    assert (report.total, report.accepted, report.rejected, report.duplicates) == (4, 2, 2, 1)
+    assert report.reasons == {"duplicate": 1, "invalid email": 1}
+    accepted = list(preflight.accepted())
+    assert [(r["airline"], r["last_name"]) for r in accepted] == [("VOLARIS", "PEREZ"), ("VIVA AEROBUS", "DIAZ")]
+
+    with open(tmp_path / "reservations.rejects.jsonl") as file:
+        rejects = [json.loads(line) for line in file]
+    assert [(r["line"], r["errors"]) for r in rejects] == [
+        (3, ["duplicate of line 2"]), (4, ["invalid email 'not-an-email'"]),
+    ]
+    # The rejects keep the row as it was in the input
+    assert rejects[1]["row"]["email"] == "not-an-email"
+
+
+def test_json_lines_input(tmp_path):
+    path = tmp_path / "reservations.jsonl"
+    path.write_text(
+        json.dumps(row(reservation_code=123456)) + "\n"
+        "\n"
+        "{not json\n"
+        "[1, 2]\n"
+    )
+    preflight = Preflight(str(path), str(tmp_path / "rejects" / "out.jsonl"))
+    report = preflight.run()
+    assert (report.accepted, report.rejected) == (1, 2)
+    assert [r["reservation_code"] for r in preflight.accepted()] == ["123456"]
+    with open(tmp_path / "rejects" / "out.jsonl") as file:
+        assert [json.loads(line)["line"] for line in file] == [3, 4]
+
+
+def test_clean_input_removes_stale_rejects(tmp_path):
+    path = tmp_path / "reservations.csv"
+    rejects = tmp_path / "reservations.rejects.jsonl"
+    rejects.write_text('{"line": 2}\n')
+    path.write_text("airline,last_name,reservation_code,email\nvolaris,Perez,abc123,a@b.co\n")
+    assert Preflight(str(path)).run().rejected == 0
+    assert not rejects.exists()
+
+
+def test_passengers_sharing_a_reservation_and_last_name_are_kept(tmp_path):
+    path = tmp_path / "reservations.csv"
+    path.write_text(
+        "airline,last_name,reservation_code,email,date_of_birth\n"
+        "aeromexico,Perez,abc123,ana@b.co,01-07-1980\n"
+        "aeromexico,Perez,abc123,luis@b.co,15-03-2012\n"
+        "aeromexico,Perez,ABC123,ANA@b.co,1980-07-01\n"
+    )
+    preflight = Preflight(str(path))
+    report = preflight.run()
+    assert (report.accepted, report.duplicates) == (2, 1)
+    assert [r["email"] for r in preflight.accepted()] == ["ana@b.co", "luis@b.co"]
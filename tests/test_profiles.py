@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+
+from common.profiles import (RETAINED_COOKIES, WARM_MARKER, PageLoadStats, WarmProfiles, load_kind,
+                             wipe_profile)
+
+
+def make_profile(path, cookies=("cf_clearance", "session_id", "OptanonConsent", "pnr")):
+    default = os.path.join(path, "Default")
+    for directory in ("Local Storage/leveldb", "IndexedDB", "Cache/Cache_Data", "Code Cache", "Network"):
+        os.makedirs(os.path.join(default, directory), exist_ok=True)
+    for name in ("History", "Web Data", "Cache/Cache_Data/data_0"):
+        with open(os.path.join(default, name), "w") as file:
+            file.write("x")
+    os.symlink("host-1234", os.path.join(path, "SingletonLock"))
+    with sqlite3.connect(os.path.join(default, "Network", "Cookies")) as connection:
+        connection.execute("CREATE TABLE cookies (host_key TEXT, name TEXT, value TEXT)")
+        connection.executemany("INSERT INTO cookies VALUES ('.example.com', ?, 'v')", [(name,) for name in cookies])
+    connection.close()
+    with open(os.path.join(default, "Preferences"), "w") as file:
+        json.dump({"profile": {"exit_type": "Crashed", "name": "Person 1"}}, file)
+
+
+def cookie_names(path):
+    with sqlite3.connect(os.path.join(path, "Default", "Network", "Cookies")) as connection:
+        names = sorted(name for name, in connection.execute("SELECT name FROM cookies"))
+    connection.close()
+    return names
+
+
+def test_wipe_keeps_caches_and_consent_cookies(tmp_path):
+    path = str(tmp_path / "profile")
+    make_profile(path)
+    wipe_profile(path)
+
+    default = os.path.join(path, "Default")
+    assert sorted(os.listdir(default)) == ["Cache", "Code Cache", "Network", "Preferences"]
+    assert os.path.exists(os.path.join(default, "Cache", "Cache_Data", "data_0"))
+    assert not os.path.lexists(os.path.join(path, "SingletonLock"))
+    assert cookie_names(path) == ["OptanonConsent", "cf_clearance"]
+    assert set(cookie_names(path)) <= set(RETAINED_COOKIES)
+    with open(os.path.join(default, "Preferences")) as file:
+        assert json.load(file)["profile"] == {"exit_type": "Normal", "name": "Person 1"}
+
+
+def test_wipe_removes_unreadable_cookie_databases(tmp_path):
+    path = str(tmp_path / "profile")
+    os.makedirs(os.path.join(path, "Default", "Network"))
+    with open(os.path.join(path, "Default", "Network", "Cookies"), "w") as file:
+        file.write("not a database")
+    wipe_profile(path)
+    assert os.listdir(os.path.join(path, "Default", "Network")) == []
+
+
+def test_busy_slots_lease_the_next_one_then_a_cold_profile(tmp_path):
+    profiles = WarmProfiles(str(tmp_path), per_airline=2)
+    first = profiles.acquire("Viva Aerobus")
+    second = profiles.acquire("Viva Aerobus")
+    third = profiles.acquire("Viva Aerobus")
+
+    assert [first.path, second.path] == [str(tmp_path / "viva-aerobus" / slot) for slot in ("0", "1")]
+    assert not (first.warm or second.warm or third.warm)
+    assert third.temporary and not third.path.startswith(str(tmp_path))
+    third.release()
+    assert not os.path.exists(third.path)
+    first.release()
+    second.release()
+
+
+def test_released_slot_is_leased_warm_and_wiped(tmp_path):
+    profiles = WarmProfiles(str(tmp_path), per_airline=2)
+    lease = profiles.acquire("VOLARIS")
+    make_profile(lease.path)
+    lease.release()
+    assert os.path.exists(os.path.join(lease.path, WARM_MARKER))
+
+    again = profiles.acquire("VOLARIS")
+    assert again.path == lease.path and again.warm
+    assert cookie_names(again.path) == ["OptanonConsent", "cf_clearance"]
+    assert not os.path.exists(os.path.join(again.path, "Default", "History"))
+    again.release()
+
+
+def test_page_loads_are_split_by_profile_and_browser():
+    stats = PageLoadStats()
+    stats.record_spans([
+        {"step": "first_page_load", "airline": "Volaris", "profile": "warm", "browser": "new", "duration_ms": 800,
+         "transfer_bytes": 2048},
+        {"step": "first_page_load", "airline": "Volaris", "profile": "cold", "browser": "new", "duration_ms": 2000,
+         "transfer_bytes": 4096},
+        {"step": "first_page_load", "airline": "Volaris", "profile": "cold", "browser": "reused",
+         "duration_ms": 500},
+        {"step": "open", "airline": "Volaris", "duration_ms": 9000},
+    ])
+    summary = stats.summary()["VOLARIS"]
+    assert sorted(summary) == [load_kind(False, False), load_kind(False, True), load_kind(True, False)]
+    assert summary["warm/new"] == {"count": 1, "avg_ms": 800, "p95_ms": 800, "avg_kib": 2.0}
+    assert summary["cold/reused"]["avg_kib"] == 0
@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from common import rate_limit
+from common.orchestrator import CheckinResult, Orchestrator
+from common.rate_limit import THROTTLE_STEP, AdaptiveRateLimiter, RateLimits, report_throttle
+from common.tracing import trace
+
+
+def reservation(code="ABC123", airline="volaris"):
+    return {"airline": airline, "reservation_code": code, "last_name": "Perez", "email": "a@b.co"}
+
+
+def result(row, success=True, transient=False, cancelled=False):
+    return CheckinResult(row, success, 0.0, 1.0, "", transient, cancelled=cancelled)
+
+
+def throttle_span(code="ABC123", airline="Volaris"):
+    return {"airline": airline, "reservation_code": code, "step": THROTTLE_STEP, "reason": "error dialog"}
+
+
+def test_bucket_allows_a_burst_then_paces():
+    limiter = AdaptiveRateLimiter("VOLARIS", rate=60, burst=2)
+    for _ in range(2):
+        assert limiter.delay() == 0
+        limiter.take()
+    # One check-in per second at 60/min
+    assert 0.9 < limiter.delay() <= 1.0
+
+
+def test_throttle_halves_the_rate_and_drops_the_burst():
+    limiter = AdaptiveRateLimiter("VOLARIS", rate=60, min_rate=20, burst=2)
+    limiter.record_throttle("error dialog")
+    assert limiter.rate == 30
+    assert limiter.delay() == pytest.approx(2.0, abs=0.05)
+    limiter.record_throttle("error dialog")
+    assert limiter.rate == 20
+    assert limiter.snapshot() == {"rate_per_min": 20, "throttles": 2, "last_throttle": "error dialog"}
+
+
+def test_success_increases_the_rate_up_to_the_maximum():
+    limiter = AdaptiveRateLimiter("VOLARIS", rate=5, max_rate=6.5, increase=1)
+    limiter.record_success()
+    assert limiter.rate == 6
+    limiter.record_success()
+    assert limiter.rate == 6.5
+
+
+def test_configured_rates_are_clamped():
+    limits = RateLimits({"viva  aerobus": 100, "volaris": 0.1}, default_rate=4, min_rate=1, max_rate=30)
+    assert limits.get("VIVA AEROBUS").rate == 30
+    assert limits.get("VOLARIS").rate == 1
+    assert limits.get("AEROMEXICO").rate == 4
+
+
+def test_throttles_of_a_successful_check_in_are_applied():
+    limits = RateLimits(default_rate=10)
+    limits.record_spans([throttle_span()])
+    assert limits.get("VOLARIS").rate == 10
+    limits.record_result("VOLARIS", result(reservation()))
+    assert limits.get("VOLARIS").rate == 5.5
+    assert limits.get("VOLARIS").throttles == 1
+
+
+def test_challenge_that_fails_the_check_in_halves_the_rate():
+    limits = RateLimits(default_rate=10)
+    limits.record_spans([dict(throttle_span(), reason="bot challenge")])
+    limits.record_result("VOLARIS", result(reservation(), success=False, transient=True))
+    assert limits.get("VOLARIS").rate == 5
+    assert limits.get("VOLARIS").last_throttle == "bot challenge"
+    # Nothing is carried over to the retry
+    limits.record_result("VOLARIS", result(reservation()))
+    assert limits.get("VOLARIS").throttles == 1
+
+
+def test_timeout_counts_as_a_throttle():
+    limits = RateLimits(default_rate=10)
+    timed_out = CheckinResult(reservation(), False, 0.0, 1.0, "Message: timed out waiting\nstack", True)
+    limits.record_result("VOLARIS", timed_out)
+    assert limits.get("VOLARIS").rate == 5
+    assert limits.get("VOLARIS").last_throttle == "Message: timed out waiting"
+    # Other failures leave the pace alone
+    not_found = CheckinResult(reservation(), False, 0.0, 1.0, "Element not found", True)
+    limits.record_result("VOLARIS", not_found)
+    assert limits.get("VOLARIS").throttles == 1
+
+
+def test_timeout_with_reported_throttles_counts_once():
+    limits = RateLimits(default_rate=10)
+    limits.record_spans([throttle_span()])
+    timed_out = CheckinResult(reservation(), False, 0.0, 1.0, "timed out", True)
+    limits.record_result("VOLARIS", timed_out)
+    assert limits.get("VOLARIS").throttles == 1
+    assert limits.get("VOLARIS").last_throttle == "error dialog"
+
+
+def test_throttles_are_held_per_reservation():
+    limits = RateLimits(default_rate=10)
+    limits.record_spans([throttle_span("ABC123"), throttle_span("DEF456")])
+    limits.record_result("VOLARIS", result(reservation("DEF456"), success=False, transient=True))
+    assert limits.get("VOLARIS").throttles == 1
+    limits.record_result("VOLARIS", result(reservation("DEF456"), success=False, transient=True))
+    assert limits.get("VOLARIS").throttles == 1
+    limits.record_result("VOLARIS", result(reservation("ABC123"), success=False))
+    assert limits.get("VOLARIS").throttles == 2
+
+
+def test_cancelled_check_in_leaves_the_rate_alone():
+    limits = RateLimits(default_rate=10)
+    cancelled = CheckinResult(reservation(), False, 0.0, 1.0, "Cancelled before it started", cancelled=True)
+    limits.record_result("VOLARIS", cancelled)
+    assert limits.get("VOLARIS").rate == 10
+
+
+def test_reported_throttle_waits_for_the_result(monkeypatch):
+    limits = RateLimits(default_rate=10)
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", limits)
+    with trace("Volaris", "ABC123") as current:
+        report_throttle("bot challenge")
+    assert [span["step"] for span in current.spans] == [THROTTLE_STEP]
+    assert limits.get("VOLARIS").throttles == 0
+    limits.record_result("VOLARIS", result(reservation()))
+    assert limits.get("VOLARIS").throttles == 1
+    assert limits.get("VOLARIS").last_throttle == "bot challenge"
+
+
+def test_orchestrator_paces_dispatch():
+    dispatched = []
+
+    def runner(row):
+        dispatched.append(time.monotonic())
+        return True
+
+    limits = RateLimits(default_rate=600, max_rate=1200, burst=1)
+    orch = Orchestrator(runner, rate_limits=limits)
+    results = list(orch.run([reservation(str(n) * 6) for n in range(3)]))
+    assert len(results) == 3
+    # 10 check-ins per second, one token saved up
+    assert dispatched[2] - dispatched[0] >= 0.15
+    assert limits.get("VOLARIS").rate > 600
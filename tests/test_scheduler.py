@@ -0,0 +1,46 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import scheduler
+from common.scheduler import DEFAULT_CHECKIN_OFFSETS, DispatchLag, schedule_reservations, wait_for_dispatch
+
+
+def reservation(airline="Volaris", departure=""):
+    return {"airline": airline, "reservation_code": "ABC123", "last_name": "Perez", "departure": departure}
+
+
+def test_dispatch_when_the_airline_window_opens():
+    departure = datetime.now().replace(microsecond=0) + timedelta(days=5)
+    rows = [reservation(airline, departure.strftime("%Y-%m-%d %H:%M:%S"))
+            for airline in ("Aeromexico", "volaris", "Viva Aerobus")]
+    scheduled = list(schedule_reservations(rows, DEFAULT_CHECKIN_OFFSETS))
+
+    assert [datetime.fromtimestamp(r["dispatch_at"]) for r in scheduled] == [
+        departure - timedelta(hours=24), departure - timedelta(hours=72), departure - timedelta(hours=48),
+    ]
+
+
+def test_timezone_aware_departures():
+    departure = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=30)
+    row, = schedule_reservations([reservation("Aeromexico", departure.astimezone(timezone(timedelta(hours=-6)))
+                                              .isoformat())], {"AEROMEXICO": 24})
+    assert row["dispatch_at"] == (departure - timedelta(hours=24)).timestamp()
+
+
+def test_open_windows_and_rows_without_departure_run_immediately():
+    soon = (datetime.now() + timedelta(hours=10)).isoformat(" ")
+    rows = list(schedule_reservations([reservation("Volaris", soon), reservation("Volaris", "  ")],
+                                      DEFAULT_CHECKIN_OFFSETS))
+    assert ["dispatch_at" in row for row in rows] == [False, False]
+
+
+def test_wait_records_the_dispatch_lag(monkeypatch):
+    lag = DispatchLag()
+    monkeypatch.setattr(scheduler, "DISPATCH_LAG", lag)
+    dispatch_at = time.time() + 0.1
+    lag_ms = wait_for_dispatch(dict(reservation(), dispatch_at=dispatch_at))
+
+    assert time.time() >= dispatch_at
+    assert 0 <= lag_ms < 50
+    assert lag._lags == {"VOLARIS": [lag_ms]}
+    assert wait_for_dispatch(reservation()) is None
@@ -0,0 +1,40 @@
+import json
+
+from common.tracing import SpanCollector, parse_emitted_spans, span, trace
+
+
+def test_spans_round_trip_through_stdout(capsys):
+    with trace("VOLARIS", "ABC123", emit=True):
+        with span("open"):
+            pass
+    spans = parse_emitted_spans(capsys.readouterr().out)
+    assert [(s["airline"], s["reservation_code"], s["step"], s["ok"]) for s in spans] == [
+        ("VOLARIS", "ABC123", "open", True),
+    ]
+
+
+def test_failed_step_is_recorded():
+    with trace("VOLARIS", "ABC123") as current:
+        try:
+            with span("fill"):
+                raise TimeoutError("timed out")
+        except TimeoutError:
+            pass
+    assert [(s["step"], s["ok"]) for s in current.spans] == [("fill", False)]
+
+
+def test_markers_stay_out_of_step_latencies(tmp_path):
+    with trace("VOLARIS", "ABC123") as current:
+        current.add("open", 0.0, 1.5, True)
+        current.mark("throttled", 0.0, 0, False, reason="bot challenge")
+        current.mark("browser_launch", 0.0, 4.0, True)
+
+    collector = SpanCollector(str(tmp_path / "spans.jsonl"), str(tmp_path / "metrics.prom"))
+    collector.add(current.spans)
+    collector.close()
+
+    assert list(collector.summary()) == [("VOLARIS", "open")]
+    with open(tmp_path / "spans.jsonl") as file:
+        assert [json.loads(line)["step"] for line in file] == ["open", "throttled", "browser_launch"]
+    metrics = (tmp_path / "metrics.prom").read_text()
+    assert 'step="open"' in metrics and "throttled" not in metrics and "browser_launch" not in metrics
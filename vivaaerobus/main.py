@@ -1,190 +1,103 @@
-import csv
-import argparse
-import time
-import random
 import os
+import sys
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+from selenium.webdriver.chrome.service import Service
 
-def safe_find_element(driver, by, value, timeout=10):
-    try:
-        return WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((by, value))
-        )
-    except TimeoutException:
-        print(f"Element not found: {by}={value}")
-        return None
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.actions import css, text, xpath
+from common.browser import FULL_PROFILE, apply_profile
+from common.drivers import cached_chromedriver
+from common.flows import (NETWORK_IDLE, SPINNER_GONE, Capture, Click, Confirm, Dismiss, Fill, Flow, Open, Wait, gone,
+                          main, settled, visible)
+from common.network import PERF_LOGGING_PREFS, PERFORMANCE_LOGGING, ResponseMatcher
+from common.waits import install_network_tracker
 
-def safe_click(driver, element):
-    try:
-        driver.execute_script("arguments[0].click();", element)
-    except Exception as e:
-        print(f"Failed to click element: {str(e)}")
+AIRLINE = "VIVA AEROBUS"
+# Overridable to run against the local mock site (see mocks/server.py)
+BASE_URL = os.environ.get("VIVAAEROBUS_BASE_URL", "https://www.vivaaerobus.com")
+# The API call behind the "Enviar" button of the boarding passes modal
+BOARDING_PASSES_SENT = ResponseMatcher(r"/boarding-passes/email")
+# The API call behind the "Descargar" option, which answers with the boarding passes PDF
+BOARDING_PASSES_PDF = ResponseMatcher(r"/boarding-passes/(pdf|download)", method="GET")
+# The check-in pages work in headless Chrome
+HEADLESS_SUPPORTED = True
 
-def handle_error_dialog(driver, max_attempts=3):
-    close_button_xpath = "/html/body/app-dialog/div/div/app-notification-dialog/div/button"
-    accept_button_xpath = "/html/body/app-dialog/div/div/app-notification-dialog/div/div[4]/button"
+CHECKIN_PAGE = css("app-check-in-journey")
+CHECKIN_COMPLETED = xpath("//span[contains(text(), 'Check-in completado')]")
+BOARDING_PASSES_BUTTON = xpath("//div[contains(@class, 'completed-btn')]/span[contains(text(), 'Pases de abordar')]")
+DOWNLOAD_BUTTON = xpath("//div[contains(@class, 'pass-available')]")
+# Shown when the site is overloaded or rate limiting us
+ERROR_DIALOG = css("app-dialog")
+ERROR_DIALOG_CLOSE_BUTTON = [
+    xpath("/html/body/app-dialog/div/div/app-notification-dialog/div/button"),
+    xpath("/html/body/app-dialog/div/div/app-notification-dialog/div/div[4]/button"),
+    css("app-dialog app-notification-dialog button"),
+]
+EMAIL_OPTION = [xpath("//*[contains(text(), 'Enviar por correo')]"), text("Enviar por correo")]
+DOWNLOAD_OPTION = [xpath("//*[contains(text(), 'Descargar')]"), text("Descargar")]
+EMAIL_INPUT = [
+    xpath("//app-modal[13]/div[1]/div/div/div[2]/div[3]/form/div/input"),
+    css("app-modal form input[type='email']"),
+]
+SEND_BUTTON = [
+    xpath("//button[contains(@class, 'viva-btn') and contains(., 'Enviar')]"),
+    text("Enviar", "app-modal button"),
+]
 
-    for attempt in range(max_attempts):
-        try:
-            # Check if the dialog is present
-            dialog = safe_find_element(driver, By.CSS_SELECTOR, "app-dialog", timeout=5)
-            if not dialog:
-                print("No error dialog found. Proceeding.")
-                return True
-
-            # Give the modal a moment to fully render
-            time.sleep(2)
-            
-            # Try to close using the 'x' button first
-            close_button = safe_find_element(driver, By.XPATH, close_button_xpath, timeout=5)
-            if close_button:
-                safe_click(driver, close_button)
-            else:
-                # If 'x' button is not found, try the 'Aceptar' button
-                accept_button = safe_find_element(driver, By.XPATH, accept_button_xpath, timeout=5)
-                if accept_button:
-                    safe_click(driver, accept_button)
-                else:
-                    print("Neither close nor accept button found in error dialog")
-                    return False
-            
-            # Wait for the dialog to disappear
-            WebDriverWait(driver, 10).until_not(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "app-dialog"))
-            )
-            
-            print("Error dialog closed successfully")
-            return True
-        except Exception as e:
-            print(f"Attempt {attempt + 1} to handle error dialog failed: {str(e)}")
-            time.sleep(2)  # Wait before retrying
-    
-    print("Failed to handle error dialog after maximum attempts")
-    return False
-
-def perform_checkin(driver, last_name, reservation_code, email):
-    url = f'https://www.vivaaerobus.com/es-mx/check-in?pnr={reservation_code}&lastName={last_name}'
-    
-    print(f"Performing check-in for: {url}")
-    
-    driver.get(url)
-    
-    try:
-        # Wait for the check-in page to load
-        safe_find_element(driver, By.CSS_SELECTOR, "app-check-in-journey")
-        
-        # Check if check-in is already completed
-        checkin_completed = safe_find_element(driver, By.XPATH, "//span[contains(text(), 'Check-in completado')]")
-        
-        if not checkin_completed:
-            # Perform check-in process (omitted for brevity, keep your existing check-in logic here)
-            pass
-        else:
-            print("Check-in already completed")
-        
-        # Wait for the confirmation page to load
-        boarding_passes_button = safe_find_element(driver, By.XPATH, "//div[contains(@class, 'completed-btn')]/span[contains(text(), 'Pases de abordar')]")
-        if boarding_passes_button:
-            safe_click(driver, boarding_passes_button)
-        else:
-            print("Boarding passes button not found")
-            return
-        
-        # Wait for the download button to appear
-        download_button = safe_find_element(driver, By.XPATH, "//div[contains(@class, 'pass-available')]")
-        if download_button:
-            safe_click(driver, download_button)
-        else:
-            print("Download button not found")
-            return
-        
-        # Handle potential error dialog
-        dialog_handled = handle_error_dialog(driver)
-        if dialog_handled:
-            print("Error dialog handled or not present, proceeding with download")
-        else:
-            print("Failed to handle error dialog, but continuing with the process")
-        
-        # Wait for the modal to appear and fully load
-        time.sleep(5)  # Give the modal time to fully render
-        
-       # Select and click the email option using the specific text content
-        email_option_xpath = "//*[contains(text(), 'Enviar por correo')]"
-        email_option = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, email_option_xpath))
-        )
-        if email_option:
-            safe_click(driver, email_option)
-            print("Clicked 'Enviar por correo' button")
-            
-            # Wait for the email input field to appear
-            email_input_xpath = "//app-modal[13]/div[1]/div/div/div[2]/div[3]/form/div/input"
-            email_input = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, email_input_xpath))
-            )
-            if email_input:
-                print("Email input field found")
-                # Clear the field and enter the email
-                driver.execute_script("arguments[0].value = '';", email_input)
-                email_input.send_keys(email)
-                print(f"Entered email: {email}")
-                
-                # Add a delay before clicking the send button
-                time.sleep(3)
-                
-                # Click the send button using the correct XPath
-                send_button_xpath = "//button[contains(@class, 'viva-btn') and contains(., 'Enviar')]"
-                send_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, send_button_xpath))
-                )
-                
-                if send_button:
-                    safe_click(driver, send_button)
-                    print("Clicked 'Enviar' button")
-                    # Wait for the email to be sent
-                    time.sleep(15)  # Wait for 15 seconds to ensure the email is sent
-                    print("Boarding passes sent to email")
-                else:
-                    print("Send button not found or not clickable")
-            else:
-                print("Email input field not found")
-        else:
-            print("Email option not found or not clickable")
-    except Exception as e:
-        print(f"Error during check-in: {str(e)}")
-        # Capture a screenshot when an error occurs
-        driver.save_screenshot(f"error_{reservation_code}.png")
-
-def main():
-    parser = argparse.ArgumentParser(description="Perform Viva Aerobus check-in")
-    parser.add_argument("--last_name", required=True, help="Passenger's last name")
-    parser.add_argument("--reservation_code", required=True, help="Reservation code")
-    parser.add_argument("--email", required=True, help="Email address")
-    parser.add_argument("--date_of_birth", required=True, help="Date of birth (DD-MM-YYYY)")
-    args = parser.parse_args()
+FLOW = Flow(
+    AIRLINE,
+    BASE_URL,
+    headless_supported=HEADLESS_SUPPORTED,
+    checkin=(
+        Open("open_url", "{base_url}/es-mx/check-in?pnr={reservation_code}&lastName={last_name}"),
+        Wait("load_checkin_page", (visible(CHECKIN_PAGE),), 10, "Viva check-in page loaded"),
+        Wait("check_checkin_completed", (visible(CHECKIN_COMPLETED),), 10, "Viva check-in completed"),
+    ),
+    send=(
+        Click("open_boarding_passes", BOARDING_PASSES_BUTTON, 10, "Viva boarding passes button"),
+        Click("open_download", DOWNLOAD_BUTTON, 10, "Viva download button"),
+        Dismiss("handle_error_dialog", ERROR_DIALOG, ERROR_DIALOG_CLOSE_BUTTON, 5, "Viva error dialog",
+                throttle="error dialog"),
+        Wait("open_boarding_passes_modal", (settled(EMAIL_OPTION),), 10, "Viva boarding pass modal open", replaces=5),
+        Click("select_email_option", EMAIL_OPTION, 10, "Viva email option clickable"),
+        Fill("fill_email", (("email", EMAIL_INPUT, "{email}"),), 10, "Viva email form"),
+        # Confirmed by the email form closing when the API response is not seen
+        Confirm("send_boarding_passes", Click("click_send", SEND_BUTTON, 10, "Viva send button enabled", replaces=3),
+                BOARDING_PASSES_SENT, 20, "Viva boarding passes sent",
+                fallback=(gone(EMAIL_INPUT), SPINNER_GONE, NETWORK_IDLE), replaces=15),
+        # Only once the boarding passes are sent: the modal closed with the send, so it is opened again
+        Capture("download_boarding_passes", (
+            Click("reopen_download", DOWNLOAD_BUTTON, 5, "Viva download button"),
+            Click("click_download", DOWNLOAD_OPTION, 5, "Viva download option clickable"),
+        ), BOARDING_PASSES_PDF, 8, "Viva boarding passes captured"),
+    ),
+)
 
+def create_driver(profile=FULL_PROFILE, user_data_dir=None):
     chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_experimental_option("prefs", {
-        "download.default_directory": os.getcwd(),
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
+    prefs = {
         "safebrowsing.enabled": True
-    })
-    driver = webdriver.Chrome(options=chrome_options)
-    
-    try:
-        success = perform_checkin(driver, args.last_name, args.reservation_code, args.email)
-        return success
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        return False
-    finally:
-        driver.quit()
+    }
+    if profile.blocks_images:
+        prefs["profile.managed_default_content_settings.images"] = 2
+    chrome_options.add_experimental_option("prefs", prefs)
+    if profile.headless and HEADLESS_SUPPORTED:
+        chrome_options.add_argument("--headless=new")
+    # A warm profile from common.profiles keeps the HTTP cache and consent cookies between check-ins
+    if user_data_dir:
+        chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+    # Network events for confirm_response
+    chrome_options.set_capability("goog:loggingPrefs", PERFORMANCE_LOGGING)
+    chrome_options.add_experimental_option("perfLoggingPrefs", PERF_LOGGING_PREFS)
+    # Reuse the chromedriver resolved by common.drivers.prepare_drivers instead of resolving it per launch
+    service = Service(executable_path=cached_chromedriver())
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    # Boarding passes are captured from the network (see common.flows.Capture), never saved to disk
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "deny"})
+    apply_profile(driver, profile)
+    install_network_tracker(driver)
+    return driver
 
 if __name__ == "__main__":
-    success = main()
-    exit(0 if success else 1)  # Exit with 0 for success, 1 for failure
\ No newline at end of file
+    success = main(FLOW, create_driver)
+    exit(0 if success else 1)  # Exit with 0 for success, 1 for failure